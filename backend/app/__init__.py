@@ -1,6 +1,16 @@
 from flask import Flask
 from .config import Config
 from .extensions import init_extensions
+from .instrumentation import init_instrumentation
+from .stats import stats_cli
+from .reporting import reporting_cli
+from .importer import import_cli
+from .datagen import datagen_cli
+from .jobs import jobs_cli
+from .archive import archive_cli
+from .sync import sync_cli, init_sync
+from .cache import cache_cli
+from .ledger import ledger_cli
 
 # blueprints
 from .blueprints.main import main_bp
@@ -8,17 +18,39 @@ from .blueprints.customers import customers_bp
 from .blueprints.services import services_bp
 from .blueprints.tickets import tickets_bp
 from .blueprints.invoices import invoices_bp
+from .blueprints.exports import exports_bp
+from .blueprints.reports import reports_bp
+from .blueprints.api import api_bp
+from .blueprints.sync import sync_bp
+from .blueprints.events import events_bp
 
 def create_app():
     app = Flask(__name__, template_folder="templates")
     app.config.from_object(Config)
 
     init_extensions(app)
+    init_instrumentation(app)
+    init_sync(app)
 
     app.register_blueprint(main_bp)
     app.register_blueprint(customers_bp, url_prefix="/customers")
     app.register_blueprint(services_bp, url_prefix="/services")
     app.register_blueprint(tickets_bp, url_prefix="/tickets")
     app.register_blueprint(invoices_bp, url_prefix="/invoices")
+    app.register_blueprint(exports_bp, url_prefix="/exports")
+    app.register_blueprint(reports_bp, url_prefix="/reports")
+    app.register_blueprint(api_bp, url_prefix="/api/v1")
+    app.register_blueprint(sync_bp, url_prefix="/sync")
+    app.register_blueprint(events_bp, url_prefix="/events")
+
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(reporting_cli)
+    app.cli.add_command(import_cli)
+    app.cli.add_command(datagen_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(sync_cli)
+    app.cli.add_command(cache_cli)
+    app.cli.add_command(ledger_cli)
 
     return app
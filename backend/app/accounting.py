@@ -1,11 +1,20 @@
+from fractions import Fraction
+from functools import lru_cache
 from decimal import Decimal, ROUND_HALF_UP
 from flask import current_app
 
 TWOPLACES = Decimal('0.01')
+BAISA = 1000  # minor units per OMR
+
+@lru_cache(maxsize=8)
+def _parse_rate(raw) -> Decimal:
+    return Decimal(str(raw))
+
+def vat_rate() -> Decimal:
+    return _parse_rate(current_app.config.get('VAT_RATE', 0.05))
 
 def calc_vat(amount: Decimal) -> Decimal:
-    rate = Decimal(str(current_app.config.get('VAT_RATE', 0.05)))
-    return (Decimal(amount) * rate).quantize(TWOPLACES, rounding=ROUND_HALF_UP)
+    return (Decimal(amount) * vat_rate()).quantize(TWOPLACES, rounding=ROUND_HALF_UP)
 
 def new_pricing_ctx():
     return {
@@ -37,3 +46,113 @@ def add_item(pricing_ctx, service, qty: int = 1, variable_input: Decimal | None
         'vat_amount': vat_amount,
         'line_total': line_total
     }
+
+def price_lines(lines):
+    """Price a basket in one pass.
+
+    `lines` is an iterable of (service, qty, variable_input); returns the
+    invoice totals context and one item dict per line (with `service_id`).
+    """
+    ctx = new_pricing_ctx()
+    items = []
+    for service, qty, variable_input in lines:
+        item = add_item(ctx, service, qty, variable_input)
+        item['service_id'] = service.id
+        items.append(item)
+    return ctx, items
+
+
+# --- batch pricing in integer baisa -------------------------------------------
+#
+# Same results as add_item() line for line: VAT is rounded half-up to 0.01 and
+# line totals are quantized to 0.01 half-even (the default Decimal context), but
+# computed with ints on values scaled by BAISA, so nothing is parsed per line.
+
+def to_baisa(value) -> int:
+    scaled = Decimal(str(value)) * BAISA
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f'{value} is finer than 1 baisa')
+    return int(scaled)
+
+def from_baisa(amount: int) -> Decimal:
+    return Decimal(amount).scaleb(-3)
+
+def fee_schedule(service):
+    """(office_fee, gov_fee_value, is_variable, vat_applicable) with fees in baisa."""
+    return (to_baisa(service.office_fee or 0), to_baisa(service.gov_fee_value or 0),
+            service.gov_fee_type == 'variable', bool(service.vat_applicable))
+
+def price_batch(lines, rate: Decimal | None = None):
+    """Price many lines at once.
+
+    `lines` yields (fees, qty, variable_input) where `fees` comes from
+    fee_schedule() and `variable_input` is baisa or None. Returns the invoice
+    totals (same keys as new_pricing_ctx, in baisa) and one
+    (office_fee, gov_fee, vat_amount, line_total) tuple per line.
+    """
+    frac = Fraction(rate if rate is not None else vat_rate())
+    num, den = frac.numerator, frac.denominator * 10   # VAT is rounded to 10 baisa
+    rows = []
+    append = rows.append
+    sub_office = sub_gov = sub_vat = sub_total = 0
+    for (office_fee, gov_fee_value, is_variable, vat_applicable), qty, variable_input in lines:
+        office = office_fee * qty
+        if is_variable and variable_input is not None:
+            gov = variable_input
+        else:
+            gov = gov_fee_value * qty
+        if vat_applicable and office:
+            q, r = divmod(office * num if office > 0 else -office * num, den)
+            if r + r >= den:
+                q += 1
+            vat = q * 10 if office > 0 else q * -10
+        else:
+            vat = 0
+        total = office + vat + gov
+        r = total % 10
+        if r:   # only sub-10-baisa inputs (variable fees) need the half-even step
+            total -= r
+            if r > 5 or (r == 5 and total % 20):
+                total += 10
+        sub_office += office
+        sub_gov += gov
+        sub_vat += vat
+        sub_total += total
+        append((office, gov, vat, total))
+    totals = {
+        'subtotal_office_fee': sub_office,
+        'total_gov_fees': sub_gov,
+        'vat_amount': sub_vat,
+        'grand_total': sub_total,
+    }
+    return totals, rows
+
+def price_arrays(office_fee, gov_fee_value, is_variable, vat_applicable, qty,
+                 variable_input, has_variable_input, rate: Decimal | None = None):
+    """Vectorized price_batch() over NumPy arrays (one element per line).
+
+    Amounts are int64 baisa arrays, the flags are bool arrays. Returns the
+    totals dict (Python ints) and a dict of per-line arrays. NumPy is an
+    optional dependency, only needed for this function.
+    """
+    import numpy as np
+
+    frac = Fraction(rate if rate is not None else vat_rate())
+    num, den = frac.numerator, frac.denominator * 10
+    office = office_fee * qty
+    gov = np.where(is_variable & has_variable_input, variable_input, gov_fee_value * qty)
+    q, r = np.divmod(np.abs(office) * num, den)
+    q += (r + r >= den)
+    vat = np.where(vat_applicable, np.sign(office) * q * 10, 0)
+    q, r = np.divmod(office + vat + gov, 10)
+    q += (r > 5) | ((r == 5) & (q % 2 == 1))
+    total = q * 10
+    lines = {'office_fee': office, 'gov_fee': gov, 'vat_amount': vat, 'line_total': total}
+    totals = {
+        'subtotal_office_fee': int(office.sum()),
+        'total_gov_fees': int(gov.sum()),
+        'vat_amount': int(vat.sum()),
+        'grand_total': int(total.sum()),
+    }
+    return totals, lines
+
@@ -0,0 +1,123 @@
+from datetime import date, datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import joinedload, selectinload
+from .extensions import db
+from .models import (Customer, Ticket, TicketEvent, Invoice, InvoiceItem,
+                     TicketArchive, TicketEventArchive, InvoiceArchive, InvoiceItemArchive)
+from . import stats
+
+# Archived rows keep their ids and every column of the hot table, so a column
+# added to a hot table must be added to its *_archive twin in the same migration.
+# Counters and revenue rollups are not touched: they keep covering archived data.
+
+SETTLED_INVOICES = ('Paid', 'Cancelled')
+CLOSED_TICKETS = ('Done', 'Cancelled')
+
+archive_cli = AppGroup('archive', help='Move old closed records out of the hot tables.')
+
+
+def cutoff(months: int, today=None) -> datetime:
+    """Start of the month `months` before the current one."""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def _move(ids, parent, children=()):
+    """Copy rows `ids` of `parent` (and their `children` rows) to the archive, then delete them."""
+    for child, child_archive, fk in children:
+        cols = [c.name for c in child.__table__.columns]
+        src = child.__table__
+        db.session.execute(child_archive.__table__.insert().from_select(
+            cols, select(*[src.c[c] for c in cols]).where(src.c[fk].in_(ids))))
+        db.session.execute(src.delete().where(src.c[fk].in_(ids)))
+    model, archive_model = parent
+    src = model.__table__
+    cols = [c.name for c in src.columns]
+    db.session.execute(archive_model.__table__.insert().from_select(
+        cols, select(*[src.c[c] for c in cols]).where(src.c.id.in_(ids))))
+    db.session.execute(src.delete().where(src.c.id.in_(ids)))
+
+def run(months: int, batch: int = 5000, echo=print):
+    """Archive settled invoices and closed tickets created before cutoff(months), `batch`
+    rows per transaction so locks and WAL stay small while the office keeps working."""
+    before = cutoff(months)
+    moved = {'invoices': 0, 'tickets': 0}
+    while True:
+        ids = db.session.scalars(
+            select(Invoice.id).where(Invoice.created_at < before, Invoice.status.in_(SETTLED_INVOICES))
+            .order_by(Invoice.id).limit(batch)).all()
+        if not ids:
+            break
+        _move(ids, (Invoice, InvoiceArchive), [(InvoiceItem, InvoiceItemArchive, 'invoice_id')])
+        stats.bump(db.session.connection(), {stats.ARCHIVE_GENERATION: 1})
+        db.session.commit()
+        moved['invoices'] += len(ids)
+        echo(f'invoices: {moved["invoices"]}')
+    # a ticket stays hot while any hot invoice still points at it
+    open_invoice = exists().where(Invoice.ticket_id == Ticket.id)
+    while True:
+        ids = db.session.scalars(
+            select(Ticket.id).where(Ticket.created_at < before, Ticket.status.in_(CLOSED_TICKETS),
+                                    ~open_invoice)
+            .order_by(Ticket.id).limit(batch)).all()
+        if not ids:
+            break
+        _move(ids, (Ticket, TicketArchive), [(TicketEvent, TicketEventArchive, 'ticket_id')])
+        stats.bump(db.session.connection(), {stats.ARCHIVE_GENERATION: 1})
+        db.session.commit()
+        moved['tickets'] += len(ids)
+        echo(f'tickets: {moved["tickets"]}')
+    return moved
+
+
+def horizon():
+    """Newest created_at among archived invoices (None when nothing is archived); indexed."""
+    return db.session.scalar(select(func.max(InvoiceArchive.created_at)))
+
+def invoice_version(invoice_id):
+    """(archived, version) of an invoice, or None. The version changes whenever its page
+    would: an edit or status change of the invoice, or an edit of its customer."""
+    for archived, model in ((False, Invoice), (True, InvoiceArchive)):
+        row = db.session.execute(
+            select(model.updated_at, Customer.updated_at)
+            .outerjoin(Customer, Customer.id == model.customer_id).where(model.id == invoice_id)).first()
+        if row is not None:
+            return archived, tuple(row)
+    return None
+
+def find_invoice(invoice_id, archived=None):
+    """Hot invoice by id, falling back to the archive (only the one `archived` names,
+    when known); loaded for the invoice templates."""
+    models = ((Invoice, InvoiceItem), (InvoiceArchive, InvoiceItemArchive))
+    if archived is not None:
+        models = models[archived:archived + 1]
+    for model, item in models:
+        inv = (db.session.query(model)
+               .options(joinedload(model.customer), selectinload(model.items).joinedload(item.service))
+               .filter(model.id == invoice_id).one_or_none())
+        if inv is not None:
+            return inv
+    return None
+
+
+@archive_cli.command('run')
+@click.option('--months', type=int, help='keep this many months hot (default ARCHIVE_AFTER_MONTHS)')
+@click.option('--batch', default=5000, show_default=True)
+def run_command(months, batch):
+    """Move settled invoices and closed tickets older than --months into archive tables."""
+    months = months if months is not None else current_app.config['ARCHIVE_AFTER_MONTHS']
+    click.echo(f'archiving records created before {cutoff(months):%Y-%m-%d}')
+    moved = run(months, batch, echo=click.echo)
+    click.echo(f'{moved["invoices"]} invoices and {moved["tickets"]} tickets archived')
+
+@archive_cli.command('status')
+def status_command():
+    """Row counts of the hot and archive tables."""
+    for model, archive_model in ((Ticket, TicketArchive), (TicketEvent, TicketEventArchive),
+                                 (Invoice, InvoiceArchive), (InvoiceItem, InvoiceItemArchive)):
+        hot = db.session.scalar(select(func.count()).select_from(model))
+        cold = db.session.scalar(select(func.count()).select_from(archive_model))
+        click.echo(f'{model.__tablename__:14} hot {hot:>10}  archive {cold:>10}')
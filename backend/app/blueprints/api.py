@@ -0,0 +1,139 @@
+import hashlib
+from datetime import datetime, timezone
+from decimal import Decimal
+from flask import Blueprint, abort, jsonify, make_response, request
+from sqlalchemy import func, select
+from ..extensions import db
+from ..pagination import paginate
+from ..querycount import query_budget
+from ..models import (Customer, Service, Ticket, Invoice, InvoiceItem, StatCounter,
+                      TicketArchive, InvoiceArchive, InvoiceItemArchive)
+from .. import search, stats
+
+api_bp = Blueprint('api', __name__)
+
+# resource -> (model, exposed columns, filters accepted as ?name=value)
+RESOURCES = {
+    'customers': (Customer, ('id', 'full_name', 'national_id', 'phone', 'email',
+                             'created_at', 'updated_at'), ()),
+    'services': (Service, ('id', 'name', 'gov_entity', 'office_fee', 'gov_fee_type',
+                           'gov_fee_value', 'vat_applicable', 'updated_at'), ()),
+    'tickets': (Ticket, ('id', 'customer_id', 'service_id', 'status', 'notes',
+                         'created_at', 'updated_at'), ('customer_id', 'service_id', 'status')),
+    'invoices': (Invoice, ('id', 'number', 'customer_id', 'ticket_id', 'subtotal_office_fee',
+                           'total_gov_fees', 'vat_amount', 'grand_total', 'status',
+                           'created_at', 'updated_at'), ('customer_id', 'ticket_id', 'status')),
+}
+ITEM_FIELDS = ('id', 'service_id', 'qty', 'office_fee', 'gov_fee', 'vat_amount', 'line_total')
+ARCHIVES = {Ticket: TicketArchive, Invoice: InvoiceArchive}  # single-row lookups fall back to these
+
+
+def _value(v):
+    if isinstance(v, Decimal):
+        return str(v)
+    if isinstance(v, datetime):
+        return v.isoformat(timespec='seconds')
+    return v
+
+def _fields(allowed, extra=()):
+    raw = request.args.get('fields')
+    if not raw:
+        return [*allowed, *extra]
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = set(fields) - set(allowed) - set(extra)
+    if unknown:
+        abort(400, f'unknown fields: {", ".join(sorted(unknown))}')
+    return fields
+
+def _filter_values(model, names):
+    """{column: value} for the ?name=value filters present, coerced to the column's type."""
+    values = {}
+    for name in names:
+        if (raw := request.args.get(name)) is None:
+            continue
+        column = getattr(model, name)
+        try:
+            values[column] = column.type.python_type(raw)
+        except (TypeError, ValueError, ArithmeticError):
+            abort(400, f'bad value for {name}: {raw!r}')
+    return values
+
+def _conditional(resource, version, modified):
+    """ETag/Last-Modified for `version`; returns a 304 response when the client copy is current.
+
+    The tag also covers the query string, since fields/filters/cursor change the body.
+    """
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    etag = hashlib.blake2b(f'{resource}|{version}|{args}'.encode(), digest_size=12).hexdigest()
+    modified = modified.replace(tzinfo=timezone.utc, microsecond=0) if modified else None
+    fresh = (request.if_none_match.contains(etag) if request.if_none_match
+             else bool(modified and request.if_modified_since and modified <= request.if_modified_since))
+    response = make_response('', 304) if fresh else None
+    return etag, modified, response
+
+def _finish(response, etag, modified):
+    response.set_etag(etag)
+    if modified:
+        response.last_modified = modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_bp.get('/<resource>')
+@query_budget(2)
+def list_resource(resource):
+    if resource not in RESOURCES:
+        abort(404)
+    model, allowed, filters = RESOURCES[resource]
+    fields = _fields(allowed)
+    where = _filter_values(model, filters)
+    # version of the whole table: a row leaving a filtered set still bumps max(updated_at),
+    # and archiving (which deletes hot rows) and branch sync (which keeps the branch's
+    # updated_at) bump their counters; all index lookups, so a 304 costs one cheap query
+    generations = (select(func.sum(StatCounter.value)).where(StatCounter.name.in_(stats.GENERATIONS))
+                   .scalar_subquery())
+    max_id, modified, generation = db.session.execute(
+        select(func.max(model.id), func.max(model.updated_at), generations)).one()
+    etag, modified, not_modified = _conditional(resource, (max_id, modified, generation), modified)
+    if not_modified:
+        return _finish(not_modified, etag, modified)
+
+    cols = [getattr(model, f) for f in dict.fromkeys(['id', *fields])]
+    query = db.session.query(*cols)
+    for column, value in where.items():
+        query = query.filter(column == value)
+    q = request.args.get('q')
+    if resource == 'customers' and q and search.normalize(q):
+        query = query.filter(search.match(q))
+    page = paginate(query, model.id)
+    data = [{f: _value(getattr(row, f)) for f in fields} for row in page.rows]
+    return _finish(jsonify(data=data, next=page.next_cursor, prev=page.prev_cursor), etag, modified)
+
+@api_bp.get('/<resource>/<int:id>')
+@query_budget(3)  # row (+ archive miss), items
+def show_resource(resource, id):
+    if resource not in RESOURCES:
+        abort(404)
+    model, allowed, _ = RESOURCES[resource]
+    fields = _fields(allowed, extra=('items',) if model is Invoice else ())
+    cols = [getattr(model, f) for f in dict.fromkeys(['id', 'updated_at', *fields]) if f != 'items']
+    row = db.session.execute(select(*cols).where(model.id == id)).one_or_none()
+    item_model = InvoiceItem
+    if row is None and model in ARCHIVES:
+        cold = ARCHIVES[model]
+        row = db.session.execute(select(*[getattr(cold, c.key) for c in cols])
+                                 .where(cold.id == id)).one_or_none()
+        item_model = InvoiceItemArchive
+    if row is None:
+        abort(404)
+    # invoice items are written once with the invoice, so the invoice version covers them
+    etag, modified, not_modified = _conditional(f'{resource}/{id}', row.updated_at, row.updated_at)
+    if not_modified:
+        return _finish(not_modified, etag, modified)
+
+    data = {f: _value(getattr(row, f)) for f in fields if f != 'items'}
+    if 'items' in fields:
+        items = db.session.execute(select(*[getattr(item_model, f) for f in ITEM_FIELDS])
+                                   .where(item_model.invoice_id == id).order_by(item_model.id))
+        data['items'] = [{f: _value(v) for f, v in zip(ITEM_FIELDS, item)} for item in items]
+    return _finish(jsonify(data), etag, modified)
@@ -1,17 +1,39 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+from decimal import InvalidOperation
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, abort
 from ..extensions import db
+from ..pagination import Page, paginate, page_size
+from ..querycount import query_budget
 from ..models import Customer
+from .. import ledger, search
+from ..importer import import_customers, read_rows
 
 customers_bp = Blueprint('customers', __name__)
 
 @customers_bp.get('/')
+@query_budget(1)
 def list_customers():
     q = request.args.get('q')
     query = Customer.query
-    if q:
-        query = query.filter(Customer.full_name.ilike(f"%{q}%"))
-    rows = query.order_by(Customer.id.desc()).all()
-    return render_template('customers/list.html', rows=rows)
+    if q and search.normalize(q):
+        query = query.filter(search.match(q))
+    page = paginate(query, Customer.id)
+    return render_template('customers/list.html', rows=page.rows, page=page, q=q)
+
+@customers_bp.get('/lookup')
+def lookup_customers():
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    rows = search.search(request.args.get('q', ''), limit=limit)
+    return jsonify([{'id': c.id, 'full_name': c.full_name, 'national_id': c.national_id,
+                     'phone': c.phone} for c in rows])
+
+@customers_bp.route('/import', methods=['GET', 'POST'])
+def import_view():
+    result = None
+    upload = request.files.get('file')
+    if request.method == 'POST' and upload and upload.filename:
+        result = import_customers(read_rows(upload.stream, upload.filename))
+    return render_template('import.html', title='استيراد العملاء', result=result,
+                           columns='full_name, national_id, phone, email')
 
 @customers_bp.get('/new')
 def new_customer():
@@ -26,3 +48,36 @@ def create_customer():
     db.session.add(c)
     db.session.commit()
     return redirect(url_for('customers.list_customers'))
+
+@customers_bp.get('/<int:customer_id>')
+@query_budget(4)  # customer, balance row, open invoices, recent payments
+def statement(customer_id):
+    customer = Customer.query.get_or_404(customer_id)
+    open_invoices, payments = ledger.statement(customer_id)
+    return render_template('customers/statement.html', customer=customer, balance=ledger.balance(customer_id),
+                           open_invoices=open_invoices, payments=payments, methods=ledger.METHODS)
+
+@customers_bp.post('/<int:customer_id>/payments')
+def record_payment(customer_id):
+    Customer.query.get_or_404(customer_id)
+    try:
+        ledger.record_payment(customer_id, request.form['amount'], request.form.get('method', 'cash'),
+                              request.form.get('reference') or None,
+                              request.form.get('invoice_id', type=int))
+    except ValueError:
+        abort(400)
+    db.session.commit()
+    return redirect(url_for('customers.statement', customer_id=customer_id))
+
+@customers_bp.get('/collections')
+@query_budget(1)
+def collections():
+    try:
+        after = ledger.parse_cursor(request.args.get('after'))
+    except (ValueError, InvalidOperation):
+        abort(400)
+    size = page_size()
+    rows = ledger.collections(after, size)
+    next_cursor = f'{rows[size - 1].balance}|{rows[size - 1].customer_id}' if len(rows) > size else None
+    page = Page(rows=rows[:size], size=size, after=request.args.get('after'), next_cursor=next_cursor)
+    return render_template('customers/collections.html', rows=page.rows, page=page)
@@ -0,0 +1,46 @@
+import json
+import queue
+import time
+from flask import Blueprint, Response, current_app, request
+from .. import events
+
+events_bp = Blueprint('events', __name__)
+
+
+def _format(e):
+    head = f"id: {e['id']}\n" if e['id'] else ''
+    return f"{head}event: {e['type']}\ndata: {json.dumps(e['data'])}\n\n"
+
+@events_bp.get('/stream')
+def stream():
+    """Server-Sent Events: ?topics=ticket,invoice (type prefixes). No database access:
+    an open stream costs a thread (a greenlet under gevent), not a connection."""
+    config = current_app.config
+    topics = tuple(f'{t}.' for t in request.args.get('topics', '').split(',') if t)
+    try:
+        sub, missed = events.subscribe(topics, request.headers.get('Last-Event-ID'),
+                                       config['EVENTS_MAX_STREAMS'])
+    except events.TooManySubscribers:
+        # the page falls back to reloading itself
+        return Response('', 503, {'Retry-After': '30'})
+    heartbeat, lifetime = config['EVENTS_HEARTBEAT_SECONDS'], config['EVENTS_STREAM_SECONDS']
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            for e in missed if missed is not None else [events.RESET]:
+                yield _format(e)
+            # streams end now and then so worker threads get recycled; the browser reconnects
+            deadline = time.monotonic() + lifetime
+            while time.monotonic() < deadline and not sub.overflowed:
+                try:
+                    yield _format(sub.queue.get(timeout=heartbeat))
+                except queue.Empty:
+                    yield ': ping\n\n'  # keeps proxies from closing an idle stream
+            if sub.overflowed:
+                yield _format(events.RESET)
+        finally:
+            events.unsubscribe(sub)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,148 @@
+import csv
+import io
+import tempfile
+from datetime import date, datetime, timedelta
+from flask import Blueprint, Response, abort, render_template, request, send_file, stream_with_context
+from sqlalchemy import select
+from ..extensions import db
+from ..models import Invoice, InvoiceItem, Customer, Service, InvoiceArchive, InvoiceItemArchive
+from .. import archive
+
+exports_bp = Blueprint('exports', __name__)
+
+CHUNK_ROWS = 1000
+FLUSH_BYTES = 64 * 1024
+
+def _invoice_columns(inv=Invoice):
+    return [
+        ('id', inv.id), ('number', inv.number), ('created_at', inv.created_at),
+        ('status', inv.status),
+        ('customer_id', inv.customer_id), ('customer', Customer.full_name),
+        ('national_id', Customer.national_id), ('ticket_id', inv.ticket_id),
+        ('subtotal_office_fee', inv.subtotal_office_fee), ('vat_amount', inv.vat_amount),
+        ('total_gov_fees', inv.total_gov_fees), ('grand_total', inv.grand_total),
+    ]
+
+def _item_columns(inv=Invoice, item=InvoiceItem):
+    return [
+        ('invoice_id', item.invoice_id), ('created_at', inv.created_at),
+        ('status', inv.status), ('customer_id', inv.customer_id),
+        ('service_id', item.service_id), ('service', Service.name),
+        ('gov_entity', Service.gov_entity), ('qty', item.qty),
+        ('office_fee', item.office_fee), ('vat_amount', item.vat_amount),
+        ('gov_fee', item.gov_fee), ('line_total', item.line_total),
+    ]
+
+INVOICE_COLUMNS = _invoice_columns()
+ITEM_COLUMNS = _item_columns()
+
+
+def _filters():
+    """Query string filters, parsed once: 400 on a malformed date or customer id."""
+    args = request.args
+    try:
+        return {
+            'from': date.fromisoformat(args['from']) if args.get('from') else None,
+            'to': date.fromisoformat(args['to']) if args.get('to') else None,
+            'customer_id': int(args['customer_id']) if args.get('customer_id') else None,
+            'status': args.get('status') or None,
+        }
+    except ValueError:
+        abort(400)
+
+def _filtered(stmt, filters, inv=Invoice):
+    if filters['from']:
+        stmt = stmt.where(inv.created_at >= filters['from'])
+    if filters['to']:  # inclusive day
+        stmt = stmt.where(inv.created_at < filters['to'] + timedelta(days=1))
+    if filters['customer_id'] is not None:
+        stmt = stmt.where(inv.customer_id == filters['customer_id'])
+    if filters['status']:
+        stmt = stmt.where(inv.status == filters['status'])
+    return stmt
+
+def _sources(filters):
+    """(invoice, item) models to read: the archive only when the range reaches back into it."""
+    sources = [(Invoice, InvoiceItem)]
+    newest_archived = archive.horizon()
+    if newest_archived is not None:
+        start = filters['from']
+        if start is None or start <= newest_archived.date():
+            sources.insert(0, (InvoiceArchive, InvoiceItemArchive))  # older rows first
+    return sources
+
+def _invoice_rows():
+    filters = _filters()
+    for inv, _ in _sources(filters):
+        stmt = (select(*[c for _, c in _invoice_columns(inv)])
+                .outerjoin(Customer, Customer.id == inv.customer_id)
+                .order_by(inv.id))
+        yield _filtered(stmt, filters, inv)
+
+def _item_rows():
+    filters = _filters()
+    for inv, item in _sources(filters):
+        # primary key order: no sort, and an invoice's items are inserted together
+        stmt = (select(*[c for _, c in _item_columns(inv, item)])
+                .join(inv, inv.id == item.invoice_id)
+                .outerjoin(Service, Service.id == item.service_id)
+                .order_by(item.id))
+        yield _filtered(stmt, filters, inv)
+
+def _stream(stmts):
+    # server-side cursor: rows arrive CHUNK_ROWS at a time instead of all at once
+    for stmt in stmts:
+        result = db.session.execute(stmt.execution_options(yield_per=CHUNK_ROWS))
+        for partition in result.partitions():
+            yield from partition
+
+def _csv(header, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write('\ufeff')  # lets Excel detect UTF-8 Arabic text
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() > FLUSH_BYTES:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+def _xlsx(header, rows):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)  # rows are spooled to disk, not kept in memory
+    ws = wb.create_sheet()
+    ws.append(header)
+    for row in rows:
+        ws.append([v.replace(tzinfo=None) if isinstance(v, datetime) else v for v in row])
+    out = tempfile.TemporaryFile()
+    wb.save(out)
+    out.seek(0)
+    return out
+
+def _export(name, columns, stmts, fmt):
+    header = [label for label, _ in columns]
+    filename = f'{name}-{date.today().isoformat()}.{fmt}'
+    if fmt == 'csv':
+        return Response(stream_with_context(_csv(header, _stream(stmts))),
+                        mimetype='text/csv; charset=utf-8',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    if fmt == 'xlsx':
+        return send_file(_xlsx(header, _stream(stmts)), as_attachment=True, download_name=filename,
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    abort(404)
+
+
+@exports_bp.get('/')
+def index():
+    return render_template('exports/index.html')
+
+@exports_bp.get('/invoices.<fmt>')
+def export_invoices(fmt):
+    return _export('invoices', INVOICE_COLUMNS, list(_invoice_rows()), fmt)
+
+@exports_bp.get('/invoice-items.<fmt>')
+def export_invoice_items(fmt):
+    return _export('invoice-items', ITEM_COLUMNS, list(_item_rows()), fmt)
@@ -1,29 +1,70 @@
+import os
+import uuid
 from decimal import Decimal
-from flask import Blueprint, render_template, request, redirect, url_for
+from flask import Blueprint, render_template, request, redirect, url_for, abort, send_file
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
 from ..extensions import db
-from ..models import Invoice, InvoiceItem, Ticket, Service
-from ..accounting import new_pricing_ctx, add_item
+from ..models import Invoice, InvoiceArchive, InvoiceItem, Ticket
+from ..accounting import price_lines
+from ..querycount import query_budget
+from ..instrumentation import span
+from .. import archive, cache, catalog, documents, ledger, numbering
 
 invoices_bp = Blueprint('invoices', __name__)
 
 @invoices_bp.get('/new/<int:ticket_id>')
+@query_budget(3)  # ticket, plus catalog version check + reload at most
 def new_invoice(ticket_id):
     ticket = Ticket.query.get_or_404(ticket_id)
-    return render_template('invoices/pos.html', ticket=ticket)
+    services = catalog.services()
+    # a double-submitted form carries the same key, see create_invoice
+    return render_template('invoices/pos.html', ticket=ticket, services=services,
+                           idempotency_key=uuid.uuid4().hex)
+
+def _basket_lines():
+    # parallel form lists, one entry per basket row; rows without a service are blanks
+    service_ids = request.form.getlist('service_id')
+    qtys = request.form.getlist('qty')
+    variable_inputs = request.form.getlist('variable_input')
+    lines = []
+    for i, service_id in enumerate(service_ids):
+        if not service_id:
+            continue
+        try:
+            qty = int(qtys[i]) if i < len(qtys) and qtys[i] else 1
+            raw = variable_inputs[i] if i < len(variable_inputs) else ''
+            variable_input = Decimal(raw) if raw else None
+            lines.append((int(service_id), qty, variable_input))
+        except (ValueError, ArithmeticError):
+            abort(400)
+        if qty < 1 or (variable_input is not None and (not variable_input.is_finite() or variable_input < 0)):
+            abort(400)
+    if not lines:
+        abort(400)
+    return lines
+
+def _invoice_for_key(key):
+    return db.session.scalar(select(Invoice.id).where(Invoice.idempotency_key == key))
 
 @invoices_bp.post('/create')
 def create_invoice():
     ticket_id = int(request.form['ticket_id'])
-    service_id = int(request.form['service_id'])
-    qty = int(request.form.get('qty', 1))
-    variable_input = request.form.get('variable_input')
-    variable_input = Decimal(variable_input) if variable_input else None
+    key = request.form.get('idempotency_key') or None
+    if key and len(key) > 64:
+        abort(400)
+    if key and (existing := _invoice_for_key(key)):
+        return redirect(url_for('invoices.show_invoice', invoice_id=existing))
+    lines = _basket_lines()
 
     ticket = Ticket.query.get_or_404(ticket_id)
-    service = Service.query.get_or_404(service_id)
+    wanted = {service_id for service_id, _, _ in lines}
+    services = catalog.get_many(wanted)
+    if len(services) != len(wanted):
+        abort(404)
 
-    ctx = new_pricing_ctx()
-    item_ctx = add_item(ctx, service, qty, variable_input)
+    with span('accounting'):
+        ctx, items = price_lines((services[sid], qty, var) for sid, qty, var in lines)
 
     inv = Invoice(
         customer_id=ticket.customer_id,
@@ -32,26 +73,60 @@ def create_invoice():
         total_gov_fees=ctx['total_gov_fees'],
         vat_amount=ctx['vat_amount'],
         grand_total=ctx['grand_total'],
-        status='Unpaid'
+        status='Unpaid',
+        idempotency_key=key,
     )
     db.session.add(inv)
-    db.session.flush()
-
-    item = InvoiceItem(
-        invoice_id=inv.id,
-        service_id=service.id,
-        qty=qty,
-        office_fee=item_ctx['office_fee'],
-        gov_fee=item_ctx['gov_fee'],
-        vat_amount=item_ctx['vat_amount'],
-        line_total=item_ctx['line_total']
-    )
-    db.session.add(item)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # the same form submitted concurrently: the other request created the invoice
+        db.session.rollback()
+        existing = _invoice_for_key(key) if key else None
+        if existing is None:
+            raise
+        return redirect(url_for('invoices.show_invoice', invoice_id=existing))
+
+    for item in items:
+        item['invoice_id'] = inv.id
+    db.session.execute(insert(InvoiceItem), items)
+    ledger.apply_credit(inv)
+    numbering.assign(inv)  # holds the series row only until commit: nothing slow after it
+    db.session.flush()  # the numbered version: its updated_at names the PDF
+    documents.enqueue_invoice_jobs(inv)  # PDF and receipts run in `flask jobs worker`
     db.session.commit()
 
     return redirect(url_for('invoices.show_invoice', invoice_id=inv.id))
 
 @invoices_bp.get('/<int:invoice_id>')
+@query_budget(6)  # version (+ archive miss), catalog check + reload; invoice + items on a cache miss
 def show_invoice(invoice_id):
-    inv = Invoice.query.get_or_404(invoice_id)
-    return render_template('invoices/show.html', inv=inv)
+    found = archive.invoice_version(invoice_id)
+    if found is None:
+        abort(404)
+    archived, version = found
+
+    def render():
+        inv = archive.find_invoice(invoice_id, archived)
+        if inv is None:  # archived in between
+            abort(404)
+        return render_template('invoices/_card.html', inv=inv)
+
+    # service names come from the catalog, so its version is part of the key
+    card = cache.cached('invoice', (invoice_id, archived, *version, catalog.version()), render)
+    return render_template('invoices/show.html', card=card)
+
+@invoices_bp.get('/<int:invoice_id>.pdf')
+def invoice_pdf(invoice_id):
+    inv = db.session.get(Invoice, invoice_id) or db.session.get(InvoiceArchive, invoice_id)
+    if inv is None:
+        abort(404)
+    path = documents.pdf_path(inv)
+    if os.path.exists(path):
+        return send_file(path, mimetype='application/pdf', download_name=f'invoice-{inv.id}.pdf')
+    if not documents.pdf_available():
+        abort(501)
+    documents.request_pdf(inv)
+    db.session.commit()
+    # the page reloads itself until the worker has written the file
+    return render_template('invoices/pdf_pending.html', inv=inv), 202, {'Refresh': '3'}
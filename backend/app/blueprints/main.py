@@ -1,13 +1,10 @@
 from flask import Blueprint, render_template
-from ..models import Customer, Ticket, Invoice
+from ..querycount import query_budget
+from .. import stats as stats_
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.get('/')
+@query_budget(1)
 def dashboard():
-    stats = {
-        'customers': Customer.query.count(),
-        'tickets': Ticket.query.count(),
-        'invoices': Invoice.query.count(),
-    }
-    return render_template('dashboard.html', stats=stats)
+    return render_template('dashboard.html', stats=stats_.snapshot())
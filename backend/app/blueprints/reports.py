@@ -0,0 +1,33 @@
+from datetime import date
+from flask import Blueprint, render_template, request, abort
+from ..models import Service
+from .. import ledger, reporting
+
+reports_bp = Blueprint('reports', __name__)
+
+def _period():
+    today = date.today()
+    quarter_start = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else quarter_start
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else today
+    except ValueError:
+        abort(400)
+    return start, end
+
+@reports_bp.get('/')
+def vat_report():
+    start, end = _period()
+    statuses = [s for s in request.args.getlist('status') if s] or None
+    by_entity = reporting.summary(start, end, by=('gov_entity',), statuses=statuses)
+    by_service = reporting.summary(start, end, by=('service_id',), statuses=statuses)
+    names = dict(Service.query.with_entities(Service.id, Service.name)
+                 .filter(Service.id.in_([r.service_id for r in by_service])))
+    return render_template('reports/vat.html', start=start, end=end, statuses=statuses or [],
+                           totals=reporting.vat_return(start, end),
+                           by_entity=by_entity, by_service=by_service, names=names)
+
+@reports_bp.get('/aging')
+def aging():
+    totals, rows = ledger.aging(limit=min(request.args.get('limit', 100, type=int), 1000))
+    return render_template('reports/aging.html', totals=totals, rows=rows, buckets=ledger.AGING)
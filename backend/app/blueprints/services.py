@@ -1,13 +1,37 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+from flask import Blueprint, abort, render_template, request, redirect, url_for
 from ..extensions import db
+from ..pagination import page_size, paginate_rows
+from ..querycount import query_budget
 from ..models import Service
+from ..importer import import_services, read_rows
+from .. import cache, catalog, sync
 
 services_bp = Blueprint('services', __name__)
 
+@services_bp.before_request
+def _central_catalog():
+    # branches mirror central's catalog (ids included), see sync.pull
+    if request.method == 'POST' and sync.is_branch():
+        abort(403)
+
 @services_bp.get('/')
+@query_budget(2)  # catalog version check + reload, at most
 def list_services():
-    rows = Service.query.order_by(Service.id.desc()).all()
-    return render_template('services/list.html', rows=rows)
+    def render():
+        page = paginate_rows(catalog.newest_first(), 'id')
+        return render_template('services/_table.html', rows=page.rows, page=page)
+
+    key = (catalog.version(), request.args.get('after'), page_size())
+    return render_template('services/list.html', table=cache.cached('services', key, render))
+
+@services_bp.route('/import', methods=['GET', 'POST'])
+def import_view():
+    result = None
+    upload = request.files.get('file')
+    if request.method == 'POST' and upload and upload.filename:
+        result = import_services(read_rows(upload.stream, upload.filename))
+    return render_template('import.html', title='استيراد الخدمات', result=result,
+                           columns='name, gov_entity, office_fee, gov_fee_type, gov_fee_value, vat_applicable')
 
 @services_bp.get('/new')
 def new_service():
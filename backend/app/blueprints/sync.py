@@ -0,0 +1,63 @@
+import gzip
+import hmac
+import io
+import json
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from sqlalchemy.exc import IntegrityError
+from ..extensions import db
+from .. import sync
+
+sync_bp = Blueprint('sync', __name__)
+
+MAX_BATCH_BYTES = 64 * 1024 * 1024  # decompressed
+
+
+@sync_bp.before_request
+def _authorize():
+    token = current_app.config['SYNC_TOKEN']
+    if current_app.config['SYNC_ROLE'] != 'central' or not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+
+def _json(data):
+    body = json.dumps(data, default=sync.encode, ensure_ascii=False, separators=(',', ':')).encode()
+    response = Response(body, mimetype='application/json')
+    if 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@sync_bp.post('/push')
+def push():
+    raw = request.get_data()
+    try:
+        if request.headers.get('Content-Encoding') == 'gzip':
+            with gzip.GzipFile(fileobj=io.BytesIO(raw)) as f:
+                raw = f.read(MAX_BATCH_BYTES + 1)
+        if len(raw) > MAX_BATCH_BYTES:
+            abort(413)
+        batch = json.loads(raw)
+    except (OSError, EOFError, ValueError):
+        abort(400)
+    try:
+        counts = sync.apply(batch)
+        db.session.commit()
+    except (IntegrityError, KeyError, TypeError, ValueError) as exc:
+        # the branch keeps the batch queued and sends it again next round
+        db.session.rollback()
+        current_app.logger.warning('sync batch from %s refused: %s', batch.get('branch'), exc)
+        return jsonify(error=str(exc).splitlines()[0]), 409
+    current_app.logger.info('sync batch from %s: %s', batch.get('branch'), dict(counts))
+    return jsonify(applied=counts)
+
+@sync_bp.get('/pull')
+def pull():
+    limit = min(request.args.get('limit', 5000, type=int), 20000)
+    cursors = {name: request.args.get(name) for name in sync.PULLED}
+    try:
+        data = sync.changes_since(cursors, limit, request.args.get('branch'))
+    except ValueError:
+        abort(400)
+    return _json(data)
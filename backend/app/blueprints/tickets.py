@@ -1,19 +1,93 @@
-from flask import Blueprint, render_template, request, redirect, url_for
+from datetime import datetime
+from flask import Blueprint, render_template, request, redirect, url_for, abort, flash, jsonify
+from sqlalchemy.orm import joinedload
 from ..extensions import db
-from ..models import Ticket, Customer, Service
+from ..pagination import paginate
+from ..querycount import query_budget
+from ..models import Ticket
+from .. import catalog, stats, workflow
 
 tickets_bp = Blueprint('tickets', __name__)
 
 @tickets_bp.get('/')
+@query_budget(1)
 def list_tickets():
-    rows = Ticket.query.order_by(Ticket.id.desc()).all()
-    return render_template('tickets/list.html', rows=rows)
+    query = Ticket.query.options(joinedload(Ticket.customer), joinedload(Ticket.service))
+    page = paginate(query, Ticket.id)
+    return render_template('tickets/list.html', rows=page.rows, page=page)
+
+@tickets_bp.get('/<int:ticket_id>/row')
+@query_budget(1)
+def ticket_row(ticket_id):
+    """One <tr> of the list, for screens patching themselves from the event stream."""
+    r = (Ticket.query.options(joinedload(Ticket.customer), joinedload(Ticket.service))
+         .filter(Ticket.id == ticket_id).first_or_404())
+    return render_template('tickets/_row.html', r=r)
+
+@tickets_bp.get('/queue')
+@query_budget(4)  # queue, stats snapshot, catalog version check + reload at most
+def queue():
+    statuses = [s for s in request.args.getlist('status') if s in workflow.STATUSES]
+    statuses = statuses or list(workflow.OPEN_STATUSES)
+    service_id = request.args.get('service_id', type=int)
+    gov_entity = request.args.get('gov_entity') or None
+    services = catalog.services()
+
+    query = Ticket.query.options(joinedload(Ticket.customer)).filter(Ticket.status.in_(statuses))
+    if service_id:
+        query = query.filter(Ticket.service_id == service_id)
+    elif gov_entity:
+        query = query.filter(Ticket.service_id.in_([s.id for s in services if s.gov_entity == gov_entity]))
+    # oldest first off ix_ticket_status_created_at / ix_ticket_service_status
+    page = paginate(query, Ticket.created_at, Ticket.id, ascending=True)
+    return render_template('tickets/queue.html', rows=page.rows, page=page, statuses=statuses,
+                           service_id=service_id, gov_entity=gov_entity, services=services,
+                           service_names={s.id: s.name for s in services},
+                           entities=sorted({s.gov_entity for s in services if s.gov_entity}),
+                           counts=stats.snapshot()['tickets_by_status'], now=datetime.utcnow(),
+                           workflow=workflow)
+
+@tickets_bp.post('/transition')
+def bulk_transition():
+    """Move many tickets at once: form posts from the queue, or JSON {ticket_ids, to_status, note}."""
+    data = request.get_json(silent=True) if request.is_json else request.form
+    if data is None:
+        abort(400)
+    raw_ids = data.get('ticket_ids', []) if request.is_json else data.getlist('ticket_id')
+    try:
+        ids = [int(i) for i in raw_ids]
+    except (TypeError, ValueError):
+        abort(400)
+    to_status = data.get('to_status')
+    if not ids or to_status not in workflow.STATUSES or len(ids) > workflow.MAX_BATCH:
+        abort(400)
+    back = request.form.get('back', '')
+    back = back if back.startswith(url_for('tickets.queue')) else url_for('tickets.queue')
+    try:
+        moved, rejected = workflow.transition(ids, to_status, (data.get('note') or '')[:255] or None)
+    except workflow.TransitionConflict:
+        db.session.rollback()
+        if request.is_json:
+            return jsonify(error='conflict'), 409
+        flash('تغيّرت حالة بعض المعاملات أثناء النقل، لم يُنقل شيء؛ راجع القائمة وأعد المحاولة')
+        return redirect(back)
+    db.session.commit()
+    if request.is_json:
+        return jsonify(moved=moved, rejected=rejected)
+    flash(f'تم نقل {len(moved)} معاملة إلى «{workflow.LABELS[to_status]}»'
+          + (f'، وتعذر نقل {len(rejected)}' if rejected else ''))
+    return redirect(back)
+
+@tickets_bp.get('/<int:ticket_id>/events')
+def ticket_events(ticket_id):
+    return jsonify([{'from': e.from_status, 'to': e.to_status, 'note': e.note, 'batch': e.batch,
+                     'at': e.created_at.isoformat(timespec='seconds')}
+                    for e in workflow.history(ticket_id)])
 
 @tickets_bp.get('/new')
 def new_ticket():
-    customers = Customer.query.all()
-    services = Service.query.all()
-    return render_template('tickets/form.html', customers=customers, services=services)
+    services = catalog.services()
+    return render_template('tickets/form.html', services=services)
 
 @tickets_bp.post('/new')
 def create_ticket():
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from markupsafe import Markup
+from .instrumentation import metrics
+
+# Rendered fragments keyed by entity id plus a version stamp (updated_at, the
+# catalog version, ...): a new version is a new key, so nothing is ever
+# invalidated, old versions just age out. Memory is a per-process LRU bounded by
+# CACHE_MAX_ENTRIES and CACHE_MAX_MB; with CACHE_DIR set, fragments are also
+# written there and shared by every worker on the host. The disk copy is best
+# effort (a full or read-only disk only costs the sharing) and is trimmed to
+# CACHE_DISK_MAX_MB by `flask cache prune`, run from cron, never by a request.
+# Hit/disk/miss counts are kept per process whether or not instrumentation is on
+# (stats()) and also exported as sanad_cache_requests_total; `flask cache stats`
+# shows what CACHE_DIR holds.
+
+log = logging.getLogger('sanad.cache')
+
+cache_cli = AppGroup('cache', help='Rendered fragment cache.')
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # (namespace, key) -> html
+_size = 0
+_stats = Counter()  # (namespace, hit/disk/miss/evict)
+
+
+def _limits():
+    config = current_app.config
+    return config['CACHE_MAX_ENTRIES'], config['CACHE_MAX_MB'] * 1024 * 1024
+
+def _count(namespace, result):
+    with _lock:
+        _stats[(namespace, result)] += 1
+    metrics.inc('sanad_cache_requests_total', (('cache', namespace), ('result', result)))
+
+def _remember(k, html):
+    global _size
+    max_entries, max_bytes = _limits()
+    evicted = Counter()
+    with _lock:
+        if k in _entries:
+            return
+        _entries[k] = html
+        _size += len(html)
+        while _entries and (len(_entries) > max_entries or _size > max_bytes):
+            (namespace, _), old = _entries.popitem(last=False)
+            _size -= len(old)
+            evicted[namespace] += 1
+        _stats.update({(namespace, 'evict'): n for namespace, n in evicted.items()})
+    for namespace, n in evicted.items():
+        metrics.inc('sanad_cache_evictions_total', (('cache', namespace),), n)
+
+
+def _disk_path(namespace, key):
+    digest = hashlib.blake2b(f'{namespace}|{key}'.encode(), digest_size=16).hexdigest()
+    return os.path.join(current_app.config['CACHE_DIR'], namespace, digest[:2], digest + '.html')
+
+def _disk_get(namespace, key):
+    try:
+        with open(_disk_path(namespace, key), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _disk_put(namespace, key, html):
+    path = _disk_path(namespace, key)
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp, path)  # atomic: other workers never read half a file
+    except OSError as exc:
+        # disk full, read-only, gone: the fragment stays in this process's memory only
+        log.warning('cache: could not write %s: %s', path, exc)
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+def cached(namespace, key, render):
+    """`render()`'s HTML for `key`, rendered at most once per version. The key
+    must change whenever the output would (include updated_at and the like)."""
+    k = (namespace, str(key))
+    with _lock:
+        html = _entries.get(k)
+        if html is not None:
+            _entries.move_to_end(k)
+    if html is not None:
+        _count(namespace, 'hit')
+        return Markup(html)
+    if current_app.config['CACHE_DIR'] and (html := _disk_get(namespace, k[1])) is not None:
+        _count(namespace, 'disk')
+    else:
+        _count(namespace, 'miss')
+        html = str(render())
+        if current_app.config['CACHE_DIR']:
+            _disk_put(namespace, k[1], html)
+    _remember(k, html)
+    return Markup(html)
+
+def stats():
+    """This process's counters: {namespace: {hit, disk, miss, evict, entries, bytes}}."""
+    out = {}
+    with _lock:
+        for (namespace, result), n in _stats.items():
+            out.setdefault(namespace, Counter())[result] = n
+        for (namespace, _), html in _entries.items():
+            row = out.setdefault(namespace, Counter())
+            row['entries'] += 1
+            row['bytes'] += len(html)
+    return out
+
+def disk_usage():
+    """{namespace: (fragments, bytes)} under CACHE_DIR, shared by every worker on the host."""
+    root = current_app.config['CACHE_DIR']
+    out = {}
+    if not root or not os.path.isdir(root):
+        return out
+    for namespace in sorted(os.listdir(root)):
+        files = total = 0
+        for folder, _, names in os.walk(os.path.join(root, namespace)):
+            for name in names:
+                try:
+                    total += os.stat(os.path.join(folder, name)).st_size
+                except OSError:
+                    continue
+                files += 1
+        out[namespace] = (files, total)
+    return out
+
+def clear():
+    global _size
+    with _lock:
+        _entries.clear()
+        _size = 0
+
+
+def prune(max_mb):
+    """Delete the oldest disk fragments until CACHE_DIR holds at most `max_mb`."""
+    root = current_app.config['CACHE_DIR']
+    if not root or not os.path.isdir(root):
+        return 0
+    files = []
+    for folder, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(folder, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+    files.sort()
+    total, removed = sum(f[1] for f in files), 0
+    for _, size, path in files:
+        if total <= max_mb * 1024 * 1024:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+@cache_cli.command('prune')
+@click.option('--max-mb', type=float, help='default CACHE_DISK_MAX_MB; 0 empties the cache')
+def prune_command(max_mb):
+    """Trim the disk cache (CACHE_DIR), oldest fragments first."""
+    max_mb = current_app.config['CACHE_DISK_MAX_MB'] if max_mb is None else max_mb
+    click.echo(f'{prune(max_mb)} cached fragments deleted')
+
+@cache_cli.command('stats')
+def stats_command():
+    """Fragments and size of the disk cache (CACHE_DIR) per namespace."""
+    usage = disk_usage()
+    if not usage:
+        click.echo('no disk cache (CACHE_DIR unset or empty)')
+    for namespace, (files, total) in usage.items():
+        click.echo(f'{namespace:12} {files:>8} fragments {total / 1024 / 1024:>8.1f} MB')
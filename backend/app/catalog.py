@@ -0,0 +1,119 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import event, func, select
+from .accounting import fee_schedule
+from .extensions import db
+from .models import Service
+
+_DIRTY = 'catalog_dirty'
+
+
+@dataclass(frozen=True, slots=True)
+class ServiceSnapshot:
+    """Read-only copy of a Service row; usable wherever pricing expects a service."""
+    id: int
+    name: str
+    gov_entity: str | None
+    office_fee: Decimal
+    gov_fee_type: str
+    gov_fee_value: Decimal
+    vat_applicable: bool
+    updated_at: datetime | None
+    schedule: tuple  # fee_schedule() in baisa, for price_batch()
+
+    @classmethod
+    def from_row(cls, s):
+        office, gov = Decimal(str(s.office_fee or 0)), Decimal(str(s.gov_fee_value or 0))
+        return cls(s.id, s.name, s.gov_entity, office, s.gov_fee_type or 'fixed', gov,
+                   bool(s.vat_applicable), s.updated_at, fee_schedule(s))
+
+
+class _Catalog:
+    __slots__ = ('by_id', 'by_name', 'newest_first', 'version', 'checked')
+
+    def __init__(self, snapshots, version):
+        self.by_id = {s.id: s for s in snapshots}
+        self.by_name = tuple(sorted(snapshots, key=lambda s: (s.name, s.id)))
+        self.newest_first = tuple(sorted(snapshots, key=lambda s: s.id, reverse=True))
+        self.version = version
+        self.checked = time.monotonic()
+
+
+_current = None
+_lock = threading.Lock()
+
+
+def _version():
+    return tuple(db.session.execute(select(func.count(), func.max(Service.updated_at))).one())
+
+def _load():
+    snapshots = [ServiceSnapshot.from_row(s) for s in db.session.execute(select(
+        Service.id, Service.name, Service.gov_entity, Service.office_fee, Service.gov_fee_type,
+        Service.gov_fee_value, Service.vat_applicable, Service.updated_at))]
+    version = (len(snapshots), max((s.updated_at for s in snapshots if s.updated_at), default=None))
+    return _Catalog(snapshots, version)
+
+def _catalog(force=False):
+    """The cached catalog; other workers' edits are picked up through max(updated_at)
+    at most every CATALOG_CHECK_SECONDS."""
+    global _current
+    cat = _current
+    if cat is not None and not force:
+        interval = current_app.config['CATALOG_CHECK_SECONDS']
+        if interval < 0 or time.monotonic() - cat.checked < interval:
+            return cat
+        if _version() == cat.version:
+            cat.checked = time.monotonic()
+            return cat
+    with _lock:
+        if _current is cat or _current is None:
+            _current = _load()
+        return _current
+
+def invalidate():
+    """Drop the cache after Core writes to service (ORM commits do this themselves)."""
+    global _current
+    with _lock:
+        _current = None
+
+
+def services():
+    """All services ordered by name."""
+    return _catalog().by_name
+
+def get(service_id):
+    return _catalog().by_id.get(service_id)
+
+def get_many(ids):
+    """{id: snapshot} for `ids`, reloading once if some were added by another worker."""
+    by_id = _catalog().by_id
+    if not all(i in by_id for i in ids):
+        by_id = _catalog(force=True).by_id
+    return {i: by_id[i] for i in ids if i in by_id}
+
+def newest_first():
+    return _catalog().newest_first
+
+def version():
+    """(count, max updated_at) of the catalog: part of cache keys of pages showing services."""
+    return _catalog().version
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect(session, flush_context):
+    if any(isinstance(obj, Service) for objs in (session.new, session.dirty, session.deleted)
+           for obj in objs):
+        session.info[_DIRTY] = True
+
+@event.listens_for(db.session, 'after_commit')
+def _apply(session):
+    if session.info.pop(_DIRTY, False):
+        invalidate()
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop(_DIRTY, None)
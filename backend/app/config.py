@@ -1,8 +1,69 @@
 import os
 
+def _engine_options(uri: str) -> dict:
+    # SQLite (dev) keeps SQLAlchemy's defaults; its pools take no size arguments
+    if uri.startswith('sqlite'):
+        return {}
+    options = {
+        # one connection per gunicorn thread, plus headroom for bursts
+        'pool_size': int(os.getenv("DB_POOL_SIZE", os.getenv("GUNICORN_THREADS", 4))),
+        'max_overflow': int(os.getenv("DB_MAX_OVERFLOW", 4)),
+        'pool_timeout': int(os.getenv("DB_POOL_TIMEOUT", 10)),  # seconds waiting for a free connection
+        'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", 1800)),  # drop connections older than 30 min
+        'pool_pre_ping': os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    }
+    if uri.startswith('postgresql'):
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))}',
+            'application_name': os.getenv("DB_APPLICATION_NAME", "sanad"),
+        }
+    return options
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///sand.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
     VAT_RATE = float(os.getenv("VAT_RATE", 0.05))  # 5%
     APP_NAME = os.getenv("APP_NAME", "مكتب سند")
+    BRANCH_CODE = os.getenv("BRANCH_CODE", "HQ")  # invoice number prefix, one series per branch/year
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+    QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"
+    STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", 10))  # seconds
+    CATALOG_CHECK_SECONDS = float(os.getenv("CATALOG_CHECK_SECONDS", 5))  # -1: never re-check
+    INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "0") == "1"
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))  # 0..1 of requests
+    PROFILE_MIN_MS = float(os.getenv("PROFILE_MIN_MS", 500))  # only keep slower profiles
+    PROFILE_DIR = os.getenv("PROFILE_DIR")  # default: <instance>/profiles
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # optional bearer token for /metrics
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1))
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 300))  # requeue jobs of dead workers
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+    JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", 30))  # doubles per attempt
+    ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", 12))  # flask archive run default
+    PDF_DIR = os.getenv("PDF_DIR")  # default: <instance>/invoices
+    SMTP_HOST = os.getenv("SMTP_HOST")  # unset: no email receipts
+    SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+    SMTP_USER = os.getenv("SMTP_USER")
+    SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+    SMTP_FROM = os.getenv("SMTP_FROM", "noreply@sanad.om")
+    SMS_GATEWAY_URL = os.getenv("SMS_GATEWAY_URL")  # unset: no SMS receipts; POST {to, message}
+    SMS_GATEWAY_TOKEN = os.getenv("SMS_GATEWAY_TOKEN")
+    SYNC_ROLE = os.getenv("SYNC_ROLE", "")  # branch/central; unset: standalone, see sync.py
+    SYNC_CENTRAL_URL = os.getenv("SYNC_CENTRAL_URL")  # branch: base URL of the central node
+    SYNC_TOKEN = os.getenv("SYNC_TOKEN")  # shared bearer token; central refuses sync without one
+    SYNC_BATCH = int(os.getenv("SYNC_BATCH", 500))  # change log rows per push request
+    SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", 30))  # seconds between `flask sync run` rounds
+    SYNC_TIMEOUT = float(os.getenv("SYNC_TIMEOUT", 30))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 2000))  # rendered fragments per process
+    CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", 64))
+    CACHE_DIR = os.getenv("CACHE_DIR")  # optional disk cache shared by the workers of a host
+    CACHE_DISK_MAX_MB = float(os.getenv("CACHE_DISK_MAX_MB", 512))
+    # per process; under gthread each stream has its own thread on top of GUNICORN_THREADS (gunicorn.conf.py)
+    EVENTS_MAX_STREAMS = int(os.getenv("EVENTS_MAX_STREAMS",
+                                       100 if os.getenv("GUNICORN_WORKER_CLASS") == "gevent" else 16))
+    EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+    EVENTS_STREAM_SECONDS = float(os.getenv("EVENTS_STREAM_SECONDS", 300))  # then the browser reconnects
@@ -0,0 +1,160 @@
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, select, text
+from .accounting import fee_schedule, from_baisa, price_batch
+from .extensions import db
+from .models import Customer, Service, Ticket, Invoice, InvoiceItem
+from .search import build_key
+from . import catalog, ledger, numbering, reporting, stats
+from .workflow import STATUSES
+
+CHUNK = 10_000
+
+FIRST = ['محمد', 'أحمد', 'سالم', 'سعيد', 'خالد', 'علي', 'حمد', 'ناصر', 'سيف', 'عبدالله',
+         'يوسف', 'إبراهيم', 'مسلم', 'هلال', 'بدر', 'فاطمة', 'مريم', 'عائشة', 'شيخة', 'زينب',
+         'آمنة', 'خديجة', 'ليلى', 'نورة', 'هدى']
+FAMILY = ['البلوشي', 'الحارثي', 'الهنائي', 'الكندي', 'المعمري', 'الرواحي', 'الشكيلي',
+          'العبري', 'الغافري', 'السيابي', 'البوسعيدي', 'الحبسي', 'الريامي', 'الزدجالي',
+          'المقبالي', 'اليحيائي', 'الفارسي', 'الجابري', 'العامري', 'السعدي']
+ENTITIES = ['وزارة العمل', 'وزارة التجارة والصناعة', 'شرطة عمان السلطانية', 'وزارة الإسكان',
+            'بلدية مسقط', 'وزارة الصحة']
+SERVICE_NAMES = ['تجديد إقامة', 'إصدار تأشيرة', 'تجديد سجل تجاري', 'نقل كفالة', 'استخراج رخصة',
+                 'تصديق عقد', 'تجديد ملكية مركبة', 'إصدار بطاقة عمل', 'تسجيل عقار', 'شهادة صحية']
+
+STATUS_WEIGHTS = (10, 10, 5, 70, 5)  # most of a year's tickets are closed
+
+datagen_cli = AppGroup('datagen', help='Synthetic data for load tests.')
+
+
+def _name(rng):
+    first = rng.choice(FIRST)
+    father = rng.choice(FIRST[:15])
+    return f'{first} بن {father} {rng.choice(FAMILY)}'
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+def _insert(model, rows):
+    for i in range(0, len(rows), CHUNK):
+        db.session.execute(model.__table__.insert(), rows[i:i + CHUNK])
+
+def _sync_sequences():
+    # explicit ids were inserted; move Postgres serial sequences past them
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    for model in (Customer, Service, Ticket, Invoice, InvoiceItem):
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table}), 1))"))
+
+
+def generate(customers=10_000, services=50, tickets=50_000, invoice_ratio=0.7,
+             max_lines=3, days=365, seed=1, echo=print):
+    """Append synthetic rows with realistic Arabic names, then rebuild derived tables."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    def created():
+        return now - timedelta(seconds=rng.randrange(days * 86400))
+
+    sid = _next_id(Service)
+    svc_rows = []
+    for i in range(services):
+        variable = rng.random() < 0.2
+        svc_rows.append({
+            'id': sid + i, 'name': f'{rng.choice(SERVICE_NAMES)} {sid + i}',
+            'gov_entity': rng.choice(ENTITIES),
+            'office_fee': rng.choice([2, 3, 5, 7.5, 10, 15]),
+            'gov_fee_type': 'variable' if variable else 'fixed',
+            'gov_fee_value': 0 if variable else rng.choice([5, 10, 20, 30, 50, 100]),
+            'vat_applicable': rng.random() < 0.9,
+        })
+    _insert(Service, svc_rows)
+    all_services = db.session.execute(select(Service)).scalars().all()
+    schedules = {s.id: fee_schedule(s) for s in all_services}
+    service_ids = list(schedules)
+    echo(f'services: +{services}')
+
+    cid = _next_id(Customer)
+    rows = []
+    for i in range(customers):
+        row = {'id': cid + i, 'full_name': _name(rng), 'national_id': str(50_000_000 + cid + i),
+               'phone': f'9{rng.randrange(10**7):07d}',
+               'email': f'user{cid + i}@example.om' if rng.random() < 0.3 else None}
+        row['created_at'] = row['updated_at'] = created()
+        row['search_key'] = build_key(SimpleNamespace(**row))
+        rows.append(row)
+        if len(rows) == CHUNK:
+            _insert(Customer, rows)
+            rows = []
+    _insert(Customer, rows)
+    customer_ids = db.session.scalars(select(Customer.id)).all()
+    echo(f'customers: +{customers}')
+
+    tid, iid, item_id = _next_id(Ticket), _next_id(Invoice), _next_id(InvoiceItem)
+    first_invoice = iid
+    ticket_rows, invoice_rows, item_rows = [], [], []
+
+    def flush():
+        _insert(Ticket, ticket_rows)
+        _insert(Invoice, invoice_rows)
+        _insert(InvoiceItem, item_rows)
+        for rows in (ticket_rows, invoice_rows, item_rows):
+            rows.clear()
+
+    for i in range(tickets):
+        ticket_id, when = tid + i, created()
+        customer_id = rng.choice(customer_ids)
+        service_id = rng.choice(service_ids)
+        ticket_rows.append({'id': ticket_id, 'customer_id': customer_id, 'service_id': service_id,
+                            'status': rng.choices(STATUSES, STATUS_WEIGHTS)[0], 'created_at': when,
+                            'updated_at': when})
+        if rng.random() < invoice_ratio:
+            issued = when + timedelta(minutes=rng.randrange(120))
+            lines = [service_id] + [rng.choice(service_ids) for _ in range(rng.randrange(max_lines))]
+            batch = [(schedules[s], rng.randint(1, 3),
+                      rng.randrange(1000, 200_000, 10) if schedules[s][2] else None) for s in lines]
+            totals, priced = price_batch(batch)
+            invoice_rows.append({'id': iid, 'customer_id': customer_id, 'ticket_id': ticket_id,
+                                 'status': 'Paid' if rng.random() < 0.8 else 'Unpaid',
+                                 'created_at': issued, 'updated_at': issued,
+                                 **{k: from_baisa(v) for k, v in totals.items()}})
+            for s, (_, qty, _), (office, gov, vat, total) in zip(lines, batch, priced):
+                item_rows.append({'id': item_id, 'invoice_id': iid, 'service_id': s, 'qty': qty,
+                                  'office_fee': from_baisa(office), 'gov_fee': from_baisa(gov),
+                                  'vat_amount': from_baisa(vat), 'line_total': from_baisa(total)})
+                item_id += 1
+            iid += 1
+        if len(ticket_rows) == CHUNK:
+            flush()
+            db.session.commit()
+    flush()
+    echo(f'tickets: +{tickets}, invoices: +{iid - first_invoice}')
+
+    _sync_sequences()
+    numbering.backfill(db.session.connection(), current_app.config['BRANCH_CODE'])
+    stats.rebuild(db.session.connection())
+    reporting.rebuild(db.session.connection())
+    ledger.rebuild(db.session.connection())
+    db.session.commit()
+    stats.invalidate()
+    catalog.invalidate()
+    echo('counters, rollups and balances rebuilt')
+
+
+@datagen_cli.command('run')
+@click.option('--customers', default=10_000, show_default=True)
+@click.option('--services', default=50, show_default=True)
+@click.option('--tickets', default=50_000, show_default=True)
+@click.option('--invoice-ratio', default=0.7, show_default=True)
+@click.option('--max-lines', default=3, show_default=True)
+@click.option('--days', default=365, show_default=True, help='spread created_at over this many days')
+@click.option('--seed', default=1, show_default=True)
+def datagen_command(**options):
+    """Append synthetic customers, services, tickets and invoices."""
+    generate(echo=click.echo, **options)
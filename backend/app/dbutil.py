@@ -0,0 +1,30 @@
+from functools import lru_cache
+from sqlalchemy.dialects import postgresql, sqlite
+
+_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+def dialect_insert(bind, table):
+    """INSERT construct of the bind's dialect, for .on_conflict_do_*()."""
+    return _INSERTS[bind.dialect.name](table)
+
+def upsert_add(conn, table, key_cols, rows):
+    """Add each row's non-key values onto the stored row, inserting it if missing.
+
+    INSERT .. ON CONFLICT DO UPDATE SET col = col + excluded.col, executed for
+    all rows at once (executemany): the statement does not depend on the row
+    count, so it compiles once per column set and is cached, which matters on
+    the per-commit paths (counters, rollups). Rows are sorted by key so
+    concurrent writers lock them in the same order; keys must be unique within `rows`.
+    """
+    if not rows:
+        return
+    rows = sorted(rows, key=lambda r: tuple(str(r[k]) for k in key_cols))
+    value_cols = tuple(c for c in rows[0] if c not in key_cols)
+    conn.execute(_upsert_add_stmt(conn.dialect.name, table, tuple(key_cols), value_cols), rows)
+
+@lru_cache(maxsize=64)
+def _upsert_add_stmt(dialect_name, table, key_cols, value_cols):
+    stmt = _INSERTS[dialect_name](table)
+    return stmt.on_conflict_do_update(
+        index_elements=list(key_cols),
+        set_={c: table.c[c] + stmt.excluded[c] for c in value_cols})
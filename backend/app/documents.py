@@ -0,0 +1,112 @@
+import glob
+import json
+import os
+import smtplib
+import urllib.request
+from email.message import EmailMessage
+from functools import lru_cache
+from importlib.util import find_spec
+from flask import current_app, render_template
+from .archive import find_invoice
+from .jobs import PermanentError, enqueue, handler
+
+
+@lru_cache(maxsize=1)
+def pdf_available() -> bool:
+    """WeasyPrint is optional (it needs Pango); without it invoices stay HTML-only."""
+    return find_spec('weasyprint') is not None
+
+def _pdf_dir():
+    return current_app.config['PDF_DIR'] or os.path.join(current_app.instance_path, 'invoices')
+
+def pdf_path(inv) -> str:
+    # one file per invoice version: any change to the invoice bumps updated_at. The naive
+    # UTC value is formatted as is (microseconds, no local-time conversion) rather than
+    # turned into a timestamp, so two changes within one second get different files.
+    version = (inv.updated_at or inv.created_at).strftime('%Y%m%dT%H%M%S%f')
+    return os.path.join(_pdf_dir(), f'{inv.id}-{version}.pdf')
+
+def render_pdf(inv) -> str:
+    """Path of the invoice PDF, rendering it from the invoice page template if not cached."""
+    path = pdf_path(inv)
+    if os.path.exists(path):
+        return path
+    if not pdf_available():
+        raise PermanentError('WeasyPrint is not installed')
+    from weasyprint import HTML
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    html = render_template('invoices/print.html', inv=inv)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    HTML(string=html).write_pdf(tmp)
+    os.replace(tmp, path)  # readers never see a half-written file
+    for old in glob.glob(os.path.join(os.path.dirname(path), f'{inv.id}-*.pdf')):
+        if old != path:
+            os.remove(old)
+    return path
+
+def request_pdf(inv):
+    """Queue rendering of the current invoice version (once)."""
+    return enqueue('invoice.pdf', {'invoice_id': inv.id},
+                   dedup_key=f'invoice.pdf:{os.path.basename(pdf_path(inv))}')
+
+def enqueue_invoice_jobs(inv):
+    """Called inside create_invoice's transaction: PDF pre-render and customer receipts."""
+    config = current_app.config
+    if pdf_available():
+        request_pdf(inv)
+    if config['SMTP_HOST']:
+        enqueue('invoice.email', {'invoice_id': inv.id})
+    if config['SMS_GATEWAY_URL']:
+        enqueue('invoice.sms', {'invoice_id': inv.id})
+
+
+def _invoice_or_fail(invoice_id):
+    inv = find_invoice(invoice_id)
+    if inv is None:
+        raise PermanentError(f'invoice {invoice_id} not found')
+    return inv
+
+def _receipt_text(inv):
+    return (f"{current_app.config['APP_NAME']}: فاتورة رقم {inv.number or inv.id} "
+            f"بمبلغ {inv.grand_total:.2f} ر.ع. شكراً لتعاملكم معنا.")
+
+@handler('invoice.pdf')
+def pdf_job(invoice_id):
+    render_pdf(_invoice_or_fail(invoice_id))
+
+@handler('invoice.email')
+def email_job(invoice_id):
+    inv = _invoice_or_fail(invoice_id)
+    if not (inv.customer and inv.customer.email):
+        return
+    config = current_app.config
+    msg = EmailMessage()
+    msg['Subject'] = f"{config['APP_NAME']} - فاتورة {inv.number or inv.id}"
+    msg['From'] = config['SMTP_FROM']
+    msg['To'] = inv.customer.email
+    msg.set_content(_receipt_text(inv))
+    if pdf_available():
+        with open(render_pdf(inv), 'rb') as fh:
+            msg.add_attachment(fh.read(), maintype='application', subtype='pdf',
+                               filename=f'invoice-{inv.number or inv.id}.pdf')
+    with smtplib.SMTP(config['SMTP_HOST'], config['SMTP_PORT'], timeout=30) as smtp:
+        if config['SMTP_USER']:
+            smtp.starttls()
+            smtp.login(config['SMTP_USER'], config['SMTP_PASSWORD'])
+        smtp.send_message(msg)
+
+@handler('invoice.sms')
+def sms_job(invoice_id):
+    inv = _invoice_or_fail(invoice_id)
+    if not (inv.customer and inv.customer.phone):
+        return
+    config = current_app.config
+    body = json.dumps({'to': inv.customer.phone, 'message': _receipt_text(inv)}).encode()
+    req = urllib.request.Request(config['SMS_GATEWAY_URL'], data=body, method='POST',
+                                 headers={'Content-Type': 'application/json'})
+    if config['SMS_GATEWAY_TOKEN']:
+        req.add_header('Authorization', f"Bearer {config['SMS_GATEWAY_TOKEN']}")
+    with urllib.request.urlopen(req, timeout=15) as response:
+        if response.status >= 300:
+            raise RuntimeError(f'SMS gateway answered {response.status}')
@@ -0,0 +1,169 @@
+import json
+import logging
+import queue
+import select
+import threading
+import time
+import uuid
+from collections import deque
+from sqlalchemy import event, inspect, text
+from .extensions import db
+from .models import Ticket, Invoice
+
+# Ticket and invoice changes are pushed to open screens (Server-Sent Events, see
+# blueprints/events.py) instead of every screen re-querying its list. Each
+# process fans events out to its own subscribers; on Postgres a transactional
+# NOTIFY carries them to every process, on SQLite (one process: gunicorn.conf.py) they are
+# published locally after commit.
+
+log = logging.getLogger('sanad.events')
+
+CHANNEL = 'sanad_events'
+BACKLOG = 500  # recent events kept for Last-Event-ID replay
+QUEUE_SIZE = 200  # per subscriber; a screen further behind is told to reload
+MAX_IDS = 500  # ids per event: keeps a NOTIFY payload under Postgres' 8000 bytes
+RESET = {'id': None, 'type': 'reset', 'data': {}}
+_PENDING = 'events_pending'
+
+_lock = threading.Lock()
+_subscribers = set()
+_recent = deque(maxlen=BACKLOG)
+_listener = None
+
+
+class TooManySubscribers(Exception):
+    pass
+
+class Subscriber:
+    __slots__ = ('queue', 'topics', 'overflowed')
+
+    def __init__(self, topics):
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.topics = tuple(topics)  # type prefixes, e.g. ('ticket.',); empty: everything
+        self.overflowed = False
+
+    def wants(self, e):
+        return not self.topics or e['type'].startswith(self.topics)
+
+
+def _event(type_, **data):
+    return {'id': uuid.uuid4().hex[:16], 'type': type_, 'data': data}
+
+def emit(session, type_, **data):
+    """Publish an event once `session` commits (never on rollback). For Core writes;
+    ORM inserts and status changes of tickets and invoices are picked up by the
+    flush hook."""
+    _send(session, [_event(type_, **data)])
+
+def _send(session, events):
+    if not events:
+        return
+    if session.get_bind().dialect.name == 'postgresql':
+        # NOTIFY is transactional: delivered to every process's listener on commit only
+        conn = session.connection()
+        for e in events:
+            conn.execute(text('SELECT pg_notify(:channel, :payload)'),
+                         {'channel': CHANNEL, 'payload': json.dumps(e)})
+    else:
+        session.info.setdefault(_PENDING, []).extend(events)
+
+@event.listens_for(db.session, 'after_flush')
+def _collect(session, flush_context):
+    events = []
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            events.append(_event('ticket.created', id=obj.id, status=obj.status))
+        elif isinstance(obj, Invoice):
+            events.append(_event('invoice.created', id=obj.id, ticket_id=obj.ticket_id, status=obj.status))
+    for obj in session.dirty:
+        if isinstance(obj, (Ticket, Invoice)):
+            hist = inspect(obj).attrs.status.history
+            # deleted is empty when the old value was never loaded: still a change worth showing
+            if hist.added and hist.added[0] not in hist.deleted:
+                kind = 'ticket' if isinstance(obj, Ticket) else 'invoice'
+                events.append(_event(f'{kind}.status', ids=[obj.id], status=hist.added[0]))
+    _send(session, events)
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_pending(session):
+    for e in session.info.pop(_PENDING, ()):
+        publish(e)
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop(_PENDING, None)
+
+
+def publish(e):
+    """Hand `e` to this process's subscribers; never blocks on a slow one."""
+    with _lock:
+        if e['id']:
+            _recent.append(e)
+        subscribers = list(_subscribers)
+    for sub in subscribers:
+        if e is RESET or sub.wants(e):
+            try:
+                sub.queue.put_nowait(e)
+            except queue.Full:
+                sub.overflowed = True
+
+def subscribe(topics=(), last_id=None, limit=None):
+    """Register a subscriber. Returns it with the events it missed since `last_id`
+    (a reconnecting EventSource), or with None when `last_id` has left the backlog."""
+    sub = Subscriber(topics)
+    with _lock:
+        if limit is not None and len(_subscribers) >= limit:
+            raise TooManySubscribers()
+        _subscribers.add(sub)
+        missed = []
+        if last_id:
+            ids = [e['id'] for e in _recent]
+            missed = ([e for e in list(_recent)[ids.index(last_id) + 1:] if sub.wants(e)]
+                      if last_id in ids else None)
+    if db.engine.dialect.name == 'postgresql':
+        _start_listener()
+    return sub, missed
+
+def unsubscribe(sub):
+    with _lock:
+        _subscribers.discard(sub)
+
+
+def _start_listener():
+    global _listener
+    with _lock:
+        if _listener is not None and _listener.is_alive():
+            return
+        _listener = threading.Thread(target=_listen, args=(db.engine,), name='events-listener', daemon=True)
+        _listener.start()
+
+def _listen(engine):
+    """LISTEN on a dedicated connection (outside the pool) and publish what arrives."""
+    dialect = engine.dialect
+    cargs, cparams = dialect.create_connect_args(engine.url)
+    delay, connected_before = 1, False
+    while True:
+        conn = None
+        try:
+            conn = dialect.loaded_dbapi.connect(*cargs, **cparams)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN {CHANNEL}')
+            if connected_before:
+                publish(RESET)  # events sent while disconnected are lost: screens reload
+            connected_before, delay = True, 1
+            while True:
+                if select.select([conn], [], [], 30)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        publish(json.loads(conn.notifies.pop(0).payload))
+        except Exception:
+            log.exception('event listener lost its connection, retrying in %ss', delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
@@ -0,0 +1,213 @@
+import csv
+import io
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from types import SimpleNamespace
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select
+from .dbutil import dialect_insert
+from .extensions import db
+from .models import Customer, Service
+from .search import build_key
+from . import catalog, stats, sync
+
+CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 200
+
+import_cli = AppGroup('import', help='Bulk CSV/XLSX import.')
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)  # (row number, message)
+
+    def error(self, row_no, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_no, message))
+
+
+def read_rows(stream, filename: str):
+    """Yield (row number, dict) from a CSV or XLSX upload without loading it whole."""
+    if filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(stream, read_only=True, data_only=True)
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h or '').strip() for h in next(rows, ())]
+        for n, values in enumerate(rows, start=2):
+            if any(v not in (None, '') for v in values):
+                yield n, dict(zip(header, values))
+        wb.close()
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        for n, row in enumerate(csv.DictReader(text), start=2):
+            yield n, row
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+def _text(row, key, max_len, required=False):
+    value = row.get(key)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # spreadsheet numbers: 12345678.0 -> "12345678"
+    value = str(value).strip() if value is not None else ''
+    if not value:
+        if required:
+            raise ValueError(f'{key} is required')
+        return None
+    if len(value) > max_len:
+        raise ValueError(f'{key} longer than {max_len} characters')
+    return value
+
+def _money(row, key, default='0'):
+    raw = row.get(key)
+    raw = default if raw in (None, '') else str(raw).strip()
+    try:
+        value = Decimal(raw).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'{key} is not a number')
+    if value < 0:
+        raise ValueError(f'{key} is negative')
+    return value
+
+
+def import_customers(rows, result=None):
+    """Upsert customers keyed on national_id, CHUNK_SIZE rows per statement and commit."""
+    result = result or ImportResult()
+    table = Customer.__table__
+    now = datetime.utcnow()
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        by_nid, anonymous = {}, []
+        for n, row in chunk:
+            result.rows += 1
+            try:
+                values = {
+                    'full_name': _text(row, 'full_name', 120, required=True),
+                    'national_id': _text(row, 'national_id', 32),
+                    'phone': _text(row, 'phone', 32),
+                    'email': _text(row, 'email', 120),
+                }
+                if values['email'] and '@' not in values['email']:
+                    raise ValueError('email is not valid')
+            except ValueError as exc:
+                result.error(n, str(exc))
+                continue
+            values['search_key'] = build_key(SimpleNamespace(**values))
+            values['created_at'] = values['updated_at'] = now
+            values['uid'] = uuid.uuid4().hex  # kept by a row that already exists
+            if values['national_id']:
+                if values['national_id'] in by_nid:
+                    result.error(n, f"national_id {values['national_id']} repeated in file, last row kept")
+                by_nid[values['national_id']] = values  # last occurrence wins
+            else:
+                anonymous.append(values)
+
+        batch = list(by_nid.values()) + anonymous
+        if not batch:
+            continue
+        existing = set(db.session.scalars(
+            select(Customer.national_id).where(Customer.national_id.in_(list(by_nid)))))
+        stmt = dialect_insert(db.session.get_bind(), table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['national_id'],
+            set_={'full_name': stmt.excluded.full_name,
+                  'phone': func.coalesce(stmt.excluded.phone, table.c.phone),
+                  'email': func.coalesce(stmt.excluded.email, table.c.email),
+                  'updated_at': stmt.excluded.updated_at})
+        db.session.execute(stmt, batch)  # executemany: compiled once, cached across chunks
+        if existing:
+            # phone and email were kept where the file has none: key the merged rows
+            merged = db.session.execute(
+                select(Customer.id, Customer.full_name, Customer.national_id, Customer.phone,
+                       Customer.email, Customer.search_key).where(Customer.national_id.in_(existing))).all()
+            keys = [{'_id': r.id, 'search_key': key} for r in merged if (key := build_key(r)) != r.search_key]
+            if keys:
+                db.session.execute(table.update().where(table.c.id == db.bindparam('_id')), keys)
+        created = len(batch) - len(existing)
+        stats.bump(db.session.connection(), {'customers': created})
+        if sync.is_branch():
+            # Core upsert: the change log hook does not see it, so log created and updated rows
+            uids = [v['uid'] for v in anonymous]
+            uids += db.session.scalars(select(Customer.uid).where(Customer.national_id.in_(list(by_nid))))
+            sync.record(db.session.connection(), 'customer', uids)
+        db.session.commit()
+        result.created += created
+        result.updated += len(existing)
+    return result
+
+def import_services(rows, result=None):
+    """Insert new services and update the fee schedule of existing ones, matched on (name, gov_entity)."""
+    result = result or ImportResult()
+    now = datetime.utcnow()
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        incoming = {}
+        for n, row in chunk:
+            result.rows += 1
+            try:
+                values = {
+                    'name': _text(row, 'name', 120, required=True),
+                    'gov_entity': _text(row, 'gov_entity', 120),
+                    'office_fee': _money(row, 'office_fee'),
+                    'gov_fee_type': (_text(row, 'gov_fee_type', 10) or 'fixed').lower(),
+                    'gov_fee_value': _money(row, 'gov_fee_value'),
+                    'vat_applicable': str(row.get('vat_applicable', '1')).strip().lower()
+                                      not in ('0', 'false', 'no', 'لا', ''),
+                }
+                if values['gov_fee_type'] not in ('fixed', 'variable'):
+                    raise ValueError('gov_fee_type must be fixed or variable')
+            except ValueError as exc:
+                result.error(n, str(exc))
+                continue
+            incoming[(values['name'], values['gov_entity'])] = values
+
+        if not incoming:
+            continue
+        existing = {(name, entity): id_ for name, entity, id_ in db.session.execute(
+            select(Service.name, Service.gov_entity, Service.id)
+            .where(Service.name.in_({name for name, _ in incoming})))}
+        new = [v for k, v in incoming.items() if k not in existing]
+        changed = [{**v, '_id': existing[k], 'updated_at': now}
+                   for k, v in incoming.items() if k in existing]
+        if new:
+            db.session.execute(Service.__table__.insert(), new)
+        if changed:
+            db.session.execute(Service.__table__.update()
+                               .where(Service.__table__.c.id == db.bindparam('_id')), changed)
+        db.session.commit()
+        catalog.invalidate()  # Core writes skip the session hook
+        result.created += len(new)
+        result.updated += len(changed)
+    return result
+
+
+def _run(importer, path):
+    with open(path, 'rb') as fh:
+        result = importer(read_rows(fh, path))
+    click.echo(f'{result.rows} rows: {result.created} created, {result.updated} updated, '
+               f'{result.skipped} skipped')
+    for n, message in result.errors:
+        click.echo(f'  row {n}: {message}')
+
+@import_cli.command('customers')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_customers_command(path):
+    """Import customers from a CSV/XLSX file (columns: full_name, national_id, phone, email)."""
+    _run(import_customers, path)
+
+@import_cli.command('services')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_services_command(path):
+    """Import services from a CSV/XLSX file (columns: name, gov_entity, office_fee,
+    gov_fee_type, gov_fee_value, vat_applicable)."""
+    _run(import_services, path)
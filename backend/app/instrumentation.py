@@ -0,0 +1,171 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import Response, current_app, g, has_app_context, has_request_context, request
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from .extensions import db
+from .querycount import query_count
+
+log = logging.getLogger('sanad.perf')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'n')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.n += 1
+
+
+class Registry:
+    """Per-process metrics. Each gunicorn worker keeps (and exposes) its own."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)   # (name, labels) -> value
+        self.histograms = defaultdict(Histogram)
+
+    def inc(self, name, labels=(), value=1):
+        with self.lock:
+            self.counters[(name, labels)] += value
+
+    def observe(self, name, labels, seconds):
+        with self.lock:
+            self.histograms[(name, labels)].observe(seconds)
+
+    def render(self):
+        def fmt(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ''
+            return '{' + ','.join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in pairs) + '}'
+
+        lines = []
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f'{name}{fmt(labels)} {value:g}')
+            for (name, labels), h in sorted(self.histograms.items(), key=lambda kv: kv[0]):
+                cumulative = 0
+                for bound, count in zip((*BUCKETS, '+Inf'), h.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{fmt(labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{fmt(labels)} {h.total:.6f}')
+                lines.append(f'{name}_count{fmt(labels)} {h.n}')
+        lines.append('')
+        return '\n'.join(lines)
+
+
+metrics = Registry()
+
+
+@contextmanager
+def span(section: str):
+    """Time a block of application code (e.g. accounting) into the current request's breakdown."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if has_request_context() and 'perf' in g:
+            g.perf['sections'][section] += elapsed
+            metrics.observe('sanad_section_seconds', (('section', section),), elapsed)
+
+
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    conn.info['perf_started'] = time.perf_counter()
+
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('perf_started', time.perf_counter())
+    endpoint = (request.endpoint if has_request_context() else None) or '-'
+    metrics.observe('sanad_sql_seconds', (('endpoint', endpoint),), elapsed)
+    if has_request_context() and 'perf' in g:
+        g.perf['sql'] += elapsed
+    if has_app_context() and elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        metrics.inc('sanad_slow_queries_total', (('endpoint', endpoint),))
+        log.warning('slow query %.1fms on %s: %s params=%.500r',
+                    elapsed * 1000, endpoint, ' '.join(statement.split()), parameters)
+
+
+def _template_started(sender, template, context, **extra):
+    if 'perf' in g:
+        g.perf['render_started'].append(time.perf_counter())
+
+def _template_done(sender, template, context, **extra):
+    if 'perf' in g and g.perf['render_started']:
+        g.perf['render'] += time.perf_counter() - g.perf['render_started'].pop()
+
+
+def _start_request():
+    g.perf = {'started': time.perf_counter(), 'queries': query_count(), 'sql': 0.0,
+              'render': 0.0, 'render_started': [], 'sections': defaultdict(float),
+              'profiler': None}
+    rate = current_app.config['PROFILE_SAMPLE_RATE']
+    if rate and random.random() < rate:
+        g.perf['profiler'] = cProfile.Profile()
+        g.perf['profiler'].enable()
+
+def _finish_request(response):
+    perf = g.pop('perf', None)
+    if perf is None:
+        return response
+    elapsed = time.perf_counter() - perf['started']
+    endpoint = request.endpoint or '-'
+    labels = (('endpoint', endpoint), ('method', request.method))
+    metrics.inc('sanad_requests_total', (*labels, ('status', response.status_code)))
+    metrics.observe('sanad_request_seconds', labels, elapsed)
+    metrics.inc('sanad_sql_statements_total', (('endpoint', endpoint),), query_count() - perf['queries'])
+    metrics.observe('sanad_render_seconds', (('endpoint', endpoint),), perf['render'])
+
+    timing = [f'db;dur={perf["sql"] * 1000:.1f}', f'tpl;dur={perf["render"] * 1000:.1f}']
+    timing += [f'{name};dur={secs * 1000:.1f}' for name, secs in perf['sections'].items()]
+    timing.append(f'total;dur={elapsed * 1000:.1f}')
+    response.headers['Server-Timing'] = ', '.join(timing)
+
+    profiler = perf['profiler']
+    if profiler is not None:
+        profiler.disable()
+        if elapsed * 1000 >= current_app.config['PROFILE_MIN_MS']:
+            os.makedirs(current_app.config['PROFILE_DIR'], exist_ok=True)
+            path = os.path.join(current_app.config['PROFILE_DIR'],
+                                f'{endpoint}-{int(time.time() * 1000)}-{os.getpid()}.prof')
+            profiler.dump_stats(path)
+            log.info('profile of %s (%.0fms) written to %s', endpoint, elapsed * 1000, path)
+    return response
+
+def _metrics_view():
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response(status=401)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_instrumentation(app):
+    """Opt-in (INSTRUMENTATION_ENABLED): request/SQL/template timings, slow query log,
+    sampled cProfile dumps and a Prometheus /metrics endpoint."""
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+    if not app.config['PROFILE_DIR']:
+        app.config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_done, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', _metrics_view)
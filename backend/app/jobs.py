@@ -0,0 +1,175 @@
+import logging
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import case, func, select
+from .extensions import db
+from .models import Job
+
+log = logging.getLogger('sanad.jobs')
+
+PENDING = ('queued', 'running')
+
+jobs_cli = AppGroup('jobs', help='Background job queue.')
+
+HANDLERS = {}
+
+
+class PermanentError(Exception):
+    """Raised by a handler when retrying cannot help (bad payload, missing dependency)."""
+
+
+def handler(kind: str):
+    """Register `fn(**payload)` as the runner for jobs of `kind`."""
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+def enqueue(kind: str, payload=None, dedup_key=None, delay: float = 0):
+    """Add a job to the current session; workers see it once the caller commits.
+
+    With `dedup_key`, nothing is added while an equal job is still queued or running.
+    """
+    if dedup_key and db.session.scalar(
+            select(Job.id).where(Job.dedup_key == dedup_key, Job.status.in_(PENDING)).limit(1)):
+        return None
+    job = Job(kind=kind, payload=payload or {}, dedup_key=dedup_key, status='queued',
+              run_at=datetime.utcnow() + timedelta(seconds=delay),
+              max_attempts=current_app.config['JOB_MAX_ATTEMPTS'])
+    db.session.add(job)
+    return job
+
+
+def _claim(worker: str):
+    table = Job.__table__
+    now = datetime.utcnow()
+    due = (select(table.c.id).where(table.c.status == 'queued', table.c.run_at <= now)
+           .order_by(table.c.run_at, table.c.id))
+    claim = table.update().values(status='running', locked_by=worker, locked_at=now,
+                                  attempts=table.c.attempts + 1)
+    job_id = None
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # SKIP LOCKED: concurrent workers each take a different row without waiting on each other
+        pick = due.limit(1).with_for_update(skip_locked=True).scalar_subquery()
+        job_id = db.session.execute(claim.where(table.c.id == pick).returning(table.c.id)).scalar()
+    else:
+        # no row locks (SQLite): take a due job unless another worker flipped it first
+        for candidate in db.session.scalars(due.limit(5)).all():
+            if db.session.execute(claim.where(table.c.id == candidate,
+                                              table.c.status == 'queued')).rowcount:
+                job_id = candidate
+                break
+    db.session.commit()
+    return job_id
+
+def _backoff(attempts: int) -> float:
+    base = current_app.config['JOB_RETRY_BASE_SECONDS']
+    return min(base * 2 ** (attempts - 1), 3600) * random.uniform(0.8, 1.2)
+
+def reclaim():
+    """Requeue jobs whose worker died mid-run (lease expired); give up on exhausted ones."""
+    table = Job.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    n = db.session.execute(
+        table.update()
+        .where(table.c.status == 'running', table.c.locked_at < cutoff)
+        .values(status=case((table.c.attempts >= table.c.max_attempts, 'failed'), else_='queued'),
+                locked_by=None, last_error='lease expired')).rowcount
+    db.session.commit()
+    return n
+
+def run_one(worker: str) -> bool:
+    """Claim and run one due job. Returns False when the queue had nothing due."""
+    job_id = _claim(worker)
+    if job_id is None:
+        return False
+    job = db.session.get(Job, job_id)
+    started = time.perf_counter()
+    try:
+        fn = HANDLERS.get(job.kind)
+        if fn is None:
+            raise PermanentError(f'no handler for {job.kind}')
+        fn(**job.payload)
+    except Exception as exc:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = traceback.format_exc()[-4000:]
+        job.locked_by = None
+        if isinstance(exc, PermanentError) or job.attempts >= job.max_attempts:
+            job.status, job.finished_at = 'failed', datetime.utcnow()
+            log.error('job %s (%s) failed: %s', job_id, job.kind, exc)
+        else:
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + timedelta(seconds=_backoff(job.attempts))
+            log.warning('job %s (%s) attempt %s failed, retry at %s: %s',
+                        job_id, job.kind, job.attempts, job.run_at, exc)
+    else:
+        job.status, job.finished_at, job.locked_by = 'done', datetime.utcnow(), None
+        log.info('job %s (%s) done in %.0fms', job_id, job.kind, (time.perf_counter() - started) * 1000)
+    db.session.commit()
+    return True
+
+def work(burst=False, poll=None, worker=None):
+    """Run jobs until stopped (SIGTERM/SIGINT finish the current job first); `burst` exits when idle."""
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    poll = poll if poll is not None else current_app.config['JOB_POLL_SECONDS']
+    stopping = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopping.append(True))
+    done, reclaimed_at = 0, 0.0
+    while not stopping:
+        if time.monotonic() - reclaimed_at > 60:
+            reclaim()
+            reclaimed_at = time.monotonic()
+        if run_one(worker):
+            done += 1
+        elif burst:
+            break
+        else:
+            db.session.remove()  # don't hold a connection while idle
+            time.sleep(poll)
+    return done
+
+
+@jobs_cli.command('worker')
+@click.option('--burst', is_flag=True, help='exit once no job is due')
+@click.option('--poll', type=float, help='seconds between polls when idle')
+def worker_command(burst, poll):
+    """Process queued jobs."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+    n = work(burst=burst, poll=poll)
+    click.echo(f'{n} jobs processed')
+
+@jobs_cli.command('status')
+def status_command():
+    """Job counts by kind and status."""
+    rows = db.session.execute(select(Job.kind, Job.status, func.count())
+                              .group_by(Job.kind, Job.status).order_by(Job.kind, Job.status))
+    for kind, status, n in rows:
+        click.echo(f'{kind:20} {status:8} {n}')
+
+@jobs_cli.command('retry')
+def retry_command():
+    """Requeue failed jobs with a fresh attempt budget."""
+    n = db.session.execute(Job.__table__.update().where(Job.status == 'failed')
+                           .values(status='queued', attempts=0, run_at=datetime.utcnow())).rowcount
+    db.session.commit()
+    click.echo(f'{n} jobs requeued')
+
+@jobs_cli.command('purge')
+@click.option('--days', default=7, show_default=True)
+def purge_command(days):
+    """Delete finished jobs older than --days."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    n = db.session.execute(Job.__table__.delete().where(Job.status.in_(('done', 'failed')),
+                                                        Job.finished_at < cutoff)).rowcount
+    db.session.commit()
+    click.echo(f'{n} jobs deleted')
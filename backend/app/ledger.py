@@ -0,0 +1,244 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, event, func, inspect, or_, select, tuple_, union_all
+from .dbutil import upsert_add
+from .extensions import db
+from .models import Customer, CustomerBalance, Invoice, InvoiceArchive, Payment
+
+# What a customer owes is the open amount (grand_total - paid_amount) of their
+# Unpaid invoices less payments left unapplied (credit). customer_balance keeps
+# it per customer, adjusted by the flush hook below in the same transaction as
+# the invoice or payment write, so a statement reads one row by primary key and
+# the collections list is a range scan of ix_customer_balance_balance.
+# Archived invoices are settled and owe nothing, so archiving leaves it alone.
+
+METHODS = {'cash': 'نقداً', 'card': 'بطاقة', 'transfer': 'تحويل بنكي'}
+AGING = (('days_0_30', '0-30 يوماً'), ('days_31_60', '31-60 يوماً'), ('days_60_plus', 'أكثر من 60 يوماً'))
+CENT = Decimal('0.01')
+
+ledger_cli = AppGroup('ledger', help='Customer balances and payments.')
+
+
+def _dec(v) -> Decimal:
+    return Decimal(str(v or 0))
+
+def _open(status, total, paid) -> Decimal:
+    return _dec(total) - _dec(paid) if status == 'Unpaid' else Decimal(0)
+
+def _before(obj, attr):
+    # value before this flush (Invoice keeps active history of the attributes read here)
+    hist = inspect(obj).attrs[attr].history
+    return (hist.deleted or hist.unchanged or hist.added or [None])[0]
+
+def open_amount(obj, before=False) -> Decimal:
+    """What is still owed on invoice `obj`: now, or before the pending flush."""
+    if before:
+        return _open(*(_before(obj, a) for a in ('status', 'grand_total', 'paid_amount')))
+    return _open(obj.status, obj.grand_total, obj.paid_amount)
+
+@event.listens_for(db.session, 'after_flush')
+def _track_balances(session, flush_context):
+    deltas = defaultdict(Decimal)
+    for obj in session.new:
+        if isinstance(obj, Invoice):
+            deltas[obj.customer_id] += open_amount(obj)
+        elif isinstance(obj, Payment):
+            deltas[obj.customer_id] -= _dec(obj.unapplied)
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            deltas[obj.customer_id] -= open_amount(obj, before=True)
+        elif isinstance(obj, Payment):
+            deltas[obj.customer_id] += _dec(obj.unapplied)
+    for obj in session.dirty:
+        if isinstance(obj, Invoice) and session.is_modified(obj):
+            deltas[obj.customer_id] += open_amount(obj) - open_amount(obj, before=True)
+        elif isinstance(obj, Payment) and session.is_modified(obj):  # settle() moving credit
+            deltas[obj.customer_id] -= _dec(obj.unapplied) - _dec(_before(obj, 'unapplied'))
+    bump(session.connection(), deltas)
+
+def bump(conn, deltas):
+    """Apply {customer_id: amount} balance deltas inside the caller's transaction (for Core writes)."""
+    rows = [{'customer_id': k, 'balance': v} for k, v in deltas.items() if k is not None and v]
+    upsert_add(conn, CustomerBalance.__table__, ['customer_id'], rows)
+
+def rebuild(conn) -> int:
+    """Recompute every balance from unpaid invoices and unapplied payments."""
+    amounts = union_all(
+        select(Invoice.customer_id, (Invoice.grand_total - Invoice.paid_amount).label('amount'))
+        .where(Invoice.status == 'Unpaid'),
+        select(Payment.customer_id, -Payment.unapplied)).subquery()
+    rows = [{'customer_id': c, 'balance': b} for c, b in conn.execute(
+        select(amounts.c.customer_id, func.sum(amounts.c.amount))
+        .where(amounts.c.customer_id.is_not(None)).group_by(amounts.c.customer_id)) if b]
+    conn.execute(CustomerBalance.__table__.delete())
+    if rows:
+        conn.execute(CustomerBalance.__table__.insert(), rows)
+    return len(rows)
+
+
+def amount(raw) -> Decimal:
+    try:
+        value = Decimal(str(raw)).quantize(CENT)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'bad amount {raw!r}') from None
+    if not value.is_finite() or value <= 0:
+        raise ValueError('amount must be positive')
+    return value
+
+def record_payment(customer_id, value, method='cash', reference=None, invoice_id=None) -> Payment:
+    """Take a payment: applied to `invoice_id` first, then to the customer's oldest
+    unpaid invoices; what is left over stays as credit for the next invoice
+    (apply_credit). Invoices paid in full
+    become Paid. The caller commits."""
+    if method not in METHODS:
+        raise ValueError(f'unknown payment method {method}')
+    total = remaining = amount(value)
+    # FOR UPDATE (Postgres): a concurrent payment on the same invoices waits for ours
+    invoices = db.session.scalars(
+        select(Invoice).where(Invoice.customer_id == customer_id, Invoice.status == 'Unpaid')
+        .order_by(Invoice.id != invoice_id, Invoice.created_at, Invoice.id).with_for_update()).all()
+    if invoice_id is not None and invoice_id not in {inv.id for inv in invoices}:
+        raise ValueError(f'invoice {invoice_id} is not an unpaid invoice of this customer')
+    paid = []
+    for inv in invoices:
+        if remaining <= 0:
+            break
+        applied = min(_dec(inv.grand_total) - _dec(inv.paid_amount), remaining)
+        inv.paid_amount = _dec(inv.paid_amount) + applied
+        remaining -= applied
+        if inv.paid_amount >= _dec(inv.grand_total):
+            inv.status = 'Paid'
+        paid.append(inv.id)
+    payment = Payment(customer_id=customer_id, amount=total, unapplied=remaining,
+                      method=method, reference=reference,
+                      invoice_id=invoice_id if invoice_id is not None else (paid[0] if len(paid) == 1 else None))
+    db.session.add(payment)
+    db.session.flush()
+    return payment
+
+def apply_credit(inv):
+    """Put the customer's credit (unapplied payments, oldest first) towards new
+    invoice `inv`, as settle() replays it, so a node that takes the invoice agrees
+    with central. The caller commits."""
+    due = _dec(inv.grand_total) - _dec(inv.paid_amount)
+    if inv.status != 'Unpaid' or due <= 0:
+        return
+    credits = db.session.scalars(
+        select(Payment).where(Payment.customer_id == inv.customer_id, Payment.unapplied > 0)
+        .order_by(Payment.created_at, Payment.id).with_for_update()).all()
+    for p in credits:
+        if due <= 0:
+            break
+        applied = min(_dec(p.unapplied), due)
+        p.unapplied = _dec(p.unapplied) - applied
+        due -= applied
+    inv.paid_amount = _dec(inv.grand_total) - due
+    if due <= 0:
+        inv.status = 'Paid'
+
+def settle(customer_ids):
+    """Work paid state out again from the payments: every payment of `customer_ids`
+    is replayed in the order taken, as record_payment() applies it, over their
+    invoices that are unpaid or were paid through the ledger. Central runs this for
+    each pushed batch, so payments taken at a branch and here add up instead of the
+    branch's paid_amount overwriting central's. The caller commits."""
+    customer_ids = {c for c in customer_ids if c is not None}
+    if not customer_ids:
+        return
+    ledgered = or_(Invoice.status == 'Unpaid', Invoice.paid_amount > 0)
+    invoices = db.session.scalars(
+        select(Invoice).where(Invoice.customer_id.in_(customer_ids), ledgered)
+        .order_by(Invoice.created_at, Invoice.id).with_for_update()).all()
+    # archived invoices were paid in full; they still take their share of the payments
+    archived = db.session.execute(
+        select(InvoiceArchive.id, InvoiceArchive.customer_id, InvoiceArchive.grand_total, InvoiceArchive.created_at)
+        .where(InvoiceArchive.customer_id.in_(customer_ids), InvoiceArchive.paid_amount > 0)).all()
+    payments = db.session.scalars(
+        select(Payment).where(Payment.customer_id.in_(customer_ids))
+        .order_by(Payment.created_at, Payment.id).with_for_update()).all()
+    due, queue = {}, defaultdict(list)  # invoice id -> amount still open; customer -> ids, oldest first
+    for id_, customer_id, total, created_at in sorted(
+            [(i.id, i.customer_id, i.grand_total, i.created_at) for i in invoices] + list(archived),
+            key=lambda r: (r[3], r[0])):
+        due[id_] = _dec(total)
+        queue[customer_id].append(id_)
+    for p in payments:
+        remaining = _dec(p.amount)
+        for id_ in ([p.invoice_id] if p.invoice_id in due else []) + queue[p.customer_id]:
+            if remaining <= 0:
+                break
+            applied = min(due[id_], remaining)
+            due[id_] -= applied
+            remaining -= applied
+        if _dec(p.unapplied) != remaining:
+            p.unapplied = remaining
+    for inv in invoices:
+        paid = _dec(inv.grand_total) - due[inv.id]
+        status = 'Paid' if paid and due[inv.id] <= 0 else 'Unpaid'
+        if _dec(inv.paid_amount) != paid or inv.status != status:
+            inv.paid_amount, inv.status = paid, status
+
+
+def balance(customer_id) -> Decimal:
+    row = db.session.get(CustomerBalance, customer_id)
+    return _dec(row.balance if row else 0)
+
+def statement(customer_id, payments=20):
+    """Open invoices (oldest first) and the latest `payments` payments of a customer."""
+    open_invoices = db.session.scalars(
+        select(Invoice).where(Invoice.customer_id == customer_id, Invoice.status == 'Unpaid')
+        .order_by(Invoice.created_at, Invoice.id)).all()
+    recent = db.session.scalars(
+        select(Payment).where(Payment.customer_id == customer_id)
+        .order_by(Payment.created_at.desc(), Payment.id.desc()).limit(payments)).all()
+    return open_invoices, recent
+
+def parse_cursor(value):
+    balance_, _, customer_id = (value or '').partition('|')
+    return (Decimal(balance_), int(customer_id)) if value else None
+
+def collections(after=None, size=50):
+    """Customers who owe money, largest balance first, `size` + 1 rows after the
+    (balance, customer_id) cursor `after`: a range scan of ix_customer_balance_balance."""
+    key = tuple_(CustomerBalance.balance, CustomerBalance.customer_id)
+    stmt = (select(CustomerBalance.customer_id, CustomerBalance.balance, Customer.full_name, Customer.phone)
+            .join(Customer, Customer.id == CustomerBalance.customer_id)
+            .where(CustomerBalance.balance > 0)
+            .order_by(CustomerBalance.balance.desc(), CustomerBalance.customer_id.desc()).limit(size + 1))
+    if after is not None:
+        stmt = stmt.where(key < tuple_(*after))
+    return db.session.execute(stmt).all()
+
+def aging(limit=100, now=None):
+    """Open amounts of unpaid invoices by age (ix_invoice_status_created_at):
+    (totals, the `limit` customers owing most)."""
+    now = now or datetime.utcnow()
+    d30, d60 = now - timedelta(days=30), now - timedelta(days=60)
+    due = Invoice.grand_total - Invoice.paid_amount
+
+    def bucket(cond, name):
+        return func.coalesce(func.sum(case((cond, due), else_=0)), 0).label(name)
+
+    buckets = [bucket(Invoice.created_at >= d30, 'days_0_30'),
+               bucket((Invoice.created_at < d30) & (Invoice.created_at >= d60), 'days_31_60'),
+               bucket(Invoice.created_at < d60, 'days_60_plus')]
+    total = func.coalesce(func.sum(due), 0).label('total')
+    unpaid = Invoice.status == 'Unpaid'
+    totals = db.session.execute(select(*buckets, total).where(unpaid)).one()
+    rows = db.session.execute(
+        select(Customer.id, Customer.full_name, Customer.phone, *buckets, total)
+        .join(Customer, Customer.id == Invoice.customer_id).where(unpaid)
+        .group_by(Customer.id, Customer.full_name, Customer.phone)
+        .order_by(total.desc()).limit(limit)).all()
+    return totals, rows
+
+
+@ledger_cli.command('rebuild')
+def rebuild_command():
+    """Recompute customer balances from invoices and payments."""
+    n = rebuild(db.session.connection())
+    db.session.commit()
+    click.echo(f'{n} customer balances rebuilt')
@@ -1,6 +1,10 @@
+import uuid
 from datetime import datetime
 from .extensions import db
 
+def _uid():
+    return uuid.uuid4().hex
+
 class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(120), nullable=False)
@@ -8,6 +12,9 @@ class Customer(db.Model):
     phone = db.Column(db.String(32))
     email = db.Column(db.String(120))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    search_key = db.Column(db.String(400))  # normalized, see search.build_key
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    uid = db.Column(db.String(32), unique=True, index=True, default=_uid)  # same row on every node, see sync.py
 
 class Service(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -17,35 +24,66 @@ class Service(db.Model):
     gov_fee_type = db.Column(db.String(10), default='fixed')  # fixed/variable
     gov_fee_value = db.Column(db.Numeric(10,2), default=0)
     vat_applicable = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class Ticket(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
     service_id = db.Column(db.Integer, db.ForeignKey('service.id'))
-    status = db.Column(db.String(32), default='New')
+    # active_history: the counter hooks need the old status even when it was never loaded
+    status = db.column_property(db.Column(db.String(32), default='New'), active_history=True)  # see workflow.TRANSITIONS
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    uid = db.Column(db.String(32), unique=True, index=True, default=_uid)
 
     customer = db.relationship('Customer')
     service = db.relationship('Service')
 
+    __table_args__ = (
+        db.Index('ix_ticket_status_created_at', 'status', 'created_at'),  # work queue, oldest first
+        db.Index('ix_ticket_service_status', 'service_id', 'status', 'created_at'),
+    )
+
+class TicketEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), nullable=False, index=True)
+    from_status = db.Column(db.String(32))
+    to_status = db.Column(db.String(32), nullable=False)
+    note = db.Column(db.String(255))
+    batch = db.Column(db.String(32))  # shared by the tickets of one bulk transition
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Invoice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
-    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'))
+    ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'), index=True)
     subtotal_office_fee = db.Column(db.Numeric(10,2), default=0)
     total_gov_fees = db.Column(db.Numeric(10,2), default=0)
     vat_amount = db.Column(db.Numeric(10,2), default=0)
-    grand_total = db.Column(db.Numeric(10,2), default=0)
-    status = db.Column(db.String(32), default='Unpaid')
+    # active_history on what the open amount is made of: the balance and counter hooks
+    # compare old and new values, and an expired attribute would otherwise have no old one
+    grand_total = db.column_property(db.Column(db.Numeric(10,2), default=0), active_history=True)
+    status = db.column_property(db.Column(db.String(32), default='Unpaid'), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    number = db.Column(db.String(32), unique=True, index=True)  # <branch>-<year>-<seq>, see numbering.py
+    idempotency_key = db.Column(db.String(64), unique=True, index=True)  # one invoice per POS form submit
+    uid = db.Column(db.String(32), unique=True, index=True, default=_uid)
+    paid_amount = db.column_property(db.Column(db.Numeric(10,2), nullable=False, default=0),
+                                     active_history=True)  # payments applied, see ledger.py
 
     customer = db.relationship('Customer')
     ticket = db.relationship('Ticket')
 
+    __table_args__ = (
+        db.Index('ix_invoice_customer_status', 'customer_id', 'status', 'created_at'),  # open invoices, oldest first
+        db.Index('ix_invoice_status_created_at', 'status', 'created_at'),  # aging report
+    )
+
 class InvoiceItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'))
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), index=True)
     service_id = db.Column(db.Integer, db.ForeignKey('service.id'))
     qty = db.Column(db.Integer, default=1)
     office_fee = db.Column(db.Numeric(10,2), default=0)
@@ -55,3 +93,111 @@ class InvoiceItem(db.Model):
 
     invoice = db.relationship('Invoice', backref='items')
     service = db.relationship('Service')
+
+class Payment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, index=True)  # no FK: the invoice may move to invoice_archive
+    amount = db.Column(db.Numeric(10,2), nullable=False)
+    unapplied = db.Column(db.Numeric(10,2), nullable=False, default=0)  # left over as customer credit
+    method = db.Column(db.String(16), nullable=False, default='cash')  # see ledger.METHODS
+    reference = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    uid = db.Column(db.String(32), unique=True, index=True, default=_uid)
+
+    customer = db.relationship('Customer')
+
+    __table_args__ = (db.Index('ix_payment_customer_created_at', 'customer_id', 'created_at'),)
+
+class CustomerBalance(db.Model):
+    """What a customer owes: open amounts of unpaid invoices less unapplied credit, kept by ledger.py."""
+    customer_id = db.Column(db.Integer, primary_key=True)
+    balance = db.Column(db.Numeric(14,2), nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_customer_balance_balance', 'balance', 'customer_id'),)  # collections list
+
+class InvoiceSeries(db.Model):
+    branch = db.Column(db.String(16), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+
+class StatCounter(db.Model):
+    name = db.Column(db.String(64), primary_key=True)  # e.g. tickets, revenue:2025-11-05
+    value = db.Column(db.Numeric(18,3), nullable=False, default=0)
+
+class RevenueRollup(db.Model):
+    grain = db.Column(db.String(5), primary_key=True)  # day/month
+    period_start = db.Column(db.Date, primary_key=True)
+    service_id = db.Column(db.Integer, primary_key=True)  # 0 when the item had no service
+    gov_entity = db.Column(db.String(120), primary_key=True, default='')
+    status = db.Column(db.String(32), primary_key=True)
+    lines = db.Column(db.Integer, nullable=False, default=0)
+    qty = db.Column(db.Integer, nullable=False, default=0)
+    office_fee = db.Column(db.Numeric(14,2), nullable=False, default=0)
+    taxable_office_fee = db.Column(db.Numeric(14,2), nullable=False, default=0)
+    vat_amount = db.Column(db.Numeric(14,2), nullable=False, default=0)
+    gov_fees = db.Column(db.Numeric(14,2), nullable=False, default=0)
+    total = db.Column(db.Numeric(14,2), nullable=False, default=0)
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)  # see jobs.handler()
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    dedup_key = db.Column(db.String(120), index=True)  # skip enqueue while an equal job is pending
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued/running/done/failed
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    last_error = db.Column(db.Text)
+    locked_by = db.Column(db.String(64))
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+
+class ChangeLog(db.Model):
+    """Append-only outbox of a branch node: which rows changed, pushed to central by sync.push()."""
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(16), nullable=False)  # customer/ticket/invoice/payment
+    uid = db.Column(db.String(32), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    pushed_at = db.Column(db.DateTime, index=True)
+
+class SyncState(db.Model):
+    name = db.Column(db.String(32), primary_key=True)  # e.g. pull:services
+    value = db.Column(db.String(64))
+
+
+# --- archive ----------------------------------------------------------------
+#
+# Closed tickets and settled invoices older than the archive horizon live in
+# *_archive tables with the same columns (see archive.py); the hot tables keep
+# only what the counter works on. No foreign keys, so rows can move in any order.
+
+def _archive_table(table, indexes=()):
+    cols = [db.Column(c.name, c.type, primary_key=c.primary_key, autoincrement=False)
+            for c in table.columns]
+    return db.Table(f'{table.name}_archive', db.metadata, *cols,
+                    *[db.Index(f'ix_{table.name}_archive_{c}', c) for c in indexes])
+
+class TicketArchive(db.Model):
+    __table__ = _archive_table(Ticket.__table__, ('customer_id', 'created_at', 'uid'))
+
+    customer = db.relationship('Customer', primaryjoin='foreign(TicketArchive.customer_id) == Customer.id')
+    service = db.relationship('Service', primaryjoin='foreign(TicketArchive.service_id) == Service.id')
+
+class TicketEventArchive(db.Model):
+    __table__ = _archive_table(TicketEvent.__table__, ('ticket_id',))
+
+class InvoiceArchive(db.Model):
+    __table__ = _archive_table(Invoice.__table__, ('customer_id', 'created_at', 'number', 'uid'))
+
+    customer = db.relationship('Customer', primaryjoin='foreign(InvoiceArchive.customer_id) == Customer.id')
+    items = db.relationship('InvoiceItemArchive', order_by='InvoiceItemArchive.id',
+                            primaryjoin='foreign(InvoiceItemArchive.invoice_id) == InvoiceArchive.id')
+
+class InvoiceItemArchive(db.Model):
+    __table__ = _archive_table(InvoiceItem.__table__, ('invoice_id',))
+
+    service = db.relationship('Service', primaryjoin='foreign(InvoiceItemArchive.service_id) == Service.id')
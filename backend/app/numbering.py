@@ -0,0 +1,46 @@
+from collections import defaultdict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam, select
+from .dbutil import dialect_insert
+from .extensions import db
+from .models import Invoice, InvoiceSeries
+
+
+def format_number(branch: str, year: int, seq: int) -> str:
+    return f'{branch}-{year}-{seq:06d}'
+
+def _take(conn, branch, year, count=1) -> int:
+    # one upsert .. RETURNING on the series row; the row lock is held only until the caller commits
+    table = InvoiceSeries.__table__
+    stmt = dialect_insert(conn, table).values(branch=branch, year=year, last_number=count)
+    stmt = stmt.on_conflict_do_update(index_elements=['branch', 'year'],
+                                      set_={'last_number': table.c.last_number + count})
+    return conn.execute(stmt.returning(table.c.last_number)).scalar_one()
+
+def assign(inv, branch=None):
+    """Give a flushed invoice the next number of its branch/year series.
+
+    Call it as the last write before commit: concurrent cashiers of the same
+    series wait on the series row only from here to the commit, and a rollback
+    hands the number back, so the series stays gap-free.
+    """
+    branch = branch or current_app.config['BRANCH_CODE']
+    year = (inv.created_at or datetime.utcnow()).year
+    inv.number = format_number(branch, year, _take(db.session.connection(), branch, year))
+    return inv.number
+
+def backfill(conn, branch):
+    """Number every unnumbered invoice in creation order, continuing each year's series."""
+    rows = conn.execute(select(Invoice.id, Invoice.created_at).where(Invoice.number.is_(None))
+                        .order_by(Invoice.created_at, Invoice.id)).all()
+    by_year = defaultdict(list)
+    for id_, created_at in rows:
+        by_year[(created_at or datetime.utcnow()).year].append(id_)
+    table = Invoice.__table__
+    for year, ids in sorted(by_year.items()):
+        first = _take(conn, branch, year, len(ids)) - len(ids) + 1
+        conn.execute(table.update().where(table.c.id == bindparam('_id')),
+                     [{'_id': id_, 'number': format_number(branch, year, first + i)}
+                      for i, id_ in enumerate(ids)])
+    return len(rows)
@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from datetime import datetime
+from flask import abort, current_app, request, url_for
+from sqlalchemy import tuple_
+
+@dataclass
+class Page:
+    rows: list
+    size: int
+    after: int | str | None
+    next_cursor: int | str | None
+    before: int | str | None = None
+    prev_cursor: int | str | None = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def is_first(self):
+        return self.after is None and self.before is None
+
+    def url(self, cursor=None, before=None):
+        # keep the view's filters (q, status, ...) and swap only the cursor
+        args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+        if cursor is not None:
+            args['after'] = cursor
+        if before is not None:
+            args['before'] = before
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+def page_size():
+    size = request.args.get('size', current_app.config['PAGE_SIZE'], type=int)
+    return max(1, min(size, current_app.config['MAX_PAGE_SIZE']))
+
+def _parse_cursor(raw, keys):
+    # "<created_at>|<id>": one value per key, typed like its column
+    parts = raw.split('|')
+    if len(parts) != len(keys):
+        raise ValueError(raw)
+    return tuple(datetime.fromisoformat(p) if k.type.python_type is datetime else k.type.python_type(p)
+                 for k, p in zip(keys, parts))
+
+def _format_cursor(row, keys):
+    if len(keys) == 1:
+        return getattr(row, keys[0].key)
+    return '|'.join(v.isoformat() if isinstance(v, datetime) else str(v)
+                    for v in (getattr(row, k.key) for k in keys))
+
+def _cursor_arg(name, keys):
+    # a cursor the client tampered with is a bad request, not the first page
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    try:
+        values = _parse_cursor(raw, keys)
+    except (TypeError, ValueError):
+        abort(400)
+    return values if len(keys) > 1 else values[0]
+
+def paginate(query, key, *tiebreak, ascending=False):
+    """Keyset-paginate `query` newest first on the integer column `key`.
+
+    The cursor is the last key of the previous page (`?after=<id>`), so every
+    page is an index range scan of `size + 1` rows however deep the client goes.
+    `?before=<id>` walks back the same way: the rows just ahead of the first
+    one shown, read in reverse. With `tiebreak` columns (e.g.
+    `Ticket.created_at, Ticket.id` oldest first with `ascending`) rows are
+    ordered on all of them and the cursor carries each value:
+    `?after=<created_at>|<id>`.
+    """
+    size = page_size()
+    keys = (key, *tiebreak)
+    column = tuple_(*keys) if tiebreak else key
+    after, before = _cursor_arg('after', keys), _cursor_arg('before', keys)
+    backward = before is not None and after is None
+    if after is not None:
+        query = query.filter(column > after if ascending else column < after)
+    elif backward:
+        query = query.filter(column < before if ascending else column > before)
+    forward_order = ascending != backward
+    rows = query.order_by(*[k.asc() if forward_order else k.desc() for k in keys]).limit(size + 1).all()
+    more = len(rows) > size
+    rows = rows[:size]
+    if backward:
+        rows.reverse()
+        next_cursor = _format_cursor(rows[-1], keys) if rows else None
+        prev_cursor = _format_cursor(rows[0], keys) if more else None
+    else:
+        next_cursor = _format_cursor(rows[-1], keys) if more else None
+        prev_cursor = _format_cursor(rows[0], keys) if after is not None and rows else None
+    return Page(rows=rows, size=size, after=request.args.get('after'), next_cursor=next_cursor,
+                before=request.args.get('before') if backward else None, prev_cursor=prev_cursor)
+
+def paginate_rows(rows, key: str):
+    """paginate() over an in-memory sequence already sorted newest first on `key`."""
+    size = page_size()
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            after = int(after)
+        except ValueError:
+            abort(400)
+        rows = [r for r in rows if getattr(r, key) < after]
+    next_cursor = getattr(rows[size - 1], key) if len(rows) > size else None
+    return Page(rows=list(rows[:size]), size=size, after=after, next_cursor=next_cursor)
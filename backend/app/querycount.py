@@ -0,0 +1,36 @@
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+def query_count() -> int:
+    """SQL statements executed so far in the current app/request context."""
+    return g.get('query_count', 0)
+
+def query_budget(limit: int):
+    """Fail (testing / QUERY_BUDGET_STRICT) or warn when a view runs more than `limit` statements.
+
+    Rendering happens inside the view, so lazy loads fired from templates count too.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            start = query_count()
+            rv = view(*args, **kwargs)
+            used = query_count() - start
+            if used > limit:
+                msg = f'{request.endpoint} ran {used} queries (budget {limit})'
+                if current_app.testing or current_app.config['QUERY_BUDGET_STRICT']:
+                    raise QueryBudgetExceeded(msg)
+                current_app.logger.warning(msg)
+            return rv
+        return wrapper
+    return decorator
@@ -0,0 +1,144 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, event, func, inspect, select
+from .dbutil import upsert_add
+from .extensions import db
+from .models import Invoice, InvoiceItem, Service, RevenueRollup, InvoiceArchive, InvoiceItemArchive
+from .stats import with_archive
+
+VOID_STATUSES = ('Cancelled',)
+AMOUNTS = ('lines', 'qty', 'office_fee', 'taxable_office_fee', 'vat_amount', 'gov_fees', 'total')
+
+reporting_cli = AppGroup('reporting', help='Revenue and VAT rollups.')
+
+_NEW = 'rollup_new_invoices'
+_MOVES = 'rollup_status_moves'
+
+
+def _grouped(invoice_ids=None, by_invoice=False, inv=Invoice, item=InvoiceItem):
+    # by_invoice: per-invoice groups without status, for moving amounts between statuses
+    day = func.date(inv.created_at)
+    keys = [inv.id] if by_invoice else []
+    keys += [day, func.coalesce(item.service_id, 0), func.coalesce(Service.gov_entity, '')]
+    if not by_invoice:
+        keys.append(inv.status)
+    stmt = (select(*keys,
+                   func.count(), func.sum(item.qty),
+                   func.sum(item.office_fee),
+                   # the service's flag: a fee small enough to round to 0.00 VAT is still taxable
+                   func.sum(case((Service.vat_applicable.is_(True), item.office_fee), else_=0)),
+                   func.sum(item.vat_amount), func.sum(item.gov_fee),
+                   func.sum(item.line_total))
+            .join(inv, inv.id == item.invoice_id)
+            .outerjoin(Service, Service.id == item.service_id))
+    if invoice_ids is not None:
+        stmt = stmt.where(inv.id.in_(invoice_ids))
+    return stmt.group_by(*keys)
+
+def _add(acc, day, service_id, gov_entity, status, amounts, sign=1):
+    day = date.fromisoformat(str(day))
+    for grain, start in (('day', day), ('month', day.replace(day=1))):
+        row = acc[(grain, start, service_id, gov_entity, status)]
+        for name, value in zip(AMOUNTS, amounts):
+            row[name] += Decimal(str(value or 0)) * sign
+
+def _rows(acc):
+    keys = ('grain', 'period_start', 'service_id', 'gov_entity', 'status')
+    return [{**dict(zip(keys, key)), **amounts, 'lines': int(amounts['lines']), 'qty': int(amounts['qty'])}
+            for key, amounts in acc.items() if any(amounts.values())]
+
+def _accumulator():
+    return defaultdict(lambda: dict.fromkeys(AMOUNTS, Decimal(0)))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect(session, flush_context):
+    new = session.info.setdefault(_NEW, set())
+    for obj in session.new:
+        if isinstance(obj, Invoice):
+            new.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Invoice):
+            hist = inspect(obj).attrs.status.history
+            if hist.added and hist.deleted and hist.added[0] != hist.deleted[0]:
+                session.info.setdefault(_MOVES, []).append((obj.id, hist.deleted[0], hist.added[0]))
+
+@event.listens_for(db.session, 'before_commit')
+def _apply(session):
+    if not session.info.get(_NEW) and not session.info.get(_MOVES):
+        return
+    # items may be bulk-inserted after the invoice flush, so fold them in at commit time
+    session.flush()
+    new = session.info.pop(_NEW, set())
+    moves = [m for m in session.info.pop(_MOVES, []) if m[0] not in new]
+    conn = session.connection()
+    acc = _accumulator()
+    if new:
+        for day, service_id, gov_entity, status, *amounts in conn.execute(_grouped(new)):
+            _add(acc, day, service_id, gov_entity, status, amounts)
+    if moves:
+        by_invoice = defaultdict(list)
+        for invoice_id, *group in conn.execute(_grouped({m[0] for m in moves}, by_invoice=True)):
+            by_invoice[invoice_id].append(group)
+        for invoice_id, old, new_status in moves:
+            for day, service_id, gov_entity, *amounts in by_invoice[invoice_id]:
+                _add(acc, day, service_id, gov_entity, old, amounts, -1)
+                _add(acc, day, service_id, gov_entity, new_status, amounts)
+    upsert_add(conn, RevenueRollup.__table__,
+               ['grain', 'period_start', 'service_id', 'gov_entity', 'status'], _rows(acc))
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop(_NEW, None)
+    session.info.pop(_MOVES, None)
+
+
+def rebuild(conn):
+    """Recompute all rollup rows from invoice items, archived ones included."""
+    items = {Invoice: InvoiceItem, InvoiceArchive: InvoiceItemArchive}
+    acc = _accumulator()
+    for inv in with_archive(conn, Invoice):
+        for day, service_id, gov_entity, status, *amounts in conn.execute(
+                _grouped(inv=inv, item=items[inv])):
+            _add(acc, day, service_id, gov_entity, status, amounts)
+    conn.execute(RevenueRollup.__table__.delete())
+    rows = _rows(acc)
+    if rows:
+        conn.execute(RevenueRollup.__table__.insert(), rows)
+    return len(rows)
+
+
+def _month_aligned(start: date, end: date) -> bool:
+    return start.day == 1 and (end + timedelta(days=1)).day == 1
+
+def summary(start: date, end: date, by=('gov_entity',), statuses=None):
+    """Aggregate rollups for [start, end], reading month rows when the range allows it."""
+    grain = 'month' if _month_aligned(start, end) else 'day'
+    cols = [getattr(RevenueRollup, name) for name in by]
+    stmt = (select(*cols, *[func.sum(getattr(RevenueRollup, a)).label(a) for a in AMOUNTS])
+            .where(RevenueRollup.grain == grain,
+                   RevenueRollup.period_start >= start,
+                   RevenueRollup.period_start <= end)
+            .group_by(*cols).order_by(*cols))
+    if statuses is not None:
+        stmt = stmt.where(RevenueRollup.status.in_(statuses))
+    else:
+        stmt = stmt.where(RevenueRollup.status.notin_(VOID_STATUSES))
+    return db.session.execute(stmt).all()
+
+def vat_return(start: date, end: date):
+    """Totals for a VAT filing period: office fees (taxable/exempt), output VAT, pass-through gov fees."""
+    rows = summary(start, end, by=())
+    totals = rows[0]._asdict() if rows else {}
+    return {a: totals.get(a) or Decimal(0) for a in AMOUNTS}
+
+
+@reporting_cli.command('rebuild')
+def rebuild_command():
+    """Recompute revenue rollups from invoice items."""
+    n = rebuild(db.session.connection())
+    db.session.commit()
+    click.echo(f'{n} rollup rows rebuilt')
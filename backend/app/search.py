@@ -0,0 +1,104 @@
+import re
+import unicodedata
+from sqlalchemy import DDL, Index, and_, column, event, func, select, table
+from .extensions import db
+from .models import Customer
+
+# تشكيل + تطويل
+_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_FOLD = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه', 'ى': 'ي', 'ؤ': 'و', 'ئ': 'ي',
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06f0 + i): str(i) for i in range(10)},
+})
+
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customer_fts USING fts5("
+    "search_key, content='customer', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS customer_fts_ai AFTER INSERT ON customer BEGIN "
+    "INSERT INTO customer_fts(rowid, search_key) VALUES (new.id, new.search_key); END",
+    "CREATE TRIGGER IF NOT EXISTS customer_fts_ad AFTER DELETE ON customer BEGIN "
+    "INSERT INTO customer_fts(customer_fts, rowid, search_key) VALUES ('delete', old.id, old.search_key); END",
+    "CREATE TRIGGER IF NOT EXISTS customer_fts_au AFTER UPDATE OF search_key ON customer BEGIN "
+    "INSERT INTO customer_fts(customer_fts, rowid, search_key) VALUES ('delete', old.id, old.search_key); "
+    "INSERT INTO customer_fts(rowid, search_key) VALUES (new.id, new.search_key); END",
+)
+
+_fts = table('customer_fts', column('rowid'), column('rank'), column('customer_fts'))
+
+Index('ix_customer_search_key_trgm', Customer.search_key,
+      postgresql_using='gin',
+      postgresql_ops={'search_key': 'gin_trgm_ops'}).ddl_if(dialect='postgresql')
+
+event.listen(Customer.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+for _stmt in FTS_DDL:
+    event.listen(Customer.__table__, 'after_create', DDL(_stmt).execute_if(dialect='sqlite'))
+
+
+def normalize(value) -> str:
+    """Fold Arabic spelling variants so أحمد/احمد and فاطمة/فاطمه share one key."""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKC', str(value))
+    value = _MARKS.sub('', value).translate(_FOLD).casefold()
+    return ' '.join(value.split())
+
+def build_key(c) -> str:
+    name = normalize(c.full_name)
+    parts = [name, normalize(c.national_id), normalize(c.phone), normalize(c.email)]
+    # "زهر" should find "الزهراء": index names without the definite article too
+    parts += [w[2:] for w in name.split() if w.startswith('ال') and len(w) > 4]
+    digits = re.sub(r'\D', '', normalize(c.phone))
+    if digits:
+        parts.append(digits)
+        if len(digits) > 8:
+            parts.append(digits[-8:])  # local number without the 968 prefix
+    return ' '.join(p for p in parts if p)
+
+@event.listens_for(Customer, 'before_insert')
+@event.listens_for(Customer, 'before_update')
+def _set_search_key(mapper, connection, target):
+    target.search_key = build_key(target)
+
+
+def _fts_query(key: str) -> str:
+    # every typed word must match as a prefix: "احمد"* "سال"*
+    return ' '.join('"%s"*' % tok.replace('"', '""') for tok in key.split())
+
+def _contains_words(key):
+    # every typed word must appear, in any order, as with the FTS query on SQLite
+    return and_(*[Customer.search_key.contains(w, autoescape=True) for w in key.split()])
+
+def _dialect() -> str:
+    return db.session.get_bind().dialect.name
+
+def match(q):
+    """WHERE criterion selecting customers whose search key matches `q`."""
+    key = normalize(q)
+    if _dialect() == 'sqlite':
+        ids = select(_fts.c.rowid).where(_fts.c.customer_fts.match(_fts_query(key)))
+        return Customer.id.in_(ids)
+    return _contains_words(key)
+
+def search(q, limit: int = 10):
+    """Ranked lookup used by the as-you-type box."""
+    key = normalize(q)
+    if not key:
+        return []
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        stmt = (select(Customer)
+                .join(_fts, _fts.c.rowid == Customer.id)
+                .where(_fts.c.customer_fts.match(_fts_query(key)))
+                .order_by(_fts.c.rank))
+    elif dialect == 'postgresql':
+        stmt = (select(Customer)
+                .where(_contains_words(key))
+                .order_by(func.similarity(Customer.search_key, key).desc(), Customer.id.desc()))
+    else:
+        stmt = (select(Customer)
+                .where(_contains_words(key))
+                .order_by(Customer.id.desc()))
+    return db.session.scalars(stmt.limit(limit)).all()
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func, inspect, select, union_all
+from .dbutil import upsert_add
+from .extensions import db
+from .models import Customer, Ticket, Invoice, StatCounter, TicketArchive, InvoiceArchive
+from .ledger import open_amount
+
+STATUS_PREFIX = 'tickets:status:'
+REVENUE_PREFIX = 'revenue:'
+ARCHIVE_GENERATION = 'archive:batches'  # bumped per archived batch, see archive.run
+SYNC_GENERATION = 'sync:batches'  # bumped per branch batch applied on central, see sync.apply
+GENERATIONS = (ARCHIVE_GENERATION, SYNC_GENERATION)  # changes not visible in max(id)/max(updated_at)
+_PENDING = 'stat_deltas'
+
+stats_cli = AppGroup('stats', help='Dashboard counters.')
+
+_cache = {'at': 0.0, 'data': None}
+_cache_lock = threading.Lock()
+
+
+def _day(ts) -> str:
+    return (ts or datetime.utcnow()).date().isoformat()
+
+def _invoice_deltas(deltas, inv, sign):
+    total = Decimal(str(inv.grand_total or 0)) * sign
+    deltas['invoices'] += sign
+    deltas[REVENUE_PREFIX + _day(inv.created_at)] += total
+    deltas['unpaid_total'] += open_amount(inv) * sign  # grand_total - paid_amount while Unpaid
+
+def _status_change(obj):
+    hist = inspect(obj).attrs.status.history
+    if hist.added and hist.deleted and hist.added[0] != hist.deleted[0]:
+        return hist.deleted[0], hist.added[0]
+    return None
+
+@event.listens_for(db.session, 'after_flush')
+def _track_counters(session, flush_context):
+    # only collected here: the shared rows (invoices, revenue:<day>, ...) are written
+    # at commit, so they stay locked from there to the end of the transaction only
+    deltas = session.info.setdefault(_PENDING, defaultdict(Decimal))
+    for sign, objs in ((1, session.new), (-1, session.deleted)):
+        for obj in objs:
+            if isinstance(obj, Customer):
+                deltas['customers'] += sign
+            elif isinstance(obj, Ticket):
+                deltas['tickets'] += sign
+                deltas[f'{STATUS_PREFIX}{obj.status}'] += sign
+            elif isinstance(obj, Invoice):
+                _invoice_deltas(deltas, obj, sign)
+    for obj in session.dirty:
+        if isinstance(obj, Ticket) and (change := _status_change(obj)):
+            old, new = change
+            deltas[f'{STATUS_PREFIX}{old}'] -= 1
+            deltas[f'{STATUS_PREFIX}{new}'] += 1
+        elif isinstance(obj, Invoice) and session.is_modified(obj):  # status or a payment
+            deltas['unpaid_total'] += open_amount(obj) - open_amount(obj, before=True)
+
+@event.listens_for(db.session, 'before_commit')
+def _apply_counters(session):
+    session.flush()  # commit flushes only after this hook: collect what is still pending
+    if _PENDING in session.info:
+        bump(session.connection(), session.info.pop(_PENDING))
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop(_PENDING, None)
+
+def bump(conn, deltas):
+    """Apply counter deltas inside the caller's transaction (for Core bulk writes)."""
+    rows = [{'name': k, 'value': v} for k, v in deltas.items() if v]
+    upsert_add(conn, StatCounter.__table__, ['name'], rows)
+
+
+def with_archive(conn, *models):
+    """`models` plus their archive twins, once the archive tables exist (older
+    migrations rebuild counters before they do)."""
+    twins = {Ticket: TicketArchive, Invoice: InvoiceArchive}
+    if not inspect(conn).has_table(InvoiceArchive.__tablename__):
+        return models
+    return [m for model in models for m in (model, twins.get(model)) if m is not None]
+
+def rebuild(conn):
+    """Recompute every counter from the base tables, archived rows included."""
+    tickets = union_all(*[select(m.status) for m in with_archive(conn, Ticket)]).subquery()
+    invoices = union_all(*[select(m.created_at, m.grand_total, m.status,
+                                  (m.grand_total - func.coalesce(m.paid_amount, 0)).label('open'))
+                           for m in with_archive(conn, Invoice)]).subquery()
+    day = func.date(invoices.c.created_at)
+    counts = {
+        'customers': conn.scalar(select(func.count()).select_from(Customer)),
+        'tickets': conn.scalar(select(func.count()).select_from(tickets)),
+        'invoices': conn.scalar(select(func.count()).select_from(invoices)),
+        'unpaid_total': conn.scalar(select(func.coalesce(func.sum(invoices.c.open), 0))
+                                    .where(invoices.c.status == 'Unpaid')),
+    }
+    for status, n in conn.execute(select(tickets.c.status, func.count()).group_by(tickets.c.status)):
+        counts[f'{STATUS_PREFIX}{status}'] = n
+    for d, total in conn.execute(select(day, func.sum(invoices.c.grand_total)).group_by(day)):
+        counts[REVENUE_PREFIX + str(d)] = total
+    counts.update(conn.execute(select(StatCounter.name, StatCounter.value)
+                               .where(StatCounter.name.in_(GENERATIONS))).all())
+    conn.execute(StatCounter.__table__.delete())
+    conn.execute(StatCounter.__table__.insert(),
+                 [{'name': k, 'value': v or 0} for k, v in counts.items()])
+
+
+def _load():
+    today = REVENUE_PREFIX + _day(None)
+    rows = db.session.execute(
+        select(StatCounter.name, StatCounter.value)
+        .where(StatCounter.name.in_(['customers', 'tickets', 'invoices', 'unpaid_total', today])
+               | StatCounter.name.startswith(STATUS_PREFIX))).all()
+    values = dict(rows)
+    return {
+        'customers': int(values.get('customers', 0)),
+        'tickets': int(values.get('tickets', 0)),
+        'invoices': int(values.get('invoices', 0)),
+        'revenue_today': values.get(today, Decimal('0')),
+        'unpaid_total': values.get('unpaid_total', Decimal('0')),
+        'tickets_by_status': {k[len(STATUS_PREFIX):]: int(v) for k, v in values.items()
+                              if k.startswith(STATUS_PREFIX) and v},
+    }
+
+def snapshot():
+    """Dashboard figures: one indexed read of stat_counter, cached for STATS_CACHE_TTL seconds."""
+    ttl = current_app.config['STATS_CACHE_TTL']
+    now = time.monotonic()
+    with _cache_lock:
+        if _cache['data'] is not None and now - _cache['at'] < ttl:
+            return _cache['data']
+    data = _load()
+    with _cache_lock:
+        _cache.update(at=now, data=data)
+    return data
+
+def invalidate():
+    with _cache_lock:
+        _cache['data'] = None
+
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Recompute dashboard counters from scratch."""
+    rebuild(db.session.connection())
+    db.session.commit()
+    invalidate()
+    click.echo('stat counters rebuilt')
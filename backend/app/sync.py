@@ -0,0 +1,533 @@
+import gzip
+import json
+import signal
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from urllib.parse import urlencode
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import and_, bindparam, event, func, or_, select, update
+from .dbutil import dialect_insert
+from .extensions import db
+from .models import (ChangeLog, Customer, Service, SyncState, Ticket, Invoice, InvoiceItem, Payment,
+                     TicketArchive, InvoiceArchive, InvoiceItemArchive)
+from .search import build_key
+from . import catalog, ledger, stats
+
+# A branch node is this app on a local SQLite file with SYNC_ROLE=branch: checkout
+# commits locally and never waits on the network. Every change to a customer,
+# ticket, invoice or payment leaves a ChangeLog row; `flask sync run` pushes them to the
+# central node (SYNC_ROLE=central) in gzip'd JSON batches and pulls the service
+# catalog and customers back.
+#
+# Ids are per node, so rows are matched on natural keys: customers on national_id
+# (uid without one), invoices on their number (each branch numbers its own
+# BRANCH_CODE series, see numbering.py), tickets and payments on uid. Service ids are central's:
+# branches only receive the catalog. On conflict the newer updated_at wins.
+#
+# Paid state is central's: a customer can pay at a branch and at HQ, so central
+# replays every node's payments (ledger.settle) rather than taking the branch's
+# status and paid_amount, and each branch pulls the result for its own invoices.
+
+ENTITIES = {'customer': Customer, 'ticket': Ticket, 'invoice': Invoice, 'payment': Payment}
+ARCHIVES = {Ticket: TicketArchive, Invoice: InvoiceArchive}
+CUSTOMER_FIELDS = ('full_name', 'national_id', 'phone', 'email')
+SERVICE_FIELDS = ('id', 'name', 'gov_entity', 'office_fee', 'gov_fee_type', 'gov_fee_value',
+                  'vat_applicable', 'updated_at')
+AMOUNTS = ('subtotal_office_fee', 'total_gov_fees', 'vat_amount', 'grand_total')
+PAYMENT_FIELDS = ('amount', 'unapplied', 'method', 'reference')
+ITEM_FIELDS = ('service_id', 'qty', 'office_fee', 'gov_fee', 'vat_amount', 'line_total')
+PULLED = ('services', 'customers', 'invoices')
+PAID_STATE = ('uid', 'status', 'paid_amount', 'updated_at')
+_LOGGED = 'sync_logged'
+
+sync_cli = AppGroup('sync', help='Branch node <-> central database.')
+
+
+class SyncError(Exception):
+    """A batch the other side refused; its change log rows stay queued."""
+
+
+def is_branch() -> bool:
+    return has_app_context() and current_app.config['SYNC_ROLE'] == 'branch'
+
+def encode(v):
+    if isinstance(v, Decimal):
+        return str(v)
+    if isinstance(v, datetime):
+        return v.isoformat()
+    raise TypeError(f'{type(v).__name__} is not JSON serializable')
+
+def _ts(v):
+    return datetime.fromisoformat(v) if v else None
+
+def _dec(v):
+    return Decimal(v) if v is not None else None
+
+def _newer(row, obj) -> bool:
+    return obj.updated_at is None or (_ts(row['updated_at']) or datetime.min) > obj.updated_at
+
+
+# --- branch: change log -------------------------------------------------------
+
+def record(conn, entity, uids):
+    """Log changed rows for Core writes, which the flush hook does not see."""
+    if uids and is_branch():
+        now = datetime.utcnow()
+        conn.execute(ChangeLog.__table__.insert(),
+                     [{'entity': entity, 'uid': uid, 'created_at': now} for uid in uids])
+
+@event.listens_for(db.session, 'after_flush')
+def _log_changes(session, flush_context):
+    if not is_branch():
+        return
+    # a row flushed twice in one transaction (invoice, then its number) is logged once
+    logged = session.info.setdefault(_LOGGED, set())
+    changed = defaultdict(list)
+    for obj in (*session.new, *session.dirty):
+        for entity, model in ENTITIES.items():
+            if (isinstance(obj, model) and (entity, obj.uid) not in logged
+                    and (obj in session.new or session.is_modified(obj))):
+                logged.add((entity, obj.uid))
+                changed[entity].append(obj.uid)
+    for entity, uids in changed.items():
+        record(session.connection(), entity, uids)
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def _forget_logged(session):
+    session.info.pop(_LOGGED, None)
+
+
+def _rows(model, uids, *cols, join=None):
+    """Current state of rows `uids` of `model` and its archive twin, as dicts."""
+    rows = []
+    for m in (model, ARCHIVES.get(model)):
+        if m is not None and uids:
+            stmt = select(*[getattr(m, c) for c in cols], *(join(m) if join else ())).where(m.uid.in_(uids))
+            rows += [dict(r._mapping) for r in db.session.execute(stmt)]
+    return rows
+
+def _customer_uid(m):
+    return [select(Customer.uid).where(Customer.id == m.customer_id).scalar_subquery().label('customer')]
+
+def _invoice_refs(m):
+    ticket = func.coalesce(select(Ticket.uid).where(Ticket.id == m.ticket_id).scalar_subquery(),
+                           select(TicketArchive.uid).where(TicketArchive.id == m.ticket_id).scalar_subquery())
+    return [*_customer_uid(m), ticket.label('ticket')]
+
+def _payment_refs(m):
+    invoice = func.coalesce(select(Invoice.uid).where(Invoice.id == m.invoice_id).scalar_subquery(),
+                            select(InvoiceArchive.uid).where(InvoiceArchive.id == m.invoice_id).scalar_subquery())
+    return [*_customer_uid(m), invoice.label('invoice')]
+
+def _items(invoices):
+    by_invoice = defaultdict(list)
+    for model in (InvoiceItem, InvoiceItemArchive):
+        ids = [inv['id'] for inv in invoices]
+        for row in db.session.execute(select(model.invoice_id, *[getattr(model, f) for f in ITEM_FIELDS])
+                                      .where(model.invoice_id.in_(ids)).order_by(model.id)):
+            by_invoice[row.invoice_id].append(dict(zip(ITEM_FIELDS, row[1:])))
+    for inv in invoices:
+        inv['items'] = by_invoice[inv.pop('id')]
+    return invoices
+
+def _batch(limit):
+    """The oldest `limit` unpushed log rows and the current state of what they name.
+
+    Tickets and customers referenced by the batch ride along, so central never
+    sees an invoice before its ticket or customer, whatever batch those landed in.
+    """
+    log = db.session.execute(select(ChangeLog.id, ChangeLog.entity, ChangeLog.uid)
+                             .where(ChangeLog.pushed_at.is_(None)).order_by(ChangeLog.id).limit(limit)).all()
+    uids = defaultdict(set)
+    for _, entity, uid in log:
+        uids[entity].add(uid)
+    payments = _rows(Payment, uids['payment'], 'uid', *PAYMENT_FIELDS, 'created_at', join=_payment_refs)
+    uids['invoice'] |= {p['invoice'] for p in payments if p['invoice']}
+    invoices = _items(_rows(Invoice, uids['invoice'], 'id', 'uid', 'number', 'idempotency_key', 'status',
+                            *AMOUNTS, 'paid_amount', 'created_at', 'updated_at', join=_invoice_refs))
+    uids['ticket'] |= {inv['ticket'] for inv in invoices if inv['ticket']}
+    tickets = _rows(Ticket, uids['ticket'], 'uid', 'service_id', 'status', 'notes',
+                    'created_at', 'updated_at', join=_customer_uid)
+    uids['customer'] |= {row['customer'] for row in (*tickets, *invoices, *payments) if row['customer']}
+    customers = _rows(Customer, uids['customer'], 'uid', *CUSTOMER_FIELDS, 'created_at', 'updated_at')
+    return log, {'customers': customers, 'tickets': tickets, 'invoices': invoices, 'payments': payments}
+
+
+# --- central: applying a pushed batch ---------------------------------------
+
+def _apply_customers(rows, counts):
+    nids = [r['national_id'] for r in rows if r['national_id']]
+    by_uid, by_nid = {}, {}
+    for c in db.session.scalars(select(Customer).where(
+            or_(Customer.uid.in_([r['uid'] for r in rows]), Customer.national_id.in_(nids)))):
+        by_uid[c.uid] = c
+        if c.national_id:
+            by_nid[c.national_id] = c
+    applied = {}
+    for r in rows:
+        c = (r['national_id'] and by_nid.get(r['national_id'])) or by_uid.get(r['uid'])
+        if c is None:
+            c = Customer(uid=r['uid'], created_at=_ts(r['created_at']))
+            db.session.add(c)
+            counts['customers:created'] += 1
+        elif _newer(r, c):
+            counts['customers:updated'] += 1
+        else:
+            applied[r['uid']] = c
+            continue
+        for f in CUSTOMER_FIELDS:
+            setattr(c, f, r[f])
+        c.updated_at = _ts(r['updated_at'])  # the branch's edit time: later conflicts compare it
+        applied[r['uid']] = by_uid[c.uid] = c
+        if c.national_id:
+            by_nid[c.national_id] = c
+    return applied
+
+def _apply_tickets(rows, customers, counts):
+    uids = [r['uid'] for r in rows]
+    found = {t.uid: t for t in db.session.scalars(select(Ticket).where(Ticket.uid.in_(uids)))}
+    archived = set(db.session.scalars(select(TicketArchive.uid).where(TicketArchive.uid.in_(uids))))
+    for r in rows:
+        t = found.get(r['uid'])
+        if r['uid'] in archived or (t is not None and not _newer(r, t)):
+            continue
+        if t is None:
+            t = found[r['uid']] = Ticket(uid=r['uid'], created_at=_ts(r['created_at']))
+            db.session.add(t)
+            counts['tickets:created'] += 1
+        else:
+            counts['tickets:updated'] += 1
+        t.customer = customers.get(r['customer'])
+        t.service_id, t.status, t.notes = r['service_id'], r['status'], r['notes']
+        t.updated_at = _ts(r['updated_at'])
+    return found
+
+def _item(i):
+    return InvoiceItem(service_id=i['service_id'], qty=i['qty'], **{f: _dec(i[f]) for f in ITEM_FIELDS[2:]})
+
+def _branch_status(r, current):
+    # Unpaid/Paid follow the payments (ledger.settle); only an invoice marked Paid with
+    # nothing paid through the ledger (settled before it existed), or another status, is taken
+    if r['status'] == 'Unpaid' or (r['status'] == 'Paid' and _dec(r.get('paid_amount') or '0')):
+        return current
+    return r['status']
+
+def _apply_invoices(rows, customers, tickets, counts):
+    uids = [r['uid'] for r in rows]
+    numbers = [r['number'] for r in rows if r['number']]
+    by_uid, by_number = {}, {}
+    for inv in db.session.scalars(select(Invoice).where(or_(Invoice.uid.in_(uids), Invoice.number.in_(numbers)))):
+        by_uid[inv.uid] = inv
+        if inv.number:
+            by_number[inv.number] = inv
+    archived = set()
+    for uid, number in db.session.execute(select(InvoiceArchive.uid, InvoiceArchive.number).where(
+            or_(InvoiceArchive.uid.in_(uids), InvoiceArchive.number.in_(numbers)))):
+        archived |= {uid, number}
+    for r in rows:
+        if r['uid'] in archived or r['number'] in archived:
+            continue
+        inv = (r['number'] and by_number.get(r['number'])) or by_uid.get(r['uid'])
+        if inv is None:
+            # amounts and items are fixed at checkout; only the status changes later
+            inv = Invoice(uid=r['uid'], number=r['number'], idempotency_key=r['idempotency_key'],
+                          customer=customers.get(r['customer']), ticket=tickets.get(r['ticket']),
+                          status=_branch_status(r, 'Unpaid'), paid_amount=Decimal(0),
+                          created_at=_ts(r['created_at']), **{a: _dec(r[a]) for a in AMOUNTS},
+                          items=[_item(i) for i in r['items']])
+            db.session.add(inv)
+            by_uid[inv.uid] = inv
+            counts['invoices:created'] += 1
+        elif _newer(r, inv):
+            counts['invoices:updated'] += 1
+        else:
+            continue
+        inv.status = _branch_status(r, inv.status)
+        inv.updated_at = _ts(r['updated_at'])
+    return by_uid
+
+def _apply_payments(rows, customers, counts):
+    uids = [r['uid'] for r in rows]
+    known = set(db.session.scalars(select(Payment.uid).where(Payment.uid.in_(uids))))
+    refs = [r['invoice'] for r in rows if r['invoice']]
+    invoice_ids = dict(db.session.execute(select(Invoice.uid, Invoice.id).where(Invoice.uid.in_(refs))).all())
+    invoice_ids.update(db.session.execute(
+        select(InvoiceArchive.uid, InvoiceArchive.id).where(InvoiceArchive.uid.in_(refs))).all())
+    for r in rows:
+        if r['uid'] in known:  # payments never change once taken
+            continue
+        db.session.add(Payment(uid=r['uid'], customer=customers.get(r['customer']),
+                               invoice_id=invoice_ids.get(r['invoice']), amount=_dec(r['amount']),
+                               unapplied=_dec(r['unapplied']), method=r['method'], reference=r['reference'],
+                               created_at=_ts(r['created_at'])))
+        known.add(r['uid'])
+        counts['payments:created'] += 1
+
+def apply(batch) -> Counter:
+    """Apply a pushed batch on central through the ORM, so counters, revenue rollups,
+    customer balances and the catalog hooks see it like any other write. The caller commits."""
+    counts = Counter()
+    customers = _apply_customers(batch.get('customers', []), counts)
+    tickets = _apply_tickets(batch.get('tickets', []), customers, counts)
+    invoice_rows, payment_rows = batch.get('invoices', []), batch.get('payments', [])
+    invoices = _apply_invoices(invoice_rows, customers, tickets, counts)
+    db.session.flush()
+    _apply_payments(payment_rows, customers, counts)
+    db.session.flush()
+    ledger.settle({customers[r['customer']].id for r in (*invoice_rows, *payment_rows)
+                   if r['customer'] in customers})
+    # where central's paid state differs from what the branch sent, make sure the branch's
+    # next pull (after its cursor, see changes_since) brings it back
+    now = datetime.utcnow()
+    for r in invoice_rows:
+        inv = invoices.get(r['uid'])
+        if inv is not None and (inv.status, _dec(inv.paid_amount)) != (r['status'], _dec(r.get('paid_amount') or '0')):
+            inv.updated_at = now
+    db.session.flush()
+    # applied rows keep the branch's (older) updated_at: bump the API's list version
+    stats.bump(db.session.connection(), {stats.SYNC_GENERATION: 1})
+    return counts
+
+
+# --- central: what branches pull ---------------------------------------------
+
+def _cursor(value):
+    ts, _, last_id = (value or '').partition('|')
+    return _ts(ts), int(last_id or 0)
+
+def changes_since(cursors, limit, branch=None):
+    """Services, customers and the paid state of `branch`'s invoices changed after each
+    `cursors` entry ("<updated_at>|<id>"), oldest first, at most `limit` of each; ids
+    break ties of bulk-imported rows."""
+    out = {'cursors': {}, 'more': False}
+    sources = [('services', Service, SERVICE_FIELDS, None),
+               ('customers', Customer, ('id', 'uid', *CUSTOMER_FIELDS, 'created_at', 'updated_at'), None)]
+    if branch:
+        sources.append(('invoices', Invoice, ('id', *PAID_STATE),
+                        Invoice.number.startswith(f'{branch}-', autoescape=True)))
+    for name, model, cols, where in sources:
+        ts, last_id = _cursor(cursors.get(name))
+        stmt = select(*[getattr(model, c) for c in cols]).order_by(model.updated_at, model.id).limit(limit)
+        if where is not None:
+            stmt = stmt.where(where)
+        if ts:
+            stmt = stmt.where(or_(model.updated_at > ts, and_(model.updated_at == ts, model.id > last_id)))
+        rows = [dict(r._mapping) for r in db.session.execute(stmt)]
+        if rows:
+            out['cursors'][name] = f'{rows[-1]["updated_at"].isoformat()}|{rows[-1]["id"]}'
+        out['more'] |= len(rows) == limit
+        out[name] = rows
+    return out
+
+
+# --- branch: storing what was pulled -----------------------------------------
+
+def _store_services(rows):
+    table = Service.__table__
+    for r in rows:
+        r.update(office_fee=_dec(r['office_fee']), gov_fee_value=_dec(r['gov_fee_value']),
+                 updated_at=_ts(r['updated_at']))
+    stmt = dialect_insert(db.session.get_bind(), table)
+    stmt = stmt.on_conflict_do_update(index_elements=['id'],
+                                      set_={c: stmt.excluded[c] for c in SERVICE_FIELDS if c != 'id'})
+    db.session.execute(stmt, rows)
+
+def _store_customers(rows):
+    """Central's customers. Matched on uid first, so a customer created here keeps its
+    row when central gives it a national_id or changes it; the national_id upsert only
+    merges central's row into a local one under another uid."""
+    table = Customer.__table__
+    for r in rows:
+        r.pop('id')
+        r.update(created_at=_ts(r['created_at']), updated_at=_ts(r['updated_at']))
+        r['search_key'] = build_key(SimpleNamespace(**r))
+    before = db.session.scalar(select(func.count()).select_from(Customer))
+    local = dict(db.session.execute(select(Customer.uid, Customer.national_id).where(
+        Customer.uid.in_([r['uid'] for r in rows]))).all())
+    known = [r for r in rows if r['uid'] in local]
+    if known:
+        held = dict(db.session.execute(select(Customer.national_id, Customer.uid).where(
+            Customer.national_id.in_([r['national_id'] for r in known if r['national_id']]))).all())
+        for r in known:
+            if held.get(r['national_id'], r['uid']) != r['uid']:
+                r['national_id'] = local[r['uid']]  # another local row has it: keep ours
+        stmt = update(table).where(
+            table.c.uid == bindparam('b_uid'),
+            # a local edit not pushed yet is newer: keep it
+            or_(table.c.updated_at.is_(None), table.c.updated_at < bindparam('b_updated_at')))
+        db.session.execute(stmt, [{**{c: r[c] for c in (*CUSTOMER_FIELDS, 'search_key', 'updated_at')},
+                                   'b_uid': r['uid'], 'b_updated_at': r['updated_at']} for r in known])
+    for key, subset in (('national_id', [r for r in rows if r['uid'] not in local and r['national_id']]),
+                        ('uid', [r for r in rows if r['uid'] not in local and not r['national_id']])):
+        if not subset:
+            continue
+        stmt = dialect_insert(db.session.get_bind(), table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key],
+            set_={c: stmt.excluded[c] for c in ('uid', *CUSTOMER_FIELDS, 'search_key', 'updated_at')},
+            where=or_(table.c.updated_at.is_(None), table.c.updated_at < stmt.excluded.updated_at))
+        db.session.execute(stmt, subset)
+    # Core upserts: the counters' flush hook does not see them
+    created = db.session.scalar(select(func.count()).select_from(Customer)) - before
+    stats.bump(db.session.connection(), {'customers': created})
+
+def _store_invoices(rows):
+    """Central's paid state of this branch's invoices. An invoice with changes not
+    pushed yet (a payment taken since) keeps its own: central sends it again once it
+    has them. Through the ORM, so balances and counters follow; not logged back."""
+    by_uid = {r['uid']: r for r in rows}
+    pending = set(db.session.scalars(select(ChangeLog.uid).where(
+        ChangeLog.entity == 'invoice', ChangeLog.pushed_at.is_(None), ChangeLog.uid.in_(list(by_uid)))))
+    logged = db.session.info.setdefault(_LOGGED, set())
+    for inv in db.session.scalars(select(Invoice).where(Invoice.uid.in_(list(by_uid)))):
+        if inv.uid in pending:
+            continue
+        r = by_uid[inv.uid]
+        logged.add(('invoice', inv.uid))
+        inv.status, inv.paid_amount, inv.updated_at = r['status'], _dec(r['paid_amount']), _ts(r['updated_at'])
+
+
+# --- branch: talking to central ----------------------------------------------
+
+def _request(path, body=None, params=None):
+    config = current_app.config
+    if not config['SYNC_CENTRAL_URL']:
+        raise SyncError('SYNC_CENTRAL_URL is not set')
+    url = config['SYNC_CENTRAL_URL'].rstrip('/') + path + (f'?{urlencode(params)}' if params else '')
+    req = urllib.request.Request(url, headers={'Authorization': f"Bearer {config['SYNC_TOKEN']}",
+                                               'Accept-Encoding': 'gzip'})
+    if body is not None:
+        req.data = gzip.compress(json.dumps(body, default=encode, ensure_ascii=False, separators=(',', ':')).encode())
+        req.add_header('Content-Type', 'application/json')
+        req.add_header('Content-Encoding', 'gzip')
+    try:
+        with urllib.request.urlopen(req, timeout=config['SYNC_TIMEOUT']) as response:
+            raw = response.read()
+            if response.headers.get('Content-Encoding') == 'gzip':
+                raw = gzip.decompress(raw)
+    except urllib.error.HTTPError as exc:
+        raise SyncError(f'central answered {exc.code}: {exc.read()[:300].decode(errors="replace")}') from exc
+    return json.loads(raw)
+
+def push(batch_size=None, echo=print) -> int:
+    """Send unpushed change log rows to central, `batch_size` per request; returns
+    how many were acknowledged. Central applies a batch idempotently, so a batch
+    whose answer was lost is simply sent again."""
+    batch_size = batch_size or current_app.config['SYNC_BATCH']
+    pushed = 0
+    while True:
+        log, payload = _batch(batch_size)
+        db.session.rollback()  # no transaction held open during the request
+        if not log:
+            return pushed
+        result = _request('/sync/push', {'branch': current_app.config['BRANCH_CODE'], **payload})
+        last = log[-1].id
+        db.session.execute(update(ChangeLog).where(ChangeLog.id <= last, ChangeLog.pushed_at.is_(None))
+                           .values(pushed_at=datetime.utcnow()))
+        db.session.commit()
+        pushed += len(log)
+        echo(f'pushed {len(log)} changes: ' + ', '.join(f'{k} {v}' for k, v in sorted(result['applied'].items())))
+
+def pull(limit=None, echo=print) -> Counter:
+    """Fetch services and customers changed on central since the stored cursors."""
+    limit = limit or current_app.config['SYNC_BATCH'] * 10
+    pulled = Counter()
+    while True:
+        cursors = {name: db.session.get(SyncState, f'pull:{name}') for name in PULLED}
+        params = {name: state.value for name, state in cursors.items() if state}
+        data = _request('/sync/pull', params={**params, 'limit': limit,
+                                              'branch': current_app.config['BRANCH_CODE']})
+        db.session.rollback()
+        if data['services']:
+            _store_services(data['services'])
+        if data['customers']:
+            _store_customers(data['customers'])
+        if data.get('invoices'):
+            _store_invoices(data['invoices'])
+        for name, value in data['cursors'].items():
+            db.session.merge(SyncState(name=f'pull:{name}', value=value))
+        db.session.commit()
+        if data['services']:
+            catalog.invalidate()
+        for name in PULLED:
+            pulled[name] += len(data.get(name, ()))
+        if not data['more']:
+            echo(f'pulled {pulled["services"]} services, {pulled["customers"]} customers, '
+                 f'paid state of {pulled["invoices"]} invoices')
+            return pulled
+
+def prune(days) -> int:
+    """Delete change log rows pushed more than `days` ago."""
+    before = datetime.utcnow() - timedelta(days=days)
+    result = db.session.execute(ChangeLog.__table__.delete().where(ChangeLog.pushed_at < before))
+    db.session.commit()
+    return result.rowcount
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')  # readers do not block the till, and vice versa
+    cursor.execute('PRAGMA synchronous=NORMAL')  # fsync at checkpoints, not at every commit
+    cursor.close()
+
+def init_sync(app):
+    """Branch nodes on SQLite: WAL with synchronous=NORMAL keeps a checkout commit
+    off the disk's fsync latency. A power cut can lose the last commits, never
+    corrupt the file."""
+    if app.config['SYNC_ROLE'] != 'branch' or not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+    with app.app_context():
+        event.listen(db.engine, 'connect', _sqlite_pragmas)
+
+
+@sync_cli.command('push')
+@click.option('--batch', type=int, help='changes per request (default SYNC_BATCH)')
+def push_command(batch):
+    """Send local changes to central."""
+    click.echo(f'{push(batch, echo=click.echo)} changes pushed')
+
+@sync_cli.command('pull')
+def pull_command():
+    """Fetch the service catalog, customers and invoice paid state from central."""
+    pull(echo=click.echo)
+
+@sync_cli.command('run')
+@click.option('--interval', type=float, help='seconds between rounds (default SYNC_INTERVAL)')
+def run_command(interval):
+    """Push and pull every --interval seconds; rounds failing while offline are retried."""
+    interval = interval or current_app.config['SYNC_INTERVAL']
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    while not stopping:
+        try:
+            push(echo=click.echo)
+            pull(echo=lambda *_: None)
+        except (OSError, SyncError) as exc:  # URLError is an OSError: central unreachable
+            db.session.rollback()
+            click.echo(f'sync failed, retrying in {interval:g}s: {exc}', err=True)
+        time.sleep(interval)
+
+@sync_cli.command('status')
+def status_command():
+    """Queued changes and pull cursors."""
+    queued = db.session.scalar(select(func.count()).select_from(ChangeLog).where(ChangeLog.pushed_at.is_(None)))
+    oldest = db.session.scalar(select(func.min(ChangeLog.created_at)).where(ChangeLog.pushed_at.is_(None)))
+    click.echo(f'role {current_app.config["SYNC_ROLE"] or "standalone"}, {queued} changes queued'
+               + (f' since {oldest:%Y-%m-%d %H:%M}' if oldest else ''))
+    for name in PULLED:
+        state = db.session.get(SyncState, f'pull:{name}')
+        click.echo(f'pull:{name:10} {state.value if state else "-"}')
+
+@sync_cli.command('prune')
+@click.option('--days', default=30, show_default=True)
+def prune_command(days):
+    """Delete change log rows pushed more than --days ago."""
+    click.echo(f'{prune(days)} change log rows deleted')
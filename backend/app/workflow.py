@@ -0,0 +1,78 @@
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import select
+from .extensions import db
+from .models import Ticket, TicketEvent
+from . import events, stats, sync
+
+STATUSES = ('New', 'In progress', 'Waiting', 'Done', 'Cancelled')
+OPEN_STATUSES = ('New', 'In progress', 'Waiting')
+LABELS = {'New': 'جديدة', 'In progress': 'قيد الإنجاز', 'Waiting': 'بانتظار الجهة',
+          'Done': 'منجزة', 'Cancelled': 'ملغاة'}
+TRANSITIONS = {
+    'New': {'In progress', 'Cancelled'},
+    'In progress': {'Waiting', 'Done', 'Cancelled'},
+    'Waiting': {'In progress', 'Done', 'Cancelled'},
+    'Done': set(),
+    'Cancelled': set(),
+}
+MAX_BATCH = 1000
+
+
+class TransitionConflict(Exception):
+    """A ticket changed status between our read and our UPDATE; the caller rolls back."""
+
+
+def can_move(from_status, to_status) -> bool:
+    return to_status in TRANSITIONS.get(from_status, ())
+
+def transition(ticket_ids, to_status, note=None):
+    """Move tickets to `to_status` in one UPDATE, writing one audit event per ticket.
+
+    Tickets whose current status does not allow the move are left alone and
+    returned as rejected: (moved ids, {rejected id: current status}). A ticket
+    moved by someone else since it was read raises TransitionConflict. The
+    caller commits.
+    """
+    if to_status not in TRANSITIONS:
+        raise ValueError(f'unknown status {to_status}')
+    ids = sorted(set(ticket_ids))[:MAX_BATCH]
+    # FOR UPDATE (Postgres): a concurrent transition of the same tickets waits, then sees our result
+    rows = db.session.execute(
+        select(Ticket.id, Ticket.status, Ticket.uid).where(Ticket.id.in_(ids)).with_for_update()).all()
+    current = {i: status for i, status, _ in rows}
+    uids = {i: uid for i, _, uid in rows}
+    moved = [i for i in ids if can_move(current.get(i), to_status)]
+    rejected = {i: current.get(i) for i in ids if i not in moved}
+    if not moved:
+        return moved, rejected
+
+    now, batch = datetime.utcnow(), uuid.uuid4().hex
+    by_status = defaultdict(list)
+    for i in moved:
+        by_status[current[i]].append(i)
+    for from_status, group in by_status.items():
+        # only from the status read above (no row lock on SQLite): the audit events say so
+        result = db.session.execute(Ticket.__table__.update()
+                                    .where(Ticket.id.in_(group), Ticket.status == from_status)
+                                    .values(status=to_status, updated_at=now))
+        if result.rowcount != len(group):
+            raise TransitionConflict(f'tickets changed status meanwhile, moving from {from_status}')
+    db.session.execute(TicketEvent.__table__.insert(), [
+        {'ticket_id': i, 'from_status': current[i], 'to_status': to_status,
+         'note': note, 'batch': batch, 'created_at': now} for i in moved])
+    # Core update: the counters' flush hook does not see it
+    deltas = Counter()
+    for i in moved:
+        deltas[stats.STATUS_PREFIX + current[i]] -= 1
+    deltas[stats.STATUS_PREFIX + to_status] += len(moved)
+    stats.bump(db.session.connection(), deltas)
+    sync.record(db.session.connection(), 'ticket', [uids[i] for i in moved])  # branch change log
+    for start in range(0, len(moved), events.MAX_IDS):
+        events.emit(db.session, 'ticket.status', ids=moved[start:start + events.MAX_IDS], status=to_status)
+    return moved, rejected
+
+def history(ticket_id):
+    return db.session.scalars(select(TicketEvent).where(TicketEvent.ticket_id == ticket_id)
+                              .order_by(TicketEvent.id)).all()
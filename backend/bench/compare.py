@@ -0,0 +1,33 @@
+"""Compare two bench.run result files: python -m bench.compare OLD.json NEW.json"""
+import json
+import sys
+
+
+def main(old_path, new_path, threshold=1.10):
+    with open(old_path, encoding='utf-8') as fh:
+        old = json.load(fh)
+    with open(new_path, encoding='utf-8') as fh:
+        new = json.load(fh)
+    print(f"{old['commit']} ({old['dialect']}) -> {new['commit']} ({new['dialect']})")
+    regressions = 0
+    for name, result in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            print(f'{name:32} new        {result["median_ms"]:9.2f}ms')
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        if result['queries'] > before['queries']:
+            flag += f"  queries {before['queries']:g} -> {result['queries']:g}"
+        print(f'{name:32} {before["median_ms"]:9.2f}ms -> {result["median_ms"]:9.2f}ms '
+              f'({ratio:5.2f}x){flag}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    sys.exit(main(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,103 @@
+"""Concurrent HTTP load against a running server (gunicorn, not the test client).
+
+    gunicorn -c gunicorn.conf.py wsgi:app &
+    python -m bench.load --url http://127.0.0.1:5000 --clients 32 --seconds 30
+
+Each client requests the page list below in a loop for --seconds. Results go to
+bench/results/<commit>-load-<label>.json.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+from .run import RESULTS_DIR, _git_commit
+
+PATHS = [
+    '/',
+    '/tickets/',
+    '/tickets/?status=New',
+    '/tickets/queue',
+    '/customers/',
+    '/customers/?q=محمد',
+    '/customers/collections',
+    '/reports/aging',
+    '/api/v1/tickets?status=New',
+    '/api/v1/invoices?fields=id,status&size=100',
+]
+
+
+def _client(base, deadline, samples, errors, lock):
+    i = 0
+    while time.monotonic() < deadline:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base + urllib.parse.quote(path, safe='/?=&'), timeout=60) as resp:
+                resp.read()
+            ok = True
+        except (urllib.error.URLError, OSError) as exc:
+            ok = False
+            error = getattr(exc, 'code', None) or type(exc).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                samples.append(elapsed)
+            else:
+                errors[str(error)] = errors.get(str(error), 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--label', default='gunicorn', help='e.g. the worker settings under test')
+    parser.add_argument('--out', help='output JSON path')
+    args = parser.parse_args()
+
+    samples, errors, lock = [], {}, threading.Lock()
+    deadline = time.monotonic() + args.seconds
+    threads = [threading.Thread(target=_client, args=(args.url.rstrip('/'), deadline, samples, errors, lock))
+               for _ in range(args.clients)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+
+    samples.sort()
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'label': args.label,
+        'clients': args.clients,
+        'seconds': round(wall, 1),
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(samples) / wall, 1),
+        'median_ms': round(statistics.median(samples) * 1000, 1) if samples else None,
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1] * 1000, 1) if samples else None,
+        'max_ms': round(samples[-1] * 1000, 1) if samples else None,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['commit']}-load-{args.label}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+    print(f'results written to {out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# Production server settings: gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+import threading
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+# gthread: N threads per worker, each with its own pooled DB connection.
+# gevent needs `pip install gevent psycogreen` and a larger DB_POOL_SIZE.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+page_threads = int(os.getenv("GUNICORN_THREADS", 4))
+# an open /events/stream holds a gthread thread for minutes but no DB connection: streams
+# get threads of their own on top of the page threads, so screens never starve pages
+# (same default as EVENTS_MAX_STREAMS in app/config.py)
+streams = int(os.getenv("EVENTS_MAX_STREAMS", 100 if worker_class == "gevent" else 16))
+threads = page_threads + streams
+# any thread may pick up a page, so pages take a slot first (pre_request below): at most
+# page_threads at once, one pooled connection each (DB_POOL_SIZE defaults to it); the
+# rest wait for a slot instead of for a connection, which gives up after DB_POOL_TIMEOUT
+page_slots = threading.BoundedSemaphore(page_threads)
+STREAM_PATH = "/events/stream"
+# SQLite has no cross-process NOTIFY: events reach the committing process only (app/events.py)
+sqlite = os.getenv("DATABASE_URL", "sqlite:///sand.db").startswith("sqlite")
+
+
+def _default_workers():
+    # each worker may hold DB_POOL_SIZE + DB_MAX_OVERFLOW pooled connections plus the
+    # events LISTEN connection (app/config.py, app/events.py); together they must fit in
+    # DB_MAX_CONNECTIONS: Postgres' max_connections (100) less room for psql/migrations
+    per_worker = int(os.getenv("DB_POOL_SIZE", page_threads)) + int(os.getenv("DB_MAX_OVERFLOW", 4)) + 1
+    budget = int(os.getenv("DB_MAX_CONNECTIONS", 90)) // per_worker
+    return max(1, min(multiprocessing.cpu_count() * 2 + 1, budget))
+
+
+# one process on SQLite whatever WEB_CONCURRENCY says, or screens on other workers miss events
+workers = 1 if sqlite else int(os.getenv("WEB_CONCURRENCY", _default_workers()))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 200))  # gevent only
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+# recycle workers now and then so slow leaks can't accumulate
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()  # make psycopg2 yield to other greenlets while waiting on Postgres
+
+
+def pre_request(worker, req):
+    if worker_class == "gthread" and req.path != STREAM_PATH:
+        page_slots.acquire()
+        req.page_slot = True
+
+
+def post_request(worker, req, environ, resp):
+    if getattr(req, "page_slot", False):  # also called when pre_request failed
+        req.page_slot = False
+        page_slots.release()
@@ -0,0 +1,79 @@
+"""archive tables
+
+Revision ID: 0c3b6c1f1d27
+Revises: a68dcf572f0b
+Create Date: 2026-10-18 16:47:30.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c3b6c1f1d27'
+down_revision = 'a68dcf572f0b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=True),
+    sa.Column('service_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=32), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ticket_archive_customer_id', 'ticket_archive', ['customer_id'], unique=False)
+    op.create_index('ix_ticket_archive_created_at', 'ticket_archive', ['created_at'], unique=False)
+    op.create_table('ticket_event_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=True),
+    sa.Column('from_status', sa.String(length=32), nullable=True),
+    sa.Column('to_status', sa.String(length=32), nullable=True),
+    sa.Column('note', sa.String(length=255), nullable=True),
+    sa.Column('batch', sa.String(length=32), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ticket_event_archive_ticket_id', 'ticket_event_archive', ['ticket_id'], unique=False)
+    op.create_table('invoice_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=True),
+    sa.Column('ticket_id', sa.Integer(), nullable=True),
+    sa.Column('subtotal_office_fee', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('total_gov_fees', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('vat_amount', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('grand_total', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('status', sa.String(length=32), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('number', sa.String(length=32), nullable=True),
+    sa.Column('idempotency_key', sa.String(length=64), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_invoice_archive_customer_id', 'invoice_archive', ['customer_id'], unique=False)
+    op.create_index('ix_invoice_archive_created_at', 'invoice_archive', ['created_at'], unique=False)
+    op.create_index('ix_invoice_archive_number', 'invoice_archive', ['number'], unique=False)
+    op.create_table('invoice_item_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('invoice_id', sa.Integer(), nullable=True),
+    sa.Column('service_id', sa.Integer(), nullable=True),
+    sa.Column('qty', sa.Integer(), nullable=True),
+    sa.Column('office_fee', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('gov_fee', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('vat_amount', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('line_total', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_invoice_item_archive_invoice_id', 'invoice_item_archive', ['invoice_id'], unique=False)
+
+
+def downgrade():
+    op.drop_table('invoice_item_archive')
+    op.drop_table('invoice_archive')
+    op.drop_table('ticket_event_archive')
+    op.drop_table('ticket_archive')
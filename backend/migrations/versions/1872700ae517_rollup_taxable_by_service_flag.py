@@ -0,0 +1,59 @@
+"""revenue rollup: taxable office fees by the service's vat_applicable flag
+
+Revision ID: 1872700ae517
+Revises: e045c44c65b7
+Create Date: 2026-10-18 23:41:52.902617
+
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1872700ae517'
+down_revision = 'e045c44c65b7'
+branch_labels = None
+depends_on = None
+
+
+def _set_taxable(bind, taxable):
+    # taxable_office_fee of every rollup row, with items counted as taxable when
+    # `taxable(item, service)`; archived invoices included, as in reporting.rebuild
+    service = sa.table('service', sa.column('id'), sa.column('gov_entity'),
+                       sa.column('vat_applicable', sa.Boolean))
+    acc = defaultdict(Decimal)
+    for name in ('invoice', 'invoice_archive'):
+        inv = sa.table(name, sa.column('id'), sa.column('created_at'), sa.column('status'))
+        item = sa.table(name.replace('invoice', 'invoice_item'), sa.column('invoice_id'),
+                        sa.column('service_id'), sa.column('office_fee', sa.Numeric(10, 2)),
+                        sa.column('vat_amount', sa.Numeric(10, 2)))
+        keys = [sa.func.date(inv.c.created_at), sa.func.coalesce(item.c.service_id, 0),
+                sa.func.coalesce(service.c.gov_entity, ''), inv.c.status]
+        stmt = (sa.select(*keys, sa.func.sum(sa.case((taxable(item, service), item.c.office_fee), else_=0)))
+                .join(inv, inv.c.id == item.c.invoice_id)
+                .outerjoin(service, service.c.id == item.c.service_id)
+                .group_by(*keys))
+        for day, service_id, gov_entity, status, amount in bind.execute(stmt):
+            day = date.fromisoformat(str(day))
+            for grain, start in (('day', day), ('month', day.replace(day=1))):
+                acc[(grain, start, service_id, gov_entity, status)] += Decimal(str(amount or 0))
+    rollup = sa.table('revenue_rollup', sa.column('grain'), sa.column('period_start', sa.Date),
+                      sa.column('service_id'), sa.column('gov_entity'), sa.column('status'),
+                      sa.column('taxable_office_fee', sa.Numeric(14, 2)))
+    bind.execute(rollup.update().values(taxable_office_fee=0))
+    names = ('b_grain', 'b_period_start', 'b_service_id', 'b_gov_entity', 'b_status')
+    rows = [{**dict(zip(names, key)), 'taxable_office_fee': amount} for key, amount in acc.items() if amount]
+    if rows:
+        bind.execute(rollup.update().where(*[rollup.c[n[2:]] == sa.bindparam(n) for n in names]), rows)
+
+
+def upgrade():
+    # items of a VAT-applicable service whose VAT rounded to 0.00 counted as exempt
+    _set_taxable(op.get_bind(), lambda item, service: service.c.vat_applicable.is_(True))
+
+
+def downgrade():
+    _set_taxable(op.get_bind(), lambda item, service: item.c.vat_amount != 0)
@@ -0,0 +1,73 @@
+"""customer ledger: payments, balances and invoice indexes
+
+Revision ID: 372f2f240400
+Revises: 438f6fc700e1
+Create Date: 2026-10-18 18:05:12.417306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '372f2f240400'
+down_revision = '438f6fc700e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # archive twin gets the column too (see archive.py)
+    op.add_column('invoice', sa.Column('paid_amount', sa.Numeric(precision=10, scale=2),
+                                       nullable=False, server_default='0'))
+    op.add_column('invoice_archive', sa.Column('paid_amount', sa.Numeric(precision=10, scale=2),
+                                               nullable=True, server_default='0'))
+    op.create_index('ix_invoice_customer_status', 'invoice', ['customer_id', 'status', 'created_at'], unique=False)
+    op.create_index('ix_invoice_status_created_at', 'invoice', ['status', 'created_at'], unique=False)
+
+    op.create_table('payment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('invoice_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('unapplied', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('method', sa.String(length=16), nullable=False),
+    sa.Column('reference', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('uid', sa.String(length=32), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customer.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_payment_invoice_id'), 'payment', ['invoice_id'], unique=False)
+    op.create_index(op.f('ix_payment_uid'), 'payment', ['uid'], unique=True)
+    op.create_index('ix_payment_customer_created_at', 'payment', ['customer_id', 'created_at'], unique=False)
+
+    op.create_table('customer_balance',
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('customer_id')
+    )
+    op.create_index('ix_customer_balance_balance', 'customer_balance', ['balance', 'customer_id'], unique=False)
+
+    # no payments yet: a balance is what the customer's unpaid invoices add up to
+    invoice = sa.table('invoice', sa.column('customer_id'), sa.column('grand_total'), sa.column('status'))
+    balance = sa.table('customer_balance', sa.column('customer_id'), sa.column('balance'))
+    op.execute(balance.insert().from_select(
+        ['customer_id', 'balance'],
+        sa.select(invoice.c.customer_id, sa.func.sum(invoice.c.grand_total))
+        .where(invoice.c.status == 'Unpaid', invoice.c.customer_id.is_not(None))
+        .group_by(invoice.c.customer_id)))
+
+
+def downgrade():
+    op.drop_index('ix_customer_balance_balance', table_name='customer_balance')
+    op.drop_table('customer_balance')
+    op.drop_index('ix_payment_customer_created_at', table_name='payment')
+    op.drop_index(op.f('ix_payment_uid'), table_name='payment')
+    op.drop_index(op.f('ix_payment_invoice_id'), table_name='payment')
+    op.drop_table('payment')
+    op.drop_index('ix_invoice_status_created_at', table_name='invoice')
+    op.drop_index('ix_invoice_customer_status', table_name='invoice')
+    for name in ('invoice_archive', 'invoice'):
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.drop_column('paid_amount')
@@ -0,0 +1,58 @@
+"""branch sync: row uids, change log and sync cursors
+
+Revision ID: 438f6fc700e1
+Revises: 0c3b6c1f1d27
+Create Date: 2026-10-18 17:20:44.603118
+
+"""
+import uuid
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '438f6fc700e1'
+down_revision = '0c3b6c1f1d27'
+branch_labels = None
+depends_on = None
+
+# hot table -> unique index; archive twins get the column too (see archive.py)
+TABLES = {'customer': True, 'ticket': True, 'invoice': True,
+          'ticket_archive': False, 'invoice_archive': False}
+
+
+def upgrade():
+    bind = op.get_bind()
+    for name, unique in TABLES.items():
+        op.add_column(name, sa.Column('uid', sa.String(length=32), nullable=True))
+        t = sa.table(name, sa.column('id'), sa.column('uid'))
+        ids = bind.scalars(sa.select(t.c.id)).all()
+        for start in range(0, len(ids), 10000):
+            bind.execute(t.update().where(t.c.id == sa.bindparam('_id')).values(uid=sa.bindparam('_uid')),
+                         [{'_id': i, '_uid': uuid.uuid4().hex} for i in ids[start:start + 10000]])
+        op.create_index(op.f(f'ix_{name}_uid'), name, ['uid'], unique=unique)
+
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=16), nullable=False),
+    sa.Column('uid', sa.String(length=32), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('pushed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_change_log_pushed_at'), 'change_log', ['pushed_at'], unique=False)
+    op.create_table('sync_state',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('value', sa.String(length=64), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('sync_state')
+    op.drop_index(op.f('ix_change_log_pushed_at'), table_name='change_log')
+    op.drop_table('change_log')
+    for name in reversed(list(TABLES)):
+        op.drop_index(op.f(f'ix_{name}_uid'), table_name=name)
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.drop_column('uid')
@@ -0,0 +1,96 @@
+"""customer search key
+
+Revision ID: 58ba9ac7297d
+Revises: ba41e30d919f
+Create Date: 2026-10-18 09:12:03.114502
+
+"""
+import re
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '58ba9ac7297d'
+down_revision = 'ba41e30d919f'
+branch_labels = None
+depends_on = None
+
+# A copy of app/search.py as of this revision: the migration must not change
+# when the app does.
+_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_FOLD = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه', 'ى': 'ي', 'ؤ': 'و', 'ئ': 'ي',
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06f0 + i): str(i) for i in range(10)},
+})
+
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS customer_fts USING fts5("
+    "search_key, content='customer', content_rowid='id', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS customer_fts_ai AFTER INSERT ON customer BEGIN "
+    "INSERT INTO customer_fts(rowid, search_key) VALUES (new.id, new.search_key); END",
+    "CREATE TRIGGER IF NOT EXISTS customer_fts_ad AFTER DELETE ON customer BEGIN "
+    "INSERT INTO customer_fts(customer_fts, rowid, search_key) VALUES ('delete', old.id, old.search_key); END",
+    "CREATE TRIGGER IF NOT EXISTS customer_fts_au AFTER UPDATE OF search_key ON customer BEGIN "
+    "INSERT INTO customer_fts(customer_fts, rowid, search_key) VALUES ('delete', old.id, old.search_key); "
+    "INSERT INTO customer_fts(rowid, search_key) VALUES (new.id, new.search_key); END",
+)
+
+
+def _normalize(value):
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKC', str(value))
+    value = _MARKS.sub('', value).translate(_FOLD).casefold()
+    return ' '.join(value.split())
+
+def build_key(c):
+    name = _normalize(c.full_name)
+    parts = [name, _normalize(c.national_id), _normalize(c.phone), _normalize(c.email)]
+    parts += [w[2:] for w in name.split() if w.startswith('ال') and len(w) > 4]
+    digits = re.sub(r'\D', '', _normalize(c.phone))
+    if digits:
+        parts.append(digits)
+        if len(digits) > 8:
+            parts.append(digits[-8:])
+    return ' '.join(p for p in parts if p)
+
+
+def upgrade():
+    op.add_column('customer', sa.Column('search_key', sa.String(length=400), nullable=True))
+
+    bind = op.get_bind()
+    customer = sa.table('customer', sa.column('id'), sa.column('full_name'),
+                        sa.column('national_id'), sa.column('phone'),
+                        sa.column('email'), sa.column('search_key'))
+    rows = bind.execute(sa.select(customer.c.id, customer.c.full_name, customer.c.national_id,
+                                  customer.c.phone, customer.c.email)).all()
+    if rows:
+        bind.execute(
+            customer.update().where(customer.c.id == sa.bindparam('_id'))
+                    .values(search_key=sa.bindparam('_key')),
+            [{'_id': r.id, '_key': build_key(r)} for r in rows])
+
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_customer_search_key_trgm', 'customer', ['search_key'],
+                        postgresql_using='gin', postgresql_ops={'search_key': 'gin_trgm_ops'})
+    elif bind.dialect.name == 'sqlite':
+        for stmt in FTS_DDL:
+            op.execute(stmt)
+        op.execute("INSERT INTO customer_fts(customer_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_customer_search_key_trgm', table_name='customer')
+    elif bind.dialect.name == 'sqlite':
+        for name in ('customer_fts_ai', 'customer_fts_ad', 'customer_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+        op.execute('DROP TABLE IF EXISTS customer_fts')
+    with op.batch_alter_table('customer') as batch_op:
+        batch_op.drop_column('search_key')
@@ -0,0 +1,58 @@
+"""invoice numbering and idempotency keys
+
+Revision ID: 6ed0af5e5cd1
+Revises: de7c58d6ee89
+Create Date: 2026-10-18 15:08:52.661094
+
+"""
+import os
+from collections import defaultdict
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6ed0af5e5cd1'
+down_revision = 'de7c58d6ee89'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('invoice_series',
+    sa.Column('branch', sa.String(length=16), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('last_number', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('branch', 'year')
+    )
+    op.add_column('invoice', sa.Column('number', sa.String(length=32), nullable=True))
+    op.add_column('invoice', sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_invoice_number'), 'invoice', ['number'], unique=True)
+    op.create_index(op.f('ix_invoice_idempotency_key'), 'invoice', ['idempotency_key'], unique=True)
+    _backfill(op.get_bind(), os.getenv('BRANCH_CODE', 'HQ'))
+
+
+def _backfill(bind, branch):
+    # number existing invoices in creation order, one series per year (<branch>-<year>-<seq>)
+    invoice = sa.table('invoice', sa.column('id'), sa.column('created_at', sa.DateTime), sa.column('number'))
+    by_year = defaultdict(list)
+    for id_, created_at in bind.execute(sa.select(invoice.c.id, invoice.c.created_at)
+                                        .order_by(invoice.c.created_at, invoice.c.id)):
+        by_year[(created_at or datetime.utcnow()).year].append(id_)
+    for year, ids in sorted(by_year.items()):
+        bind.execute(invoice.update().where(invoice.c.id == sa.bindparam('_id')),
+                     [{'_id': id_, 'number': f'{branch}-{year}-{i:06d}'} for i, id_ in enumerate(ids, 1)])
+    if by_year:
+        series = sa.table('invoice_series', sa.column('branch'), sa.column('year'), sa.column('last_number'))
+        bind.execute(series.insert(), [{'branch': branch, 'year': year, 'last_number': len(ids)}
+                                       for year, ids in by_year.items()])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_invoice_idempotency_key'), table_name='invoice')
+    op.drop_index(op.f('ix_invoice_number'), table_name='invoice')
+    with op.batch_alter_table('invoice') as batch_op:
+        batch_op.drop_column('idempotency_key')
+        batch_op.drop_column('number')
+    op.drop_table('invoice_series')
@@ -0,0 +1,37 @@
+"""updated_at row versions
+
+Revision ID: 8343c9d880f1
+Revises: a4504dd3b339
+Create Date: 2026-10-18 13:02:41.527310
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8343c9d880f1'
+down_revision = 'a4504dd3b339'
+branch_labels = None
+depends_on = None
+
+TABLES = ('customer', 'service', 'ticket', 'invoice')
+
+
+def upgrade():
+    now = datetime.utcnow()
+    for name in TABLES:
+        op.add_column(name, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        t = sa.table(name, sa.column('updated_at'), sa.column('created_at'))
+        # the last known change of an existing row is its creation; services have no created_at
+        value = sa.func.coalesce(t.c.created_at, now) if name != 'service' else now
+        op.execute(t.update().values(updated_at=value))
+        op.create_index(op.f(f'ix_{name}_updated_at'), name, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for name in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{name}_updated_at'), table_name=name)
+        with op.batch_alter_table(name) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,39 @@
+"""unpaid_total counts what is still owed (grand_total - paid_amount)
+
+Revision ID: 970176dfa914
+Revises: 372f2f240400
+Create Date: 2026-10-18 21:14:06.208413
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '970176dfa914'
+down_revision = '372f2f240400'
+branch_labels = None
+depends_on = None
+
+
+def _set_unpaid_total(bind, paid):
+    # Unpaid invoices, archived ones included, less `paid(table)`
+    selects = []
+    for name in ('invoice', 'invoice_archive'):
+        t = sa.table(name, sa.column('grand_total', sa.Numeric(10, 2)),
+                     sa.column('paid_amount', sa.Numeric(10, 2)), sa.column('status'))
+        selects.append(sa.select((t.c.grand_total - paid(t)).label('amount')).where(t.c.status == 'Unpaid'))
+    amounts = sa.union_all(*selects).subquery()
+    total = bind.scalar(sa.select(sa.func.coalesce(sa.func.sum(amounts.c.amount), 0)))
+    stat_counter = sa.table('stat_counter', sa.column('name'), sa.column('value', sa.Numeric(18, 3)))
+    bind.execute(stat_counter.delete().where(stat_counter.c.name == 'unpaid_total'))
+    bind.execute(stat_counter.insert(), [{'name': 'unpaid_total', 'value': total}])
+
+
+def upgrade():
+    # partial payments taken since 372f2f240400 were still counted in full
+    _set_unpaid_total(op.get_bind(), lambda t: sa.func.coalesce(t.c.paid_amount, 0))
+
+
+def downgrade():
+    _set_unpaid_total(op.get_bind(), lambda t: 0)
@@ -0,0 +1,78 @@
+"""revenue rollup
+
+Revision ID: a4504dd3b339
+Revises: e3a5c156065f
+Create Date: 2026-10-18 11:26:09.408113
+
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4504dd3b339'
+down_revision = 'e3a5c156065f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revenue_rollup',
+    sa.Column('grain', sa.String(length=5), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('gov_entity', sa.String(length=120), nullable=False),
+    sa.Column('status', sa.String(length=32), nullable=False),
+    sa.Column('lines', sa.Integer(), nullable=False),
+    sa.Column('qty', sa.Integer(), nullable=False),
+    sa.Column('office_fee', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('taxable_office_fee', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('vat_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('gov_fees', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('total', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('grain', 'period_start', 'service_id', 'gov_entity', 'status')
+    )
+    _backfill(op.get_bind())
+
+
+AMOUNTS = ('lines', 'qty', 'office_fee', 'taxable_office_fee', 'vat_amount', 'gov_fees', 'total')
+
+def _backfill(bind):
+    # the rollups as app/reporting.py defined them at this revision
+    inv = sa.table('invoice', sa.column('id'), sa.column('created_at'), sa.column('status'))
+    item = sa.table('invoice_item', sa.column('invoice_id'), sa.column('service_id'), sa.column('qty'),
+                    sa.column('office_fee'), sa.column('gov_fee'), sa.column('vat_amount'),
+                    sa.column('line_total'))
+    service = sa.table('service', sa.column('id'), sa.column('gov_entity'))
+    keys = [sa.func.date(inv.c.created_at), sa.func.coalesce(item.c.service_id, 0),
+            sa.func.coalesce(service.c.gov_entity, ''), inv.c.status]
+    stmt = (sa.select(*keys, sa.func.count(), sa.func.sum(item.c.qty), sa.func.sum(item.c.office_fee),
+                      sa.func.sum(sa.case((item.c.vat_amount != 0, item.c.office_fee), else_=0)),
+                      sa.func.sum(item.c.vat_amount), sa.func.sum(item.c.gov_fee),
+                      sa.func.sum(item.c.line_total))
+            .join(inv, inv.c.id == item.c.invoice_id)
+            .outerjoin(service, service.c.id == item.c.service_id)
+            .group_by(*keys))
+    acc = defaultdict(lambda: dict.fromkeys(AMOUNTS, Decimal(0)))
+    for day, service_id, gov_entity, status, *amounts in bind.execute(stmt):
+        day = date.fromisoformat(str(day))
+        for grain, start in (('day', day), ('month', day.replace(day=1))):
+            row = acc[(grain, start, service_id, gov_entity, status)]
+            for name, value in zip(AMOUNTS, amounts):
+                row[name] += Decimal(str(value or 0))
+    names = ('grain', 'period_start', 'service_id', 'gov_entity', 'status')
+    rows = [{**dict(zip(names, key)), **amounts, 'lines': int(amounts['lines']), 'qty': int(amounts['qty'])}
+            for key, amounts in acc.items()]
+    if rows:
+        rollup = sa.table('revenue_rollup', sa.column('grain'), sa.column('period_start', sa.Date),
+                          sa.column('service_id'), sa.column('gov_entity'), sa.column('status'),
+                          sa.column('lines'), sa.column('qty'),
+                          *[sa.column(c, sa.Numeric(14, 2)) for c in AMOUNTS[2:]])
+        bind.execute(rollup.insert(), rows)
+
+
+def downgrade():
+    op.drop_table('revenue_rollup')
@@ -0,0 +1,40 @@
+"""ticket workflow indexes and events
+
+Revision ID: a68dcf572f0b
+Revises: 6ed0af5e5cd1
+Create Date: 2026-10-18 16:01:15.220947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a68dcf572f0b'
+down_revision = '6ed0af5e5cd1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_ticket_status_created_at', 'ticket', ['status', 'created_at'], unique=False)
+    op.create_index('ix_ticket_service_status', 'ticket', ['service_id', 'status', 'created_at'], unique=False)
+    op.create_table('ticket_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('from_status', sa.String(length=32), nullable=True),
+    sa.Column('to_status', sa.String(length=32), nullable=False),
+    sa.Column('note', sa.String(length=255), nullable=True),
+    sa.Column('batch', sa.String(length=32), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['ticket_id'], ['ticket.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ticket_event_ticket_id'), 'ticket_event', ['ticket_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_ticket_event_ticket_id'), table_name='ticket_event')
+    op.drop_table('ticket_event')
+    op.drop_index('ix_ticket_service_status', table_name='ticket')
+    op.drop_index('ix_ticket_status_created_at', table_name='ticket')
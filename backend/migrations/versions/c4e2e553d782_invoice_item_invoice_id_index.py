@@ -0,0 +1,25 @@
+"""index invoice_item.invoice_id
+
+Revision ID: c4e2e553d782
+Revises: 970176dfa914
+Create Date: 2026-10-18 23:02:41.318220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e2e553d782'
+down_revision = '970176dfa914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # an invoice's items (invoice card, API, exports) and the archive's batch delete
+    op.create_index(op.f('ix_invoice_item_invoice_id'), 'invoice_item', ['invoice_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_invoice_item_invoice_id'), table_name='invoice_item')
@@ -0,0 +1,25 @@
+"""index invoice.ticket_id
+
+Revision ID: e045c44c65b7
+Revises: c4e2e553d782
+Create Date: 2026-10-18 23:19:07.664105
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e045c44c65b7'
+down_revision = 'c4e2e553d782'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # archive.run keeps a ticket hot while a hot invoice points at it: one lookup per ticket
+    op.create_index(op.f('ix_invoice_ticket_id'), 'invoice', ['ticket_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_invoice_ticket_id'), table_name='invoice')
@@ -0,0 +1,52 @@
+"""stat counters
+
+Revision ID: e3a5c156065f
+Revises: 58ba9ac7297d
+Create Date: 2026-10-18 10:03:41.520917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a5c156065f'
+down_revision = '58ba9ac7297d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stat_counter',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.Numeric(precision=18, scale=3), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    _backfill(op.get_bind())
+
+
+def _backfill(bind):
+    # the counters as app/stats.py defined them at this revision
+    customer = sa.table('customer', sa.column('id'))
+    ticket = sa.table('ticket', sa.column('status'))
+    invoice = sa.table('invoice', sa.column('created_at'), sa.column('grand_total', sa.Numeric(10, 2)),
+                       sa.column('status'))
+    count = sa.func.count()
+    counts = {
+        'customers': bind.scalar(sa.select(count).select_from(customer)),
+        'tickets': bind.scalar(sa.select(count).select_from(ticket)),
+        'invoices': bind.scalar(sa.select(count).select_from(invoice)),
+        'unpaid_total': bind.scalar(sa.select(sa.func.coalesce(sa.func.sum(invoice.c.grand_total), 0))
+                                    .where(invoice.c.status == 'Unpaid')),
+    }
+    for status, n in bind.execute(sa.select(ticket.c.status, count).group_by(ticket.c.status)):
+        counts[f'tickets:status:{status}'] = n
+    day = sa.func.date(invoice.c.created_at)
+    for d, total in bind.execute(sa.select(day, sa.func.sum(invoice.c.grand_total)).group_by(day)):
+        counts[f'revenue:{d}'] = total
+    stat_counter = sa.table('stat_counter', sa.column('name'), sa.column('value', sa.Numeric(18, 3)))
+    bind.execute(stat_counter.insert(), [{'name': k, 'value': v or 0} for k, v in counts.items()])
+
+
+def downgrade():
+    op.drop_table('stat_counter')
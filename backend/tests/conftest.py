@@ -0,0 +1,130 @@
+import gzip
+import json
+import os
+import tempfile
+import uuid
+from decimal import Decimal
+import pytest
+from sqlalchemy import select
+
+# Config reads the environment at import time. TEST_DATABASE_URL may point at an
+# empty Postgres database; by default every run gets a fresh SQLite file.
+_TMP = tempfile.mkdtemp(prefix='sanad-tests-')
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL') or f'sqlite:///{_TMP}/sanad.db'
+os.environ.setdefault('PDF_DIR', os.path.join(_TMP, 'pdf'))
+
+from flask_migrate import upgrade  # noqa: E402
+from app import create_app  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import Customer, CustomerBalance, Service, StatCounter  # noqa: E402
+from app import archive, datagen, ledger, stats, sync  # noqa: E402
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+def make_app(uri=None, **config):
+    """A migrated app on `uri` (default: the test database), TESTING on."""
+    default = Config.SQLALCHEMY_DATABASE_URI
+    Config.SQLALCHEMY_DATABASE_URI = uri or default
+    try:
+        app = create_app()
+    finally:
+        Config.SQLALCHEMY_DATABASE_URI = default
+    app.config.update(TESTING=True, **config)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+    return app
+
+def sqlite_uri(name):
+    return f'sqlite:///{_TMP}/{name}.db'
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The shared seeded database: a year of synthetic data, older settled rows archived."""
+    app = make_app()
+    with app.app_context():
+        datagen.generate(customers=200, services=10, tickets=1500, days=400, echo=lambda *_: None)
+        archive.run(months=9, echo=lambda *_: None)
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def checkout(client, ticket_id, lines=(('1', '1'),), key=None):
+    """POST the POS form for `ticket_id` with (service_id, qty) lines; returns the response."""
+    return client.post('/invoices/create', data={
+        'ticket_id': ticket_id, 'idempotency_key': key or uuid.uuid4().hex,
+        'service_id': [s for s, _ in lines], 'qty': [q for _, q in lines],
+        'variable_input': ['' for _ in lines]})
+
+def counters_match_rebuild():
+    """True when stat_counter equals a from-scratch rebuild (to the baisa; SQLite stores floats)."""
+    conn = db.session.connection()
+
+    def snapshot():
+        rows = conn.execute(select(StatCounter.name, StatCounter.value)).all()
+        return {k: Decimal(str(v)).quantize(Decimal('0.001')) for k, v in rows if v}
+
+    before = snapshot()
+    stats.rebuild(conn)
+    after = snapshot()
+    db.session.rollback()
+    return before == after
+
+def balances_match_rebuild():
+    """True when customer_balance equals ledger.rebuild()."""
+    conn = db.session.connection()
+
+    def snapshot():
+        rows = conn.execute(select(CustomerBalance.customer_id, CustomerBalance.balance)).all()
+        return {k: Decimal(str(v)).quantize(Decimal('0.01')) for k, v in rows if v}
+
+    before = snapshot()
+    ledger.rebuild(conn)
+    after = snapshot()
+    db.session.rollback()
+    return before == after
+
+
+SYNC_TOKEN = 'test-token'
+
+
+@pytest.fixture
+def nodes(monkeypatch, request):
+    """(central, branch) apps on their own SQLite files; the branch's HTTP calls go to central's test client."""
+    name = request.node.name
+    central = make_app(sqlite_uri(f'{name}-central'), SYNC_ROLE='central', SYNC_TOKEN=SYNC_TOKEN)
+    branch = make_app(sqlite_uri(f'{name}-branch'), SYNC_ROLE='branch', SYNC_TOKEN=SYNC_TOKEN,
+                      BRANCH_CODE='BR1', SYNC_CENTRAL_URL='http://central')
+    http = central.test_client()
+
+    def request_central(path, body=None, params=None):
+        headers = {'Authorization': f'Bearer {SYNC_TOKEN}'}
+        if body is None:
+            response = http.get(path, query_string=params, headers=headers)
+        else:
+            response = http.post(path, data=gzip.compress(json.dumps(body, default=sync.encode).encode()),
+                                 headers={**headers, 'Content-Encoding': 'gzip'},
+                                 content_type='application/json')
+        assert response.status_code == 200, response.get_data(as_text=True)
+        raw = response.get_data()
+        return json.loads(gzip.decompress(raw) if response.headers.get('Content-Encoding') == 'gzip' else raw)
+
+    monkeypatch.setattr(sync, '_request', request_central)
+    with central.app_context():
+        db.session.add_all([Service(name='تجديد جواز', office_fee=Decimal('100.000'), gov_fee_type='fixed',
+                                    gov_fee_value=Decimal('0'), vat_applicable=False),
+                            Customer(full_name='عائشة الكندية', national_id='SYNC-1')])
+        db.session.commit()
+    return central, branch
+
+
+def sync_round(branch):
+    """One `flask sync run` round of `branch` against the central app of `nodes`."""
+    with branch.app_context():
+        sync.push(echo=lambda *_: None)
+        sync.pull(echo=lambda *_: None)
@@ -0,0 +1,70 @@
+import uuid
+import pytest
+from sqlalchemy import select
+from app.extensions import db
+from app.models import Customer, Invoice
+
+
+@pytest.mark.parametrize('path', [
+    '/api/v1/tickets?customer_id=abc',
+    '/api/v1/tickets?service_id=1.5',
+    '/api/v1/invoices?customer_id=abc',
+    '/api/v1/invoices?ticket_id=',
+])
+def test_bad_filter_values_are_rejected(client, path):
+    assert client.get(path).status_code == 400
+
+def test_filters_match_by_value(client):
+    first = client.get('/api/v1/invoices?fields=customer_id&size=1').get_json()['data'][0]
+    rows = client.get(f"/api/v1/invoices?customer_id={first['customer_id']}&fields=customer_id").get_json()['data']
+    assert rows and {r['customer_id'] for r in rows} == {first['customer_id']}
+    assert client.get('/api/v1/tickets?status=New&fields=status').get_json()['data'][0]['status'] == 'New'
+
+
+def _touch_invoice(app, invoice_id):
+    with app.app_context():
+        inv = db.session.get(Invoice, invoice_id)
+        inv.status = 'Cancelled' if inv.status != 'Cancelled' else 'Paid'
+        db.session.commit()
+        return inv.status
+
+def _touch_customer(app, customer_id):
+    with app.app_context():
+        c = db.session.get(Customer, customer_id)
+        c.email = f'{uuid.uuid4().hex[:8]}@example.om'
+        db.session.commit()
+
+@pytest.mark.parametrize('path', ['/api/v1/customers?size=5', '/api/v1/invoices?fields=id,status&size=5'])
+def test_list_is_conditional(app, client, path):
+    first = client.get(path)
+    assert first.status_code == 200 and first.headers['ETag'] and first.headers['Last-Modified']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304 and again.get_data() == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert client.get(path, headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    assert client.get(path + '&after=999999').headers['ETag'] != first.headers['ETag']  # another body
+
+    with app.app_context():
+        invoice_id, customer_id = db.session.execute(
+            select(Invoice.id, Invoice.customer_id).order_by(Invoice.id.desc())).first()
+    if 'invoices' in path:
+        _touch_invoice(app, invoice_id)
+    else:
+        _touch_customer(app, customer_id)
+    changed = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and changed.headers['ETag'] != first.headers['ETag']
+
+def test_show_is_conditional(app, client):
+    with app.app_context():
+        inv_id = db.session.scalar(select(Invoice.id).order_by(Invoice.id.desc()))
+    path = f'/api/v1/invoices/{inv_id}?fields=id,status,items'
+    first = client.get(path)
+    assert first.status_code == 200 and first.get_json()['items']
+    assert client.get(path, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    status = _touch_invoice(app, inv_id)
+    changed = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and changed.get_json()['status'] == status
+    assert changed.headers['ETag'] != first.headers['ETag']
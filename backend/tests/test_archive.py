@@ -0,0 +1,64 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import func, select
+from app import archive
+from app.extensions import db
+from app.models import (Customer, Invoice, InvoiceArchive, InvoiceItem, InvoiceItemArchive, Service, Ticket,
+                        TicketArchive, TicketEvent, TicketEventArchive)
+from conftest import make_app, sqlite_uri
+
+OLD, RECENT = datetime(2020, 1, 15), datetime.utcnow()
+
+
+def _ticket(customer, service, status, created_at, invoice=None):
+    t = Ticket(customer=customer, service=service, status=status, created_at=created_at)
+    db.session.add(t)
+    db.session.flush()
+    db.session.add(TicketEvent(ticket_id=t.id, from_status='New', to_status=status, created_at=created_at))
+    if invoice:
+        inv = Invoice(customer=customer, ticket=t, status=invoice, grand_total=Decimal('10'),
+                      paid_amount=Decimal('10') if invoice == 'Paid' else Decimal('0'), created_at=created_at)
+        inv.items = [InvoiceItem(service=service, line_total=Decimal('4')),
+                     InvoiceItem(service=service, line_total=Decimal('6'))]
+        db.session.add(inv)
+    return t
+
+def _ids(model):
+    return set(db.session.scalars(select(model.id)))
+
+def _children(model, fk):
+    return set(db.session.scalars(select(getattr(model, fk))))
+
+
+def test_archive_moves_closed_records_with_their_children():
+    app = make_app(sqlite_uri('archive'))
+    with app.app_context():
+        c, s = Customer(full_name='بدر العامري'), Service(name='تأشيرة', office_fee=Decimal('10'))
+        tickets = {
+            'done_paid': _ticket(c, s, 'Done', OLD, 'Paid'),
+            'done_unpaid': _ticket(c, s, 'Done', OLD, 'Unpaid'),  # its invoice keeps it hot
+            'cancelled': _ticket(c, s, 'Cancelled', OLD),
+            'open': _ticket(c, s, 'In progress', OLD, 'Paid'),  # invoice goes, ticket stays
+            'recent': _ticket(c, s, 'Done', RECENT, 'Paid'),
+        }
+        db.session.commit()
+        ids = {name: t.id for name, t in tickets.items()}
+        items_before = db.session.scalar(select(func.count()).select_from(InvoiceItem))
+
+        moved = archive.run(months=1, batch=1, echo=lambda *_: None)  # one row per transaction
+
+        assert moved == {'invoices': 2, 'tickets': 2}
+        assert _ids(TicketArchive) == {ids['done_paid'], ids['cancelled']}
+        assert _ids(Ticket) == {ids['done_unpaid'], ids['open'], ids['recent']}
+        assert _children(TicketEventArchive, 'ticket_id') == _ids(TicketArchive)
+        assert _children(TicketEvent, 'ticket_id') == _ids(Ticket)
+
+        archived = set(db.session.scalars(select(InvoiceArchive.ticket_id)))
+        assert archived == {ids['done_paid'], ids['open']}
+        assert set(db.session.scalars(select(Invoice.ticket_id))) == {ids['done_unpaid'], ids['recent']}
+        assert _children(InvoiceItemArchive, 'invoice_id') == _ids(InvoiceArchive)
+        assert _children(InvoiceItem, 'invoice_id') == _ids(Invoice)
+        assert (db.session.scalar(select(func.count()).select_from(InvoiceItem))
+                + db.session.scalar(select(func.count()).select_from(InvoiceItemArchive))) == items_before
+
+        assert archive.run(months=1, echo=lambda *_: None) == {'invoices': 0, 'tickets': 0}
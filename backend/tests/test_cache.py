@@ -0,0 +1,42 @@
+import os
+from app import cache
+
+
+def test_unwritable_disk_falls_back_to_memory(app, tmp_path, monkeypatch):
+    blocker = tmp_path / 'not-a-dir'
+    blocker.write_text('')
+    calls = []
+
+    def render():
+        calls.append(1)
+        return '<p>fragment</p>'
+
+    with app.test_request_context():
+        monkeypatch.setitem(app.config, 'CACHE_DIR', str(blocker))
+        assert str(cache.cached('test-disk', 1, render)) == '<p>fragment</p>'
+        assert str(cache.cached('test-disk', 1, render)) == '<p>fragment</p>'
+    assert len(calls) == 1  # the second call is a memory hit
+
+def test_failed_write_leaves_no_temp_file(app, tmp_path, monkeypatch):
+    def replace(src, dst):
+        raise OSError(28, 'No space left on device')
+
+    with app.test_request_context():
+        monkeypatch.setitem(app.config, 'CACHE_DIR', str(tmp_path))
+        monkeypatch.setattr(os, 'replace', replace)
+        assert str(cache.cached('test-full', 1, lambda: 'x')) == 'x'
+    assert [names for _, _, names in os.walk(tmp_path) if names] == []
+
+def test_stats_without_instrumentation(app, tmp_path, monkeypatch):
+    assert not app.config['INSTRUMENTATION_ENABLED']
+    with app.test_request_context():
+        monkeypatch.setitem(app.config, 'CACHE_DIR', str(tmp_path))
+        cache.cached('test-stats', 1, lambda: 'one')  # miss, written to disk
+        cache.cached('test-stats', 1, lambda: 'one')  # memory hit
+        cache.clear()
+        cache.cached('test-stats', 1, lambda: 'one')  # another worker's copy, from disk
+        assert dict(cache.stats()['test-stats']) == {'miss': 1, 'hit': 1, 'disk': 1, 'entries': 1, 'bytes': 3}
+        assert cache.disk_usage()['test-stats'] == (1, 3)
+
+    result = app.test_cli_runner().invoke(args=['cache', 'stats'])
+    assert result.exit_code == 0 and result.output.split()[:3] == ['test-stats', '1', 'fragments']
@@ -0,0 +1,36 @@
+import pytest
+from sqlalchemy import func, select
+from app.extensions import db
+from app.models import Invoice, Service, Ticket
+from conftest import checkout
+
+
+@pytest.fixture
+def variable_line(app):
+    with app.app_context():
+        service_id = db.session.scalar(select(Service.id).where(Service.gov_fee_type == 'variable'))
+        ticket_id = db.session.scalar(select(Ticket.id).order_by(Ticket.id.desc()))
+    return ticket_id, service_id
+
+@pytest.mark.parametrize('raw', ['NaN', 'sNaN', 'Infinity', '-Infinity', '-50', 'abc'])
+def test_bad_variable_input_is_refused(client, app, variable_line, raw):
+    ticket_id, service_id = variable_line
+    with app.app_context():
+        before = db.session.scalar(select(func.count()).select_from(Invoice))
+    response = client.post('/invoices/create', data={
+        'ticket_id': ticket_id, 'service_id': [service_id], 'qty': ['1'], 'variable_input': [raw]})
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Invoice)) == before
+
+def test_variable_input_of_zero_is_accepted(client, variable_line):
+    ticket_id, service_id = variable_line
+    response = client.post('/invoices/create', data={
+        'ticket_id': ticket_id, 'service_id': [service_id], 'qty': ['1'], 'variable_input': ['0']})
+    assert response.status_code == 302
+
+def test_double_submit_creates_one_invoice(client, app, variable_line):
+    ticket_id, _ = variable_line
+    first = checkout(client, ticket_id, key='same-form')
+    second = checkout(client, ticket_id, key='same-form')
+    assert first.headers['Location'] == second.headers['Location']
@@ -0,0 +1,74 @@
+from decimal import Decimal
+from sqlalchemy import event, func, select, union_all
+from app import ledger
+from app.extensions import db
+from app.models import Customer, Invoice, InvoiceArchive, Service, StatCounter, Ticket
+from conftest import balances_match_rebuild, checkout, counters_match_rebuild
+
+
+def _new_ticket(client, app):
+    client.post('/customers/new', data={'full_name': 'عميل الاختبار', 'phone': '99001122'})
+    with app.app_context():
+        customer_id = db.session.scalar(select(Customer.id).order_by(Customer.id.desc()))
+        service_id = db.session.scalar(select(Service.id).where(Service.gov_fee_type == 'fixed'))
+    client.post('/tickets/new', data={'customer_id': customer_id, 'service_id': service_id})
+    with app.app_context():
+        return db.session.scalar(select(Ticket.id).order_by(Ticket.id.desc())), service_id
+
+def test_writes_keep_counters_in_step(client, app):
+    ticket_id, service_id = _new_ticket(client, app)
+    assert checkout(client, ticket_id, [(str(service_id), '2')]).status_code == 302
+    assert client.post('/tickets/transition', json={'ticket_ids': [ticket_id],
+                                                    'to_status': 'In progress'}).status_code == 200
+    with app.app_context():
+        assert counters_match_rebuild()
+
+def test_counters_are_written_after_the_invoice_number(client, app):
+    """The shared counter rows are locked from their upsert to commit: that must
+    come after the series row, which checkout takes as its last write."""
+    ticket_id, service_id = _new_ticket(client, app)
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        assert checkout(client, ticket_id, [(str(service_id), '1')]).status_code == 302
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    first = lambda table: next(i for i, s in enumerate(statements) if table in s and 'INSERT' in s)
+    assert first('invoice_series') < first('stat_counter')
+
+def _still_owed():
+    owed = union_all(*[select((m.grand_total - m.paid_amount).label('owed')).where(m.status == 'Unpaid')
+                       for m in (Invoice, InvoiceArchive)]).subquery()
+    return Decimal(str(db.session.scalar(select(func.sum(owed.c.owed))))).quantize(Decimal('0.01'))
+
+def _unpaid_total():
+    value = db.session.scalar(select(StatCounter.value).where(StatCounter.name == 'unpaid_total'))
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+def test_partial_payments_and_expired_invoices(client, app):
+    ticket_id, service_id = _new_ticket(client, app)
+    assert checkout(client, ticket_id, [(str(service_id), '1')]).status_code == 302
+    with app.app_context():
+        inv = db.session.scalar(select(Invoice).where(Invoice.ticket_id == ticket_id))
+        invoice_id, customer_id = inv.id, inv.customer_id
+        ledger.record_payment(customer_id, '1.00', invoice_id=invoice_id)
+        db.session.commit()
+        assert _unpaid_total() == _still_owed()  # less the 1.00 paid, not the full grand_total
+        assert counters_match_rebuild() and balances_match_rebuild()
+
+    with app.app_context():
+        inv = db.session.get(Invoice, invoice_id)
+        db.session.commit()  # expires it: the old status is never loaded before the change
+        inv.status = 'Paid'
+        db.session.commit()
+        assert ledger.balance(customer_id) == sum(
+            i.grand_total - i.paid_amount for i in db.session.scalars(
+                select(Invoice).where(Invoice.customer_id == customer_id, Invoice.status == 'Unpaid')))
+        assert _unpaid_total() == _still_owed()
+        assert counters_match_rebuild() and balances_match_rebuild()
@@ -0,0 +1,34 @@
+import os
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import select
+from app import documents
+from app.extensions import db
+from app.models import Invoice, Job, Ticket
+from conftest import checkout
+
+
+def test_pdf_path_changes_within_a_second(app):
+    first = SimpleNamespace(id=7, created_at=None, updated_at=datetime(2026, 3, 1, 9, 30, 5, 120000))
+    second = SimpleNamespace(id=7, created_at=None, updated_at=datetime(2026, 3, 1, 9, 30, 5, 480000))
+    with app.app_context():
+        a, b = documents.pdf_path(first), documents.pdf_path(second)
+    assert a != b
+    assert a.endswith('7-20260301T093005120000.pdf')  # the stored UTC time, not shifted to local
+
+def test_jobs_are_queued_for_the_numbered_invoice(app, client, monkeypatch):
+    monkeypatch.setattr(documents, 'pdf_available', lambda: True)
+    monkeypatch.setitem(app.config, 'SMTP_HOST', 'smtp.test')
+    seen = []
+    enqueue = documents.enqueue_invoice_jobs
+    monkeypatch.setattr(documents, 'enqueue_invoice_jobs',
+                        lambda inv: seen.append((inv.number, documents.pdf_path(inv))) or enqueue(inv))
+    with app.app_context():
+        ticket_id = db.session.scalar(select(Ticket.id).order_by(Ticket.id.desc()))
+    assert checkout(client, ticket_id).status_code == 302
+    with app.app_context():
+        inv = db.session.scalar(select(Invoice).order_by(Invoice.id.desc()))
+        jobs = {j.kind: j for j in db.session.scalars(select(Job).order_by(Job.id.desc()).limit(2))}
+        assert seen == [(inv.number, documents.pdf_path(inv))] and inv.number
+        assert jobs['invoice.pdf'].dedup_key == f'invoice.pdf:{os.path.basename(documents.pdf_path(inv))}'
+        assert jobs['invoice.email'].payload == {'invoice_id': inv.id}
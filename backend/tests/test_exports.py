@@ -0,0 +1,18 @@
+import pytest
+from sqlalchemy import select
+from app.extensions import db
+from app.models import Invoice
+
+
+@pytest.mark.parametrize('query', ['customer_id=abc', 'customer_id=1.5', 'from=2024-13-01', 'to=yesterday'])
+@pytest.mark.parametrize('path', ['/exports/invoices.csv', '/exports/invoice-items.csv'])
+def test_bad_filters_are_rejected(client, path, query):
+    assert client.get(f'{path}?{query}').status_code == 400
+
+def test_customer_filter(app, client):
+    with app.app_context():
+        customer_id = db.session.scalar(select(Invoice.customer_id).where(Invoice.customer_id.is_not(None)))
+    rows = client.get(f'/exports/invoices.csv?customer_id={customer_id}').get_data(as_text=True).splitlines()
+    assert len(rows) > 1
+    everyone = client.get('/exports/invoices.csv').get_data(as_text=True).splitlines()
+    assert len(rows) < len(everyone)
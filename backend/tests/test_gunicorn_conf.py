@@ -0,0 +1,57 @@
+import os
+import runpy
+import threading
+from types import SimpleNamespace
+
+CONF = os.path.join(os.path.dirname(__file__), '..', 'gunicorn.conf.py')
+
+
+def _conf(monkeypatch, **env):
+    for name in ('WEB_CONCURRENCY', 'GUNICORN_THREADS', 'GUNICORN_WORKER_CLASS', 'EVENTS_MAX_STREAMS',
+                 'DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_MAX_CONNECTIONS'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(CONF)
+
+def test_sqlite_runs_one_worker(monkeypatch):
+    conf = _conf(monkeypatch, DATABASE_URL='sqlite:////tmp/x.db', WEB_CONCURRENCY='4')
+    assert conf['workers'] == 1
+
+def test_workers_fit_the_connection_budget(monkeypatch):
+    monkeypatch.setattr('multiprocessing.cpu_count', lambda: 64)
+    conf = _conf(monkeypatch, DATABASE_URL='postgresql+psycopg2://db/sand')
+    assert conf['workers'] == 90 // (4 + 4 + 1)
+    conf = _conf(monkeypatch, DATABASE_URL='postgresql+psycopg2://db/sand', DB_MAX_CONNECTIONS='40',
+                 DB_POOL_SIZE='8', DB_MAX_OVERFLOW='2')
+    assert conf['workers'] == 3
+
+def test_streams_get_their_own_threads(monkeypatch):
+    conf = _conf(monkeypatch, DATABASE_URL='postgresql+psycopg2://db/sand')
+    assert conf['threads'] == 4 + 16
+
+def test_pages_wait_for_a_slot(monkeypatch):
+    conf = _conf(monkeypatch, DATABASE_URL='postgresql+psycopg2://db/sand', GUNICORN_THREADS='2')
+    pre, post = conf['pre_request'], conf['post_request']
+    held = [SimpleNamespace(path='/tickets/') for _ in range(2)]
+    for req in held:
+        pre(None, req)
+    third = SimpleNamespace(path='/customers/')
+    waiting = threading.Thread(target=pre, args=(None, third))
+    waiting.start()
+    waiting.join(0.2)
+    assert waiting.is_alive()  # a third page waits: two connections are in use
+
+    stream = SimpleNamespace(path='/events/stream')
+    pre(None, stream)  # streams hold no connection and take no slot
+    post(None, stream, {}, None)
+    assert waiting.is_alive()
+
+    post(None, held[0], {}, None)
+    waiting.join(1)
+    assert not waiting.is_alive()
+    for req in (held[1], third):
+        post(None, req, {}, None)
+    post(None, SimpleNamespace(path='/'), {}, None)  # pre_request failed before taking one
+    assert all(conf['page_slots'].acquire(blocking=False) for _ in range(2))
+    assert not conf['page_slots'].acquire(blocking=False)
@@ -0,0 +1,52 @@
+import io
+from sqlalchemy import func, select
+from app import importer, search
+from app.extensions import db
+from app.models import ChangeLog, Customer
+from conftest import make_app, sqlite_uri
+
+CSV = ('full_name,national_id,phone,email\n'
+       'سالم البلوشي,IMP-1,99000001,\n'
+       'مريم الحارثية,IMP-2,99000002,\n'
+       'خالد الراشدي,,99000003,\n').encode()
+
+
+def _logged_since(last_id):
+    return set(db.session.scalars(select(ChangeLog.uid).where(ChangeLog.id > last_id,
+                                                               ChangeLog.entity == 'customer')))
+
+def test_branch_import_is_logged_for_sync():
+    app = make_app(sqlite_uri('import-branch'), SYNC_ROLE='branch')
+    with app.app_context():
+        db.session.add(Customer(full_name='سالم', national_id='IMP-1'))
+        db.session.commit()
+        last = db.session.scalar(select(func.max(ChangeLog.id)))
+
+    response = app.test_client().post('/customers/import', data={'file': (io.BytesIO(CSV), 'customers.csv')},
+                                      content_type='multipart/form-data')
+    assert response.status_code == 200
+    with app.app_context():
+        imported = set(db.session.scalars(select(Customer.uid).where(Customer.phone.like('9900000%'))))
+        assert len(imported) == 3
+        assert _logged_since(last) == imported  # the updated IMP-1 included
+
+        last = db.session.scalar(select(func.max(ChangeLog.id)))
+        result = importer.import_customers(importer.read_rows(io.BytesIO(CSV), 'customers.csv'))
+        assert (result.created, result.updated) == (1, 2)  # the anonymous row has no key to match
+        assert len(_logged_since(last)) == 3
+
+def test_standalone_import_logs_nothing(app):
+    with app.app_context():
+        before = db.session.scalar(select(func.count()).select_from(ChangeLog))
+        importer.import_customers(importer.read_rows(io.BytesIO(CSV), 'customers.csv'))
+        assert db.session.scalar(select(func.count()).select_from(ChangeLog)) == before
+
+def test_reimport_without_phone_keeps_it_searchable(app):
+    with app.app_context():
+        rows = lambda text: importer.read_rows(io.BytesIO(text.encode()), 'customers.csv')
+        importer.import_customers(rows('full_name,national_id,phone,email\nنورة الهنائية,IMP-9,99123456,\n'))
+        importer.import_customers(rows('full_name,national_id,phone,email\nنوره الهنائيه,IMP-9,,\n'))
+        c = db.session.scalar(select(Customer).where(Customer.national_id == 'IMP-9'))
+        assert c.phone == '99123456'
+        assert [x.id for x in search.search('99123456')] == [c.id]
+        assert c.id in [x.id for x in search.search('نورة الهنائية')]
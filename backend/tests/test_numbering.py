@@ -0,0 +1,77 @@
+import random
+import re
+import threading
+import uuid
+from collections import defaultdict
+from sqlalchemy import func, select, union_all
+from app.extensions import db
+from app.models import Invoice, InvoiceArchive, InvoiceSeries, Service, Ticket
+
+# Concurrent cashiers against /invoices/create: numbers stay unique and gap-free per
+# branch/year (archived invoices included: they keep theirs), and a form posted twice
+# at once creates one invoice. Runs on Postgres with TEST_DATABASE_URL, where the
+# series row lock is what is being tested; SQLite serialises the writers.
+
+NUMBER = re.compile(r'^(?P<branch>.+)-(?P<year>\d{4})-(?P<seq>\d+)$')
+CASHIERS = 8
+FORMS = 15  # per cashier
+DOUBLE_SUBMIT = 0.3
+
+
+def _numbers():
+    numbers = union_all(select(Invoice.number), select(InvoiceArchive.number)).subquery()
+    seqs = defaultdict(list)
+    for number, in db.session.execute(select(numbers.c.number).where(numbers.c.number.is_not(None))):
+        m = NUMBER.match(number)
+        seqs[(m['branch'], int(m['year']))].append(int(m['seq']))
+    return seqs
+
+def test_concurrent_cashiers(app):
+    with app.app_context():
+        tickets = db.session.scalars(select(Ticket.id).order_by(Ticket.id.desc()).limit(200)).all()
+        services = db.session.scalars(select(Service.id).limit(10)).all()
+        before = db.session.scalar(select(func.count()).select_from(Invoice))
+        assert db.session.scalar(select(func.count()).select_from(InvoiceArchive))  # the union matters
+
+    keys, statuses, lock = [], [], threading.Lock()
+
+    def post(key, rng):
+        form = {'ticket_id': rng.choice(tickets), 'idempotency_key': key,
+                'service_id': [str(s) for s in rng.sample(services, 2)], 'qty': ['1', '2']}
+        status = app.test_client().post('/invoices/create', data=form).status_code
+        with lock:
+            statuses.append(status)
+
+    def cashier(n):
+        rng = random.Random(n)
+        for _ in range(FORMS):
+            key = uuid.uuid4().hex
+            with lock:
+                keys.append(key)
+            if rng.random() < DOUBLE_SUBMIT:
+                # the same form from two tabs at once
+                twin = threading.Thread(target=post, args=(key, random.Random(key)))
+                twin.start()
+                post(key, random.Random(key))
+                twin.join()
+            else:
+                post(key, rng)
+
+    threads = [threading.Thread(target=cashier, args=(n,)) for n in range(CASHIERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert set(statuses) == {302}
+    with app.app_context():
+        created = db.session.scalar(select(func.count()).select_from(Invoice)) - before
+        with_keys = db.session.scalar(select(func.count()).select_from(Invoice)
+                                      .where(Invoice.idempotency_key.in_(keys)))
+        seqs = _numbers()
+        series = {(b, y): last for b, y, last in db.session.execute(
+            select(InvoiceSeries.branch, InvoiceSeries.year, InvoiceSeries.last_number))}
+    assert created == with_keys == len(keys)
+    for (branch, year), numbers in seqs.items():
+        assert sorted(numbers) == list(range(1, len(numbers) + 1)), f'{branch}-{year}'
+        assert series[(branch, year)] == len(numbers), f'{branch}-{year}'
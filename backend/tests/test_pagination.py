@@ -0,0 +1,89 @@
+import re
+from datetime import datetime
+import pytest
+from sqlalchemy import select
+from app.extensions import db
+from app.models import Customer, Service, Ticket
+from conftest import make_app, sqlite_uri
+
+# Keyset paging on its own database: every ticket shares one created_at, so the
+# queue's order (and its cursors) rests on the id tiebreak alone.
+CREATED = datetime(2026, 1, 5, 9, 30)
+STATUSES = ['New', 'In progress', 'New'] * 5
+
+
+@pytest.fixture(scope='module')
+def pager():
+    app = make_app(sqlite_uri('pager'))
+    with app.app_context():
+        customer = Customer(full_name='عميل الصفحات', national_id='PAGER-1')
+        service = Service(name='خدمة', gov_entity='جهة', office_fee=1)
+        db.session.add_all([customer, service])
+        db.session.flush()
+        db.session.add_all([Ticket(customer_id=customer.id, service_id=service.id, status=s, created_at=CREATED)
+                            for s in STATUSES])
+        db.session.commit()
+    return app
+
+def _ids(app, *statuses):
+    with app.app_context():
+        return db.session.scalars(select(Ticket.id).where(Ticket.status.in_(statuses or set(STATUSES)))
+                                  .order_by(Ticket.id)).all()
+
+def _api_pages(client, url, cursor='next', param='after'):
+    pages = []
+    while url:
+        body = client.get(url).get_json()
+        pages.append([r['id'] for r in body['data']])
+        url = body[cursor] and re.sub(r'&(after|before)=\d+', '', url) + f'&{param}={body[cursor]}'
+    return pages
+
+def _queue_pages(client, url, param='after'):
+    pages = []
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        pages.append([int(i) for i in re.findall(r'name="ticket_id" value="(\d+)"', html)])
+        link = re.search(rf'href="(/tickets/queue\?[^"]*{param}=[^"]+)"', html)
+        url = link and link[1].replace('&amp;', '&')
+    return pages
+
+
+def test_api_next_and_prev(pager):
+    client = pager.test_client()
+    forward = _api_pages(client, '/api/v1/tickets?fields=id&size=4')
+    assert [len(p) for p in forward] == [4, 4, 4, 3]
+    assert sum(forward, []) == _ids(pager)[::-1]  # newest first, no row twice or missed
+    last = forward[-1][0]
+    back = _api_pages(client, f'/api/v1/tickets?fields=id&size=4&before={last}', cursor='prev', param='before')
+    assert back == forward[-2::-1]
+
+def test_queue_ties_page_on_id(pager):
+    client = pager.test_client()
+    forward = _queue_pages(client, '/tickets/queue?size=4')
+    assert [len(p) for p in forward] == [4, 4, 4, 3]
+    assert sum(forward, []) == _ids(pager)  # oldest first: equal created_at, ascending id
+    # from the last page back: the "السابق" links retrace the same pages
+    html = client.get(f'/tickets/queue?size=4&after={CREATED.isoformat()}|{forward[-2][-1]}').get_data(as_text=True)
+    prev = re.search(r'href="(/tickets/queue\?[^"]*before=[^"]+)"', html)[1].replace('&amp;', '&')
+    assert _queue_pages(client, prev, param='before') == forward[-2::-1]
+
+def test_filters_apply_with_the_cursor(pager):
+    client = pager.test_client()
+    new = _ids(pager, 'New')
+    assert sum(_api_pages(client, '/api/v1/tickets?fields=id&status=New&size=3'), []) == new[::-1]
+    assert sum(_queue_pages(client, '/tickets/queue?status=New&size=3'), []) == new
+    in_progress = _queue_pages(client, '/tickets/queue?status=In+progress&size=2')
+    assert sum(in_progress, []) == _ids(pager, 'In progress')
+
+@pytest.mark.parametrize('path', [
+    '/api/v1/tickets?after=abc',
+    '/api/v1/tickets?before=1.5',
+    '/tickets/?after=7;drop',
+    '/customers/?before=',
+    '/services/?after=x',
+    '/tickets/queue?after=2026-01-05T09:30:00',  # the id is missing
+    '/tickets/queue?before=2026-01-05T09:30:00|x',
+    '/tickets/queue?after=yesterday|3',
+])
+def test_tampered_cursor_is_rejected(pager, path):
+    assert pager.test_client().get(path).status_code == 400
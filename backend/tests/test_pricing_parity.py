@@ -0,0 +1,80 @@
+import random
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from app.accounting import add_item, fee_schedule, from_baisa, new_pricing_ctx, price_arrays, price_batch
+
+# price_batch() and price_arrays() must reproduce add_item() (the Decimal path
+# invoices were always priced with) line for line and in the totals.
+
+LINES = 20_000
+
+
+def _service(rng):
+    return SimpleNamespace(
+        id=None,
+        office_fee=Decimal(rng.randrange(0, 5000)).scaleb(-2),
+        gov_fee_type=rng.choice(('fixed', 'variable')),
+        gov_fee_value=Decimal(rng.randrange(0, 50000)).scaleb(-2),
+        vat_applicable=rng.random() < 0.8,
+    )
+
+@pytest.fixture(scope='module', params=[1, 2, 3])
+def basket(request, app):
+    rng = random.Random(request.param)
+    services = [_service(rng) for _ in range(200)]
+    schedules = {id(s): fee_schedule(s) for s in services}
+    decimal_lines, baisa_lines = [], []
+    for _ in range(LINES):
+        service, qty = rng.choice(services), rng.randint(1, 20)
+        # variable fees down to 1 baisa: exercises the half-even rounding of line totals
+        var = rng.randrange(0, 500000) if rng.random() < 0.5 else None
+        decimal_lines.append((service, qty, from_baisa(var) if var is not None else None))
+        baisa_lines.append((schedules[id(service)], qty, var))
+    with app.app_context():
+        ctx = new_pricing_ctx()
+        expected = [add_item(ctx, s, qty, var) for s, qty, var in decimal_lines]
+    return baisa_lines, ctx, expected
+
+def _assert_same(ctx, expected, totals, rows):
+    rows = list(rows)
+    assert len(rows) == len(expected)
+    for e, got in zip(expected, rows):
+        assert (e['office_fee'], e['gov_fee'], e['vat_amount'], e['line_total']) == \
+            tuple(from_baisa(int(v)) for v in got)
+    assert {k: from_baisa(v) for k, v in totals.items()} == ctx
+
+def test_batch_matches_decimal_path(app, basket):
+    lines, ctx, expected = basket
+    with app.app_context():
+        totals, rows = price_batch(lines)
+    _assert_same(ctx, expected, totals, rows)
+
+def test_arrays_match_decimal_path(app, basket):
+    np = pytest.importorskip('numpy')
+    lines, ctx, expected = basket
+    fees = np.array([f for f, _, _ in lines], dtype=np.int64)
+    with app.app_context():
+        totals, arrays = price_arrays(
+            office_fee=fees[:, 0], gov_fee_value=fees[:, 1],
+            is_variable=fees[:, 2].astype(bool), vat_applicable=fees[:, 3].astype(bool),
+            qty=np.array([q for _, q, _ in lines], dtype=np.int64),
+            variable_input=np.array([v or 0 for _, _, v in lines], dtype=np.int64),
+            has_variable_input=np.array([v is not None for _, _, v in lines]))
+    rows = zip(arrays['office_fee'], arrays['gov_fee'], arrays['vat_amount'], arrays['line_total'])
+    _assert_same(ctx, expected, totals, rows)
+
+@pytest.mark.parametrize('rate', ['0.05', '0.15', '0.075'])
+def test_other_vat_rates(app, rate):
+    rng = random.Random(7)
+    services = [_service(rng) for _ in range(50)]
+    lines = [(rng.choice(services), rng.randint(1, 5)) for _ in range(2000)]
+    with app.app_context():
+        app.config['VAT_RATE'] = float(rate)
+        try:
+            ctx = new_pricing_ctx()
+            expected = [add_item(ctx, s, qty) for s, qty in lines]
+            totals, rows = price_batch([(fee_schedule(s), qty, None) for s, qty in lines], Decimal(rate))
+        finally:
+            app.config['VAT_RATE'] = 0.05
+    _assert_same(ctx, expected, totals, rows)
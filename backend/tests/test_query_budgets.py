@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import select, text
+from app.extensions import db
+from app.models import Customer, Invoice, InvoiceArchive, Ticket
+from app.querycount import QueryBudgetExceeded, query_budget
+
+# every view carrying @query_budget; in testing mode an overrun raises instead of logging
+
+
+@pytest.fixture(scope='module')
+def ids(app):
+    with app.app_context():
+        return {
+            'ticket': db.session.scalar(select(Ticket.id).order_by(Ticket.id.desc())),
+            'invoice': db.session.scalar(select(Invoice.id).order_by(Invoice.id.desc())),
+            'archived': db.session.scalar(select(InvoiceArchive.id)),
+            'customer': db.session.scalar(select(Invoice.customer_id).where(Invoice.status == 'Unpaid')),
+            'name': db.session.scalar(select(Customer.full_name)).split()[0],
+        }
+
+URLS = [
+    '/',
+    '/services/',
+    '/tickets/',
+    '/tickets/?status=New',
+    '/tickets/{ticket}/row',
+    '/tickets/queue',
+    '/invoices/new/{ticket}',
+    '/invoices/{invoice}',
+    '/invoices/{archived}',
+    '/customers/',
+    '/customers/?q={name}',
+    '/customers/{customer}',
+    '/customers/collections',
+    '/api/v1/customers',
+    '/api/v1/customers?q={name}',
+    '/api/v1/services',
+    '/api/v1/tickets?status=New',
+    '/api/v1/invoices?fields=id,status&size=100',
+    '/api/v1/customers/{customer}',
+    '/api/v1/tickets/{ticket}',
+    '/api/v1/invoices/{invoice}',
+    '/api/v1/invoices/{archived}',
+]
+
+@pytest.mark.parametrize('url', URLS)
+def test_view_stays_within_budget(client, ids, url):
+    url = url.format(**ids)
+    # twice: cold (catalog reload, fragment cache miss) and warm
+    for _ in range(2):
+        assert client.get(url).status_code == 200, url
+
+def test_overrun_fails_in_testing(app):
+    @query_budget(1)
+    def view():
+        db.session.execute(text('SELECT 1'))
+        db.session.execute(text('SELECT 2'))
+        return 'ok'
+
+    with app.test_request_context('/'):
+        with pytest.raises(QueryBudgetExceeded):
+            view()
@@ -0,0 +1,54 @@
+from collections import defaultdict
+from decimal import Decimal
+from sqlalchemy import select
+from app.extensions import db
+from app.models import Customer, Invoice, InvoiceItem, RevenueRollup, Service, Ticket
+from conftest import checkout, make_app, sqlite_uri
+
+SERVICES = (('ترجمة', '10.000', True), ('رسوم بلدية', '20.000', False),
+            ('تصوير', '0.050', True))  # VAT on 0.05 rounds to 0.00: taxable all the same
+
+
+def _direct():
+    """The day rollups worked out item by item."""
+    acc = defaultdict(lambda: [0, 0, Decimal(0), Decimal(0), Decimal(0), Decimal(0), Decimal(0)])
+    for item, inv, service in db.session.execute(
+            select(InvoiceItem, Invoice, Service).join(Invoice).join(Service)):
+        row = acc[(inv.created_at.date(), item.service_id, service.gov_entity or '', inv.status)]
+        for i, value in enumerate((1, item.qty, item.office_fee,
+                                   item.office_fee if service.vat_applicable else 0,
+                                   item.vat_amount, item.gov_fee, item.line_total)):
+            row[i] += value
+    return {k: tuple(v) for k, v in acc.items()}
+
+def _rollups():
+    return {(r.period_start, r.service_id, r.gov_entity, r.status):
+            (r.lines, r.qty, r.office_fee, r.taxable_office_fee, r.vat_amount, r.gov_fees, r.total)
+            for r in db.session.scalars(select(RevenueRollup).where(RevenueRollup.grain == 'day'))}
+
+
+def test_rollups_match_a_direct_aggregate():
+    app = make_app(sqlite_uri('reporting'))
+    with app.app_context():
+        services = [Service(name=name, office_fee=Decimal(fee), gov_fee_type='fixed',
+                            gov_fee_value=Decimal('1.500'), vat_applicable=vat) for name, fee, vat in SERVICES]
+        customer = Customer(full_name='هلال السيابي')
+        db.session.add_all([customer, *services])
+        db.session.flush()
+        tickets = [Ticket(customer_id=customer.id, service_id=services[0].id) for _ in range(4)]
+        db.session.add_all(tickets)
+        db.session.commit()
+        service_ids = [str(s.id) for s in services]
+        ticket_ids = [t.id for t in tickets]
+
+    client = app.test_client()
+    for n, ticket_id in enumerate(ticket_ids):
+        lines = [(service_ids[i % 3], '1') for i in range(n, n + 2)]
+        assert checkout(client, ticket_id, lines=lines).status_code == 302
+    with app.app_context():
+        db.session.scalar(select(Invoice).order_by(Invoice.id)).status = 'Cancelled'  # a status move
+        db.session.commit()
+        direct = _direct()
+        assert _rollups() == direct
+        small = [k for k in direct if k[1] == int(service_ids[2])]
+        assert small and all(direct[k][3] == direct[k][2] > 0 and direct[k][4] == 0 for k in small)
@@ -0,0 +1,43 @@
+import pytest
+from app import search
+from app.extensions import db
+from app.models import Customer
+
+# (stored name, how a cashier types it)
+VARIANTS = [
+    ('أسامة الإسماعيلي', 'اسامه الاسماعيلي'),  # alef with hamza above/below
+    ('آمنة البوسعيدية', 'امنه البوسعيديه'),  # alef madda, taa marbuta
+    ('اسراء المعمرية', 'إسراء المعمريه'),  # the variant typed, the plain form stored
+    ('فاطمة الشكيلية', 'فاطمه الشكيليه'),  # taa marbuta
+    ('مصطفى الحبسي', 'مصطفي الحبسي'),  # alef maqsura / ya
+    ('ليلي الرواحية', 'ليلى الرواحيه'),
+    ('مُحَمَّد الكِندي', 'محمد الكندي'),  # diacritics stored
+    ('محمد الغيلاني', 'مُحـــمّد الغيـلاني'),  # diacritics and tatweel typed
+    ('سعيد الوهيبي', 'سعيد ٩٩٤٤٣٣٣٠'),  # Arabic-Indic digits match the phone
+]
+
+
+@pytest.fixture(scope='module')
+def customers(app):
+    with app.app_context():
+        rows = [Customer(full_name=name, phone=f'9944{3322 + n:04d}', national_id=f'SRCH-{n}')
+                for n, (name, _) in enumerate(VARIANTS)]
+        db.session.add_all(rows)
+        db.session.commit()
+        return [c.id for c in rows]
+
+
+def test_normalize_folds_spelling_variants():
+    assert search.normalize('أإآٱ') == 'اااا'
+    assert search.normalize('فاطمة') == search.normalize('فاطمه')
+    assert search.normalize('مصطفى') == search.normalize('مصطفي')
+    assert search.normalize('مُحـــمَّد') == 'محمد'
+    assert search.normalize('٠١٢٣ ۴۵۶') == '0123 456'
+
+@pytest.mark.parametrize('n', range(len(VARIANTS)), ids=[typed for _, typed in VARIANTS])
+def test_lookup_finds_every_variant(client, customers, n):
+    typed = VARIANTS[n][1]
+    found = [c['id'] for c in client.get('/customers/lookup', query_string={'q': typed, 'limit': 50}).json]
+    assert customers[n] in found
+    listed = client.get('/api/v1/customers', query_string={'q': typed, 'fields': 'id', 'size': 500}).json
+    assert customers[n] in [c['id'] for c in listed['data']]
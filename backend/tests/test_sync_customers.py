@@ -0,0 +1,51 @@
+from sqlalchemy import func, select
+from app.extensions import db
+from app.models import Customer
+from conftest import sync_round
+
+def _branch_customer(branch):
+    with branch.app_context():
+        c = Customer(full_name='سالم البلوشي', phone='99001122')
+        db.session.add(c)
+        db.session.commit()
+        return c.uid
+
+def _central_sets_national_id(central, uid, national_id):
+    with central.app_context():
+        db.session.scalar(select(Customer).where(Customer.uid == uid)).national_id = national_id
+        db.session.commit()
+
+def _branch_customers(branch):
+    with branch.app_context():
+        return dict(db.session.execute(select(Customer.uid, Customer.national_id)).all())
+
+
+def test_national_id_given_on_central(nodes):
+    central, branch = nodes
+    uid = _branch_customer(branch)
+    sync_round(branch)  # up, and SYNC-1 down
+    before = _branch_customers(branch)
+    assert before[uid] is None
+
+    _central_sets_national_id(central, uid, 'NEW-1')
+    sync_round(branch)
+    assert _branch_customers(branch) == {**before, uid: 'NEW-1'}  # same row, not a new one
+
+    _central_sets_national_id(central, uid, 'NEW-2')  # corrected later
+    sync_round(branch)
+    assert _branch_customers(branch) == {**before, uid: 'NEW-2'}
+    with branch.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Customer).where(Customer.uid == uid)) == 1
+
+def test_national_id_merges_rows_with_other_uids(nodes):
+    central, branch = nodes
+    with branch.app_context():
+        db.session.add(Customer(full_name='عائشة الكندية', national_id='SYNC-1'))  # before the first pull
+        db.session.commit()
+    sync_round(branch)  # central keeps its own row, under its uid
+    with central.app_context():
+        c = db.session.scalar(select(Customer).where(Customer.national_id == 'SYNC-1'))
+        c.phone, central_uid = '99887766', c.uid
+        db.session.commit()
+    sync_round(branch)
+    assert _branch_customers(branch) == {central_uid: 'SYNC-1'}  # merged into the local row
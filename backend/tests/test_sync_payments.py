@@ -0,0 +1,99 @@
+from decimal import Decimal
+from sqlalchemy import select
+from app import ledger
+from app.extensions import db
+from app.models import ChangeLog, Customer, Invoice, Payment, Service, Ticket
+from conftest import balances_match_rebuild, checkout, sync_round as _sync
+
+def _state(app, uid):
+    with app.app_context():
+        inv = db.session.scalar(select(Invoice).where(Invoice.uid == uid))
+        return inv.status, inv.paid_amount, ledger.balance(inv.customer_id)
+
+def _balances_match_rebuild(app):
+    with app.app_context():
+        return balances_match_rebuild()
+
+def _branch_invoice(branch):
+    with branch.app_context():
+        customer = db.session.scalar(select(Customer.id).where(Customer.national_id == 'SYNC-1'))
+        service = db.session.scalar(select(Service.id))
+        ticket = Ticket(customer_id=customer, service_id=service)
+        db.session.add(ticket)
+        db.session.commit()
+        ticket_id = ticket.id
+    assert checkout(branch.test_client(), ticket_id, lines=((str(service), '1'),)).status_code == 302
+    with branch.app_context():
+        inv = db.session.scalar(select(Invoice).order_by(Invoice.id.desc()))
+        assert inv.number.startswith('BR1-') and inv.grand_total == Decimal('100')
+        return inv.uid, customer
+
+def _central_pays(central, uid, value):
+    with central.app_context():
+        inv = db.session.scalar(select(Invoice).where(Invoice.uid == uid))
+        ledger.record_payment(inv.customer_id, value, invoice_id=inv.id)
+        db.session.commit()
+
+def _branch_pays(branch, customer, value):
+    with branch.app_context():
+        ledger.record_payment(customer, value)
+        db.session.commit()
+
+
+def test_payments_on_both_sides_add_up(nodes):
+    central, branch = nodes
+    _sync(branch)  # catalog and customer down
+    uid, customer = _branch_invoice(branch)
+    _sync(branch)  # invoice up
+
+    _central_pays(central, uid, '40')  # at HQ
+    _branch_pays(branch, customer, '30')  # meanwhile at the branch
+    assert _state(branch, uid) == ('Unpaid', Decimal('30'), Decimal('70'))
+
+    _sync(branch)
+    assert _state(central, uid) == ('Unpaid', Decimal('70'), Decimal('30'))  # not the branch's 30
+    assert _state(branch, uid) == ('Unpaid', Decimal('70'), Decimal('30'))  # pulled back
+
+    _branch_pays(branch, customer, '50')  # 20 more than is owed
+    _sync(branch)
+    with central.app_context():
+        assert len(db.session.scalars(select(Payment)).all()) == 3
+    assert _state(central, uid) == ('Paid', Decimal('100'), Decimal('-20'))  # the 20 is credit
+    assert _state(branch, uid)[:2] == ('Paid', Decimal('100'))
+    assert _balances_match_rebuild(central) and _balances_match_rebuild(branch)
+
+def test_full_payment_on_both_sides_leaves_credit(nodes):
+    central, branch = nodes
+    _sync(branch)
+    uid, customer = _branch_invoice(branch)
+    _sync(branch)
+    _central_pays(central, uid, '100')
+    _branch_pays(branch, customer, '100')
+    _sync(branch)
+    assert _state(central, uid) == ('Paid', Decimal('100'), Decimal('-100'))
+    assert _balances_match_rebuild(central)
+
+def test_branch_payment_alone_is_kept(nodes):
+    central, branch = nodes
+    _sync(branch)
+    uid, customer = _branch_invoice(branch)
+    _branch_pays(branch, customer, '100')
+    _sync(branch)  # invoice and payment in one batch
+    assert _state(central, uid) == ('Paid', Decimal('100'), Decimal('0'))
+    assert _state(branch, uid) == ('Paid', Decimal('100'), Decimal('0'))
+    with branch.app_context():  # the pulled state is not logged to be pushed back
+        assert not db.session.scalar(select(ChangeLog.id).where(ChangeLog.pushed_at.is_(None)))
+
+def test_credit_goes_to_the_next_invoice(nodes):
+    central, branch = nodes
+    _sync(branch)
+    uid, customer = _branch_invoice(branch)
+    _branch_pays(branch, customer, '150')  # 50 over
+    _sync(branch)
+    assert _state(central, uid) == _state(branch, uid) == ('Paid', Decimal('100'), Decimal('-50'))
+
+    second, _ = _branch_invoice(branch)
+    assert _state(branch, second) == ('Unpaid', Decimal('50'), Decimal('50'))  # the credit, at checkout
+    _sync(branch)
+    assert _state(central, second) == _state(branch, second) == ('Unpaid', Decimal('50'), Decimal('50'))
+    assert _balances_match_rebuild(central) and _balances_match_rebuild(branch)
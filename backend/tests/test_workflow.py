@@ -0,0 +1,65 @@
+import re
+from sqlalchemy import func, select, update
+from app import workflow
+from app.extensions import db
+from app.models import Ticket, TicketEvent
+from conftest import counters_match_rebuild
+
+
+def _tickets(status, n):
+    return db.session.scalars(select(Ticket.id).where(Ticket.status == status)
+                              .order_by(Ticket.id.desc()).limit(n)).all()
+
+def _events():
+    return db.session.scalar(select(func.count()).select_from(TicketEvent))
+
+
+def test_transition_rules_and_audit(app, client):
+    with app.app_context():
+        new, done = _tickets('New', 2), _tickets('Done', 1)
+    response = client.post('/tickets/transition', json={'ticket_ids': [*new, *done, 10**9],
+                                                         'to_status': 'In progress', 'note': 'بدأ العمل'})
+    assert response.status_code == 200
+    assert response.json == {'moved': sorted(new),
+                             'rejected': {str(done[0]): 'Done', str(10**9): None}}
+
+    audit = [client.get(f'/tickets/{i}/events').json[-1] for i in new]
+    assert [(e['from'], e['to'], e['note']) for e in audit] == [('New', 'In progress', 'بدأ العمل')] * 2
+    assert audit[0]['batch'] == audit[1]['batch']  # one bulk move
+    assert all(e['to'] != 'In progress' for e in client.get(f'/tickets/{done[0]}/events').json)
+
+    # In progress -> New is not a move the workflow has
+    assert client.post('/tickets/transition', json={'ticket_ids': new, 'to_status': 'New'}).json['moved'] == []
+    with app.app_context():
+        assert counters_match_rebuild()
+
+def test_status_changed_meanwhile_moves_nothing(app, client, monkeypatch):
+    with app.app_context():
+        ids = _tickets('New', 2)
+        before = _events()
+    can_move = workflow.can_move
+
+    def moved_by_someone_else(from_status, to_status):
+        # between transition()'s read and its UPDATE another cashier cancels the first ticket
+        db.session.execute(update(Ticket).where(Ticket.id == ids[0]).values(status='Cancelled'))
+        return can_move(from_status, to_status)
+
+    monkeypatch.setattr(workflow, 'can_move', moved_by_someone_else)
+    response = client.post('/tickets/transition', json={'ticket_ids': ids, 'to_status': 'In progress'})
+    assert response.status_code == 409
+    with app.app_context():
+        assert db.session.scalars(select(Ticket.status).where(Ticket.id.in_(ids))).all() == ['New', 'New']
+        assert _events() == before
+        assert counters_match_rebuild()
+
+def test_queue_pages_oldest_first(app, client):
+    with app.app_context():
+        expected = db.session.scalars(select(Ticket.id).where(Ticket.status.in_(workflow.OPEN_STATUSES))
+                                      .order_by(Ticket.created_at, Ticket.id).limit(12)).all()
+    seen, url = [], '/tickets/queue?size=5'
+    while len(seen) < 12:
+        html = client.get(url).get_data(as_text=True)
+        seen += [int(i) for i in re.findall(r'name="ticket_id" value="(\d+)"', html)]
+        url = re.search(r'href="(/tickets/queue\?[^"]*after=[^"]+)"', html)[1].replace('&amp;', '&')
+    assert seen[:12] == expected
+    assert client.get('/tickets/queue?after=not-a-cursor').status_code == 400